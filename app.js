@@ -1696,13 +1696,15 @@ function showRedAlertPopup(wardId, patients) {
 
 
 let alertedWards = new Set();
+let wardLoadVersion = 0;  // only wards changed since this version are sent
 
 async function pollWardZones() {
     try {
-        const res = await fetch('http://localhost:8000/realtime/hospital-load');
+        const res = await fetch(`http://localhost:8000/realtime/hospital-load?since=${wardLoadVersion}`);
         const data = await res.json();
+        wardLoadVersion = data.version;
 
-        data.forEach(ward => {
+        data.wards.forEach(ward => {
             if (ward.zone === 'red' && !alertedWards.has(ward.ward_id)) {
                 alertedWards.add(ward.ward_id);
                 showRedAlertPopup(ward.ward_id, ward.patients);
@@ -0,0 +1,156 @@
+"""
+Smart Public Health Management System - Dashboard Aggregates
+Counters maintained as events arrive so dashboard polls are constant time
+
+Author: SMC Real-Time Team
+Date: October 2026
+"""
+
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+import orjson
+
+from realtime_windows import BucketedWindow, TimeLike
+
+
+class DashboardAggregates:
+    """
+    Running totals behind /realtime/dashboard-stats.
+
+    Every mutation bumps `version`; `snapshot()` rebuilds its payload only
+    when the version moved (or the 24h window expired cases), so repeated
+    polls return the same cached dict.
+    """
+
+    def __init__(self, bucket: timedelta = timedelta(minutes=1)):
+        self.cases_24h = BucketedWindow(
+            horizon=timedelta(hours=24),
+            bucket=bucket,
+            spans=(timedelta(hours=24),)
+        )
+        self.active_alerts = 0
+        self.ward_levels: Dict[str, str] = {}
+        self.red_wards: Set[str] = set()
+        self.shared_total: Optional[int] = None
+
+        self.version = 0
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._snapshot_cases = 0
+
+    def _changed(self):
+        self.version += 1
+        self._snapshot = None
+
+    def record_case(self, ts: Optional[TimeLike] = None, count: int = 1):
+        """Count newly ingested cases"""
+        if self.cases_24h.add(ts, count):
+            self._changed()
+
+    def record_shared_total(self, total: int):
+        """
+        Report the 24h case total from a shared state backend; from then on it
+        replaces the local window, which only sees this process's cases.
+        """
+        if total != self.shared_total:
+            self.shared_total = total
+            self._changed()
+
+    def record_ward_level(self, ward_id: str, level: str):
+        """Track the latest computed risk level for a ward"""
+        if self.ward_levels.get(ward_id) == level:
+            return
+        self.ward_levels[ward_id] = level
+        if level == "RED":
+            self.red_wards.add(ward_id)
+        else:
+            self.red_wards.discard(ward_id)
+        self._changed()
+
+    def record_alert_status(self, old_status: Optional[str], new_status: Optional[str]):
+        """Track an alert being created (old_status=None), updated or removed (new_status=None)"""
+        delta = (new_status == 'active') - (old_status == 'active')
+        if delta:
+            self.active_alerts += delta
+            self._changed()
+
+    def snapshot(self, now: Optional[TimeLike] = None) -> Dict[str, Any]:
+        """Current dashboard payload, rebuilt only if something changed"""
+        total_24h = self.cases_24h.total(now) if self.shared_total is None else self.shared_total
+        if self._snapshot is not None and total_24h != self._snapshot_cases:
+            # Cases aged out of the 24h window since the last build
+            self._changed()
+
+        if self._snapshot is None:
+            self._snapshot_cases = total_24h
+            self._snapshot = {
+                "version": self.version,
+                "total_cases_24h": total_24h,
+                "active_alerts": self.active_alerts,
+                "wards_monitored": len(self.ward_levels),
+                "high_risk_wards": len(self.red_wards),
+                "timestamp": datetime.now().isoformat()
+            }
+        return self._snapshot
+
+
+class HospitalLoadView:
+    """
+    Per-ward patient counts and zones behind /realtime/hospital-load.
+
+    `refresh()` diffs fresh 24h totals against the last ones and stamps
+    each changed ward with a new version. Versions are epoch milliseconds
+    (kept strictly increasing), so they stay comparable across restarts
+    and workers. The full payload is encoded once per version and
+    `changed_since()` returns only the wards a client has not seen.
+    """
+
+    def __init__(self, zone: Callable[[int], str]):
+        self.zone = zone
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.changed_at: Dict[str, int] = {}
+        self.version = 0
+        self._body: Optional[bytes] = None
+
+    def refresh(self, totals: Dict[str, int]) -> bool:
+        """
+        Apply current ward totals; returns True if any ward changed.
+        Known wards missing from `totals` (dropped once idle) count as zero.
+        """
+        totals = dict(totals)
+        for ward_id in self.rows.keys() - totals.keys():
+            totals[ward_id] = 0
+        changed = [ward_id for ward_id, patients in totals.items()
+                   if ward_id not in self.rows or self.rows[ward_id]['patients'] != patients]
+        if not changed:
+            return False
+
+        self.version = max(self.version + 1, int(time.time() * 1000))
+        for ward_id in changed:
+            patients = totals[ward_id]
+            self.rows[ward_id] = {"ward_id": ward_id, "patients": patients, "zone": self.zone(patients)}
+            # Kept in change order, so deltas only walk the wards that changed
+            self.changed_at.pop(ward_id, None)
+            self.changed_at[ward_id] = self.version
+        self._body = None
+        return True
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+    def body(self) -> bytes:
+        """Full payload as JSON, encoded once per version"""
+        if self._body is None:
+            self._body = orjson.dumps(list(self.rows.values()))
+        return self._body
+
+    def changed_since(self, version: int) -> List[Dict[str, Any]]:
+        """Wards whose patient count or zone changed after `version`"""
+        rows = []
+        for ward_id in reversed(self.changed_at):
+            if self.changed_at[ward_id] <= version:
+                break
+            rows.append(self.rows[ward_id])
+        rows.reverse()
+        return rows
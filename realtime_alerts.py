@@ -0,0 +1,227 @@
+"""
+Smart Public Health Management System - Alert Store
+Alerts indexed by status, ward, disease and creation time with cursor pagination
+
+Author: SMC Real-Time Team
+Date: October 2026
+"""
+
+import math
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from realtime_windows import TimeLike, to_epoch
+
+INDEXED_FIELDS = ('status', 'ward_id', 'disease_type')
+DEDUP_FIELDS = ('ward_id', 'disease_type', 'severity')  # one open alert per combination
+
+
+class AlertStore:
+    """
+    Alert dicts keyed by an insertion sequence number.
+
+    Every index is a sorted list of sequence numbers, so "newest first
+    after cursor X" is a bisect plus a walk that stops after `limit`
+    matches. Cursors are the sequence number of the last alert returned.
+    Pages follow insertion order, which is creation order except for
+    alerts stored late (from other nodes or a replay); creation-time
+    bounds use a separate list kept sorted by `created_at`.
+
+    When more than `max_alerts` are stored, the oldest non-active alerts
+    are evicted, then the oldest of any status not updated for `retention`
+    seconds, so the store stays bounded even if alerts are never resolved.
+    Each eviction pass is followed by at least `max_alerts / 10` adds before
+    the next, so the scan costs O(1) per add even when little is evictable.
+    The newest active alert for each (ward, disease, severity) is tracked so
+    repeat triggers can be folded into it (`find_open`).
+    """
+
+    def __init__(self, max_alerts: int = 10000, retention: float = 24 * 3600,
+                 on_evict: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Args:
+            max_alerts: Alerts kept before evicting
+            retention: Seconds since its last update after which even an active alert may be evicted
+            on_evict: Called with each evicted alert dict
+        """
+        self.max_alerts = max_alerts
+        self.retention = retention
+        self.on_evict = on_evict
+        self.prune_above = max_alerts + max_alerts // 10
+
+        self.alerts: Dict[int, Dict[str, Any]] = {}
+        self.seq_by_id: Dict[str, int] = {}
+        self.next_seq = 1
+
+        # Insertion order (ascending sequence numbers)
+        self.seqs: List[int] = []
+        # (created_at epoch, seq) sorted by creation time, for time-range bounds
+        self.by_created: List[Tuple[float, int]] = []
+
+        # (field, value) -> ascending list of sequence numbers
+        self.indexes: Dict[Tuple[str, Any], List[int]] = defaultdict(list)
+
+        # (ward_id, disease_type, severity) -> sequence number of the newest active alert
+        self.open_by_key: Dict[Tuple[Any, ...], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.alerts)
+
+    def __iter__(self):
+        """Alerts in insertion order"""
+        return (self.alerts[seq] for seq in self.seqs)
+
+    def get(self, alert_id: str) -> Optional[Dict[str, Any]]:
+        seq = self.seq_by_id.get(alert_id)
+        return self.alerts.get(seq) if seq is not None else None
+
+    def find_open(self, ward_id: str, disease_type: str, severity: str) -> Optional[Dict[str, Any]]:
+        """Newest active alert for a ward, disease and severity, if any"""
+        seq = self.open_by_key.get((ward_id, disease_type, severity))
+        return self.alerts.get(seq) if seq is not None else None
+
+    def _track_open(self, seq: int, alert: Dict[str, Any]):
+        if alert['status'] == 'active':
+            key = tuple(alert[field] for field in DEDUP_FIELDS)
+            if seq > self.open_by_key.get(key, 0):
+                self.open_by_key[key] = seq
+
+    def _untrack_open(self, seq: int, alert: Dict[str, Any]):
+        key = tuple(alert[field] for field in DEDUP_FIELDS)
+        if self.open_by_key.get(key) == seq:
+            del self.open_by_key[key]
+
+    def add(self, alert_dict: Dict[str, Any]) -> int:
+        """Store an alert; returns its sequence number"""
+        seq = self.next_seq
+        self.next_seq += 1
+
+        self.alerts[seq] = alert_dict
+        self.seq_by_id[alert_dict['id']] = seq
+        self.seqs.append(seq)
+        insort(self.by_created, (to_epoch(alert_dict['created_at']), seq))
+        for field in INDEXED_FIELDS:
+            self.indexes[(field, alert_dict[field])].append(seq)
+        self._track_open(seq, alert_dict)
+
+        if len(self.alerts) > self.prune_above:
+            self.prune()
+        return seq
+
+    def update(self, alert_id: str, **changes) -> Optional[Dict[str, Any]]:
+        """Change fields of a stored alert, keeping indexes in sync"""
+        seq = self.seq_by_id.get(alert_id)
+        if seq is None:
+            return None
+        alert = self.alerts[seq]
+        self._untrack_open(seq, alert)
+        if 'created_at' in changes and changes['created_at'] != alert['created_at']:
+            self.by_created.remove((to_epoch(alert['created_at']), seq))
+            insort(self.by_created, (to_epoch(changes['created_at']), seq))
+        for field, value in changes.items():
+            if field in INDEXED_FIELDS and alert[field] != value:
+                self._unindex(field, alert[field], seq)
+                insort(self.indexes[(field, value)], seq)
+            alert[field] = value
+        self._track_open(seq, alert)
+        return alert
+
+    def _unindex(self, field: str, value: Any, seq: int):
+        entries = self.indexes[(field, value)]
+        pos = bisect_left(entries, seq)
+        if pos < len(entries) and entries[pos] == seq:
+            entries.pop(pos)
+        if not entries:
+            del self.indexes[(field, value)]
+
+    def prune(self, now: Optional[TimeLike] = None) -> int:
+        """
+        Evict the oldest non-active alerts, then the oldest not updated within
+        `retention`, down to `max_alerts`
+        """
+        excess = len(self.alerts) - self.max_alerts
+        evicted = set()
+        if excess > 0:
+            for seq in self.seqs:
+                if len(evicted) == excess:
+                    break
+                if self.alerts[seq]['status'] != 'active':
+                    evicted.add(seq)
+        if len(evicted) < excess:
+            cutoff = to_epoch(now) - self.retention
+            for seq in self.seqs:
+                if len(evicted) == excess:
+                    break
+                alert = self.alerts[seq]
+                if seq not in evicted and to_epoch(alert.get('updated_at') or alert['created_at']) < cutoff:
+                    evicted.add(seq)
+
+        for seq in evicted:
+            alert = self.alerts.pop(seq)
+            self.seq_by_id.pop(alert['id'], None)
+            for field in INDEXED_FIELDS:
+                self._unindex(field, alert[field], seq)
+            self._untrack_open(seq, alert)
+            if self.on_evict is not None:
+                self.on_evict(alert)
+        if evicted:
+            self.seqs = [seq for seq in self.seqs if seq not in evicted]
+            self.by_created = [entry for entry in self.by_created if entry[1] not in evicted]
+        self.prune_above = max(self.max_alerts, len(self.alerts)) + self.max_alerts // 10
+        return len(evicted)
+
+    def query(self, status: Optional[str] = None, ward_id: Optional[str] = None,
+              disease_type: Optional[str] = None, created_after: Optional[TimeLike] = None,
+              created_before: Optional[TimeLike] = None, cursor: Optional[int] = None,
+              limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Newest-first page of alerts matching every given filter.
+
+        Args:
+            cursor: Return only alerts older than this cursor (from a previous page)
+            limit: Maximum alerts to return
+
+        Returns:
+            (alerts, next_cursor) where next_cursor is None on the last page
+        """
+        if limit <= 0:
+            return [], None
+
+        # Sequence bounds from cursor and creation-time range
+        upper = self.next_seq if cursor is None else cursor
+        lower = 0
+        in_range = None  # sequence numbers created within the range, if one is given
+        if created_after is not None or created_before is not None:
+            lo = 0 if created_after is None else bisect_left(self.by_created, (to_epoch(created_after),))
+            hi = len(self.by_created) if created_before is None else \
+                bisect_right(self.by_created, (to_epoch(created_before), math.inf))
+            in_range = {seq for _, seq in self.by_created[lo:hi]}
+            if not in_range:
+                return [], None
+            lower, upper = min(in_range), min(upper, max(in_range) + 1)
+
+        # Walk the most selective index; check the remaining filters per alert
+        filters = {field: value for field, value in
+                   (('status', status), ('ward_id', ward_id), ('disease_type', disease_type))
+                   if value is not None}
+        if filters:
+            candidates = min(
+                (self.indexes.get((field, value), []) for field, value in filters.items()),
+                key=len
+            )
+        else:
+            candidates = self.seqs
+
+        page: List[Dict[str, Any]] = []
+        pos = bisect_left(candidates, upper) - 1
+        while pos >= 0 and candidates[pos] >= lower:
+            seq = candidates[pos]
+            alert = self.alerts[seq]
+            if (in_range is None or seq in in_range) and \
+                    all(alert[field] == value for field, value in filters.items()):
+                if len(page) == limit:
+                    return page, self.seq_by_id[page[-1]['id']]
+                page.append(alert)
+            pos -= 1
+        return page, None
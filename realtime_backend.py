@@ -6,21 +6,55 @@ Author: SMC Real-Time Team
 Date: January 2026
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, BackgroundTasks
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, BackgroundTasks, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from enum import Enum
 import asyncio
+import itertools
 import json
+import math
+import orjson
+import time
+import uuid
 import redis.asyncio as redis
-from collections import defaultdict
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager, contextmanager
 import numpy as np
+import os
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 
+from realtime_windows import Watermark, to_epoch, window_snapshot
+from realtime_case_log import CaseLog
+from realtime_case_store import ColumnarCaseStore
+from realtime_case_index import CaseCountIndex
+from realtime_aggregates import DashboardAggregates, HospitalLoadView
+from realtime_broadcast import ChangeDrivenPublisher, ConnectionManager, Payload, DROP_OLDEST
+from realtime_events import EventBus
+from realtime_alerts import AlertStore
+from realtime_stream_writer import StreamWriter
+from realtime_state_backend import InMemoryWardState, RedisWardState, WardStateBackend
+from realtime_snapshot import (
+    MARKER_FIELD, bucket_matrix, cases_from_entries, cases_to_columns, load_snapshot,
+    pack_cases, read_stream, replay_pages, save_snapshot, unpack_cases
+)
+from realtime_wal import RECORD_ALERT, RECORD_CASE, RECORD_RESOURCE, WriteAheadLog
+from realtime_inference import MicroBatcher, OutcomeSampler
+from realtime_ingest_queue import IngestQueue
+from realtime_admission import ConcurrencyLimiter, TokenBuckets
+from realtime_dedup import (
+    INGESTING, NEW, STORED, DuplicateFilter, IdempotencyKeys, RedisIdempotencyKeys
+)
+
+try:
+    from streaming_ml_service import StreamingOutbreakPredictor
+except ImportError:  # river not installed
+    StreamingOutbreakPredictor = None
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Smart Public Health Management System",
@@ -60,27 +94,32 @@ app.add_middleware(
 # Redis connection
 redis_client = None
 
+# Batched, pipelined Redis Streams writer used by the ingest endpoints
+stream_writer = StreamWriter(
+    batch_size=int(os.getenv("STREAM_BATCH_SIZE", "200")),
+    flush_interval=float(os.getenv("STREAM_FLUSH_INTERVAL", "0.05")),
+    max_buffer=int(os.getenv("STREAM_MAX_BUFFER", "50000")),
+    spill_path=os.getenv("STREAM_SPILL_PATH", "data/stream_spill.ndjson")
+)
+
 # WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = defaultdict(list)
-    
-    async def connect(self, websocket: WebSocket, channel: str):
-        await websocket.accept()
-        self.active_connections[channel].append(websocket)
-    
-    def disconnect(self, websocket: WebSocket, channel: str):
-        self.active_connections[channel].remove(websocket)
-    
-    async def broadcast(self, message: dict, channel: str):
-        """Broadcast message to all connections in a channel"""
-        for connection in self.active_connections[channel]:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+WS_SLOW_CLIENT_POLICY = os.getenv("WS_SLOW_CLIENT_POLICY", DROP_OLDEST)
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+# "redis" relays broadcasts so dashboards on every node see every node's events
+WS_FANOUT_BACKEND = os.getenv("WS_FANOUT_BACKEND", "memory")
 
-manager = ConnectionManager()
+manager = ConnectionManager(
+    max_queue=WS_SEND_QUEUE_SIZE,
+    policy=WS_SLOW_CLIENT_POLICY,
+    send_timeout=WS_SEND_TIMEOUT
+)
+
+# Event bus for streaming clients (SSE); "redis" shares events across nodes
+EVENT_BUS_BACKEND = os.getenv("EVENT_BUS_BACKEND", "memory")
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+
+event_bus = EventBus()
 
 # ===== DATA MODELS =====
 
@@ -111,6 +150,8 @@ class CaseEvent(BaseModel):
     timestamp: Optional[datetime] = None
     reported_by: str
     notes: Optional[str] = None
+    # Client-chosen key, the same on every retry; repeats are not ingested twice
+    idempotency_key: Optional[str] = None
 
 class ResourceEvent(BaseModel):
     hospital_id: str
@@ -148,51 +189,356 @@ class Alert(BaseModel):
     recommended_actions: List[Dict[str, str]]
     created_at: datetime
     status: str = "active"
+    # Repeat triggers within the debounce window are folded into one alert
+    occurrences: int = 1
+    updated_at: Optional[datetime] = None
+    notified_case_count: Optional[int] = None  # case count when subscribers were last told
 
 # ===== IN-MEMORY STATE (for prototype) =====
 # In production, this would be Redis/TimescaleDB
 
+# Case log tiering: recent cases stay in memory, older ones are compacted to disk
+CASE_LOG_DIR = os.getenv("CASE_LOG_DIR", "data/case_log")
+CASE_LOG_HOT_HOURS = float(os.getenv("CASE_LOG_HOT_HOURS", "24"))
+CASE_LOG_RETENTION_DAYS = float(os.getenv("CASE_LOG_RETENTION_DAYS", "30"))
+CASE_LOG_COMPACT_INTERVAL = float(os.getenv("CASE_LOG_COMPACT_INTERVAL", "300"))  # seconds
+# Range-count index over the whole log (retention period), per ward and disease
+CASE_INDEX_BUCKET_MINUTES = float(os.getenv("CASE_INDEX_BUCKET_MINUTES", "15"))
+
+# Warm start: periodic state snapshots plus case_events replay (in-memory state only)
+STATE_SNAPSHOT_PATH = os.getenv("STATE_SNAPSHOT_PATH", "data/state_snapshot.npz")
+STATE_SNAPSHOT_INTERVAL = float(os.getenv("STATE_SNAPSHOT_INTERVAL", "300"))  # seconds
+STREAM_REPLAY_PAGE_SIZE = int(os.getenv("STREAM_REPLAY_PAGE_SIZE", "10000"))
+SNAPSHOT_MARKER_SLACK_MS = 60000  # tolerated clock skew between this host and Redis
+
+# Write-ahead log making in-memory state durable without Redis (group commit every interval)
+WAL_ENABLED = os.getenv("WAL_ENABLED", "1") == "1"
+WAL_DIR = os.getenv("WAL_DIR", "data/wal")
+WAL_SEGMENT_MB = int(os.getenv("WAL_SEGMENT_MB", "64"))
+WAL_COMMIT_INTERVAL = float(os.getenv("WAL_COMMIT_INTERVAL", "0.002"))  # seconds
+# Acknowledge writes only once they are on disk. Off by default: in `python realtime_wal.py`
+# (1 CPU) it kept 83-90% of the no-WAL ingest rate, against 87-97% for the log alone -
+# a known gap to the "within a few percent" target. Without it a crash can lose the
+# last WAL_COMMIT_INTERVAL (plus the commit in flight) of acknowledged writes.
+WAL_SYNC_ACK = os.getenv("WAL_SYNC_ACK", "0") == "1"
+
+# Event time: a case more than ALLOWED_LATENESS_HOURS behind the newest case time seen
+# is too late for the ward windows (capped at their 24h horizon). It is still logged,
+# but goes to the late_case_events side output instead of the windows.
+ALLOWED_LATENESS_HOURS = float(os.getenv("ALLOWED_LATENESS_HOURS", "24"))
+LATE_CASE_HISTORY = int(os.getenv("LATE_CASE_HISTORY", "1000"))
+
+# Alerts kept for queries; beyond this the oldest non-active ones are evicted, then
+# the oldest of any status not updated for ALERT_RETENTION_HOURS
+ALERT_HISTORY_SIZE = int(os.getenv("ALERT_HISTORY_SIZE", "10000"))
+ALERT_RETENTION_HOURS = float(os.getenv("ALERT_RETENTION_HOURS", "24"))
+# Repeat triggers for an open (ward, disease, severity) alert update it instead of raising
+# a new one, unless it has been quiet this long; subscribers are re-notified only when
+# the case count has grown by the escalation factor since they were last told
+ALERT_DEBOUNCE_SECONDS = float(os.getenv("ALERT_DEBOUNCE_SECONDS", "1800"))
+ALERT_ESCALATION_FACTOR = float(os.getenv("ALERT_ESCALATION_FACTOR", "2"))
+
+# Where ward windows live: "memory" (per process) or "redis" (shared by all workers and nodes).
+# In shared mode idempotency keys are in Redis too, and alerts are recorded on the
+# `alert_events` stream so a starting worker loads them; the case log (behind
+# /realtime/case-counts and /realtime/late-cases, which answer 501 then) stays per
+# process, and there is no warm start, WAL or snapshot: Redis is the durable copy,
+# and a case is acknowledged once its ward windows are written there.
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+STATE_KEY_PREFIX = os.getenv("STATE_KEY_PREFIX", "smc:")
+SHARED_REFRESH_SECONDS = float(os.getenv("SHARED_REFRESH_SECONDS", "1"))
+
+# Outbreak probability: "heuristic" (velocity/growth formula) or "streaming"
+# (StreamingOutbreakPredictor, needs river). Model calls are micro-batched onto a
+# worker thread; a prediction slower than MODEL_TIMEOUT falls back to the heuristic
+OUTBREAK_MODEL = os.getenv("OUTBREAK_MODEL", "heuristic")
+MODEL_BATCH_SIZE = int(os.getenv("MODEL_BATCH_SIZE", "64"))
+MODEL_BATCH_DELAY = float(os.getenv("MODEL_BATCH_DELAY", "0.002"))  # seconds
+MODEL_TIMEOUT = float(os.getenv("MODEL_TIMEOUT", "0.1"))  # seconds
+# The model learns online from outcomes: what it was asked about a ward is labelled
+# 6h later by whether the ward then had MODEL_OUTBREAK_CASES_6H or more cases in the
+# last 6h. The heuristic is reported until MODEL_WARMUP_LABELS of each outcome are learned.
+MODEL_OUTBREAK_CASES_6H = int(os.getenv("MODEL_OUTBREAK_CASES_6H", "10"))
+MODEL_SAMPLE_MINUTES = float(os.getenv("MODEL_SAMPLE_MINUTES", "15"))  # per ward
+MODEL_WARMUP_LABELS = int(os.getenv("MODEL_WARMUP_LABELS", "50"))
+MODEL_LABEL_HORIZON = 6 * 3600  # seconds; matches the case_count_6h window
+
+def score_ward_risk(ward_id: str, counts: Dict[str, float], disease_counts: Dict[str, int],
+                    outbreak_prob: Optional[float] = None) -> WardRiskScore:
+    """
+    Risk model: turn a ward's window counts into a scored, levelled result.
+    `outbreak_prob` comes from the outbreak model when one is enabled.
+    """
+    case_count_1h = counts['case_count_1h']
+    case_count_24h = counts['case_count_24h']
+    
+    # Case velocity (cases per hour) and 6h-vs-18h growth rate
+    case_velocity = counts['case_velocity']
+    growth_rate = counts['growth_rate']
+    
+    # Heuristic outbreak probability unless the model supplied one
+    if outbreak_prob is None:
+        outbreak_prob = case_velocity * 0.1 + growth_rate * 0.01
+    outbreak_prob = min(1.0, max(0.0, outbreak_prob))
+    
+    # Anomaly detection (simple Z-score)
+    anomaly_detected = case_velocity > 10 or growth_rate > 100
+    
+    # Calculate composite risk score
+    risk_score = (
+        outbreak_prob * 40 +
+        (1 if anomaly_detected else 0) * 30 +
+        min(growth_rate, 100) * 0.2 +
+        min(case_velocity, 20) * 1.5
+    )
+    # Components sum past 100 in a fast outbreak and go negative as one fades
+    risk_score = min(100.0, max(0.0, risk_score))
+    
+    # Determine risk level
+    if risk_score >= 60:
+        risk_level = RiskLevel.RED
+    elif risk_score >= 30:
+        risk_level = RiskLevel.YELLOW
+    else:
+        risk_level = RiskLevel.GREEN
+    
+    top_disease = top_ward_disease(disease_counts)
+    
+    # Recommended actions
+    actions = []
+    if risk_level == RiskLevel.RED:
+        actions = [
+            "Deploy emergency response team immediately",
+            "Activate additional healthcare workers",
+            "Implement containment measures"
+        ]
+    elif risk_level == RiskLevel.YELLOW:
+        actions = [
+            "Enhanced surveillance required",
+            "Increase testing capacity",
+            "Prepare additional resources"
+        ]
+    else:
+        actions = ["Continue routine monitoring"]
+    
+    return WardRiskScore(
+        ward_id=ward_id,
+        ward_name=f"Ward {ward_id}",
+        risk_score=round(risk_score, 2),
+        risk_level=risk_level,
+        outbreak_probability=round(outbreak_prob, 3),
+        anomaly_detected=anomaly_detected,
+        case_count_1h=case_count_1h,
+        case_count_24h=case_count_24h,
+        case_velocity=round(case_velocity, 2),
+        growth_rate=round(growth_rate, 2),
+        top_disease=top_disease,
+        recommended_actions=actions,
+        timestamp=datetime.now()
+    )
+
+# Case IDs are a random per-process tag plus a counter: unique across workers and
+# restarts, and stored compactly by the case log (see ColumnarCaseStore)
+CASE_ID_TAG = f"case_{uuid.uuid4().hex[:12]}"
+case_id_counter = itertools.count()
+
+def new_case_id() -> str:
+    return f"{CASE_ID_TAG}_{next(case_id_counter)}"
+
+def top_ward_disease(disease_counts: Dict[str, int]) -> str:
+    return max(disease_counts.items(), key=lambda x: x[1])[0] if disease_counts else "none"
+
+def load_outbreak_model() -> Optional[MicroBatcher]:
+    """Micro-batched StreamingOutbreakPredictor, if OUTBREAK_MODEL asks for it and river is installed"""
+    if OUTBREAK_MODEL != "streaming":
+        return None
+    if StreamingOutbreakPredictor is None:
+        print("⚠ river not installed - using heuristic outbreak probability")
+        return None
+    predictor = StreamingOutbreakPredictor()
+    print("✓ Streaming outbreak model enabled (micro-batched, trained on 6h outcomes)")
+    return MicroBatcher(
+        lambda batch: [predictor.predict(ward_data)['outbreak_probability'] for ward_data in batch],
+        max_batch=MODEL_BATCH_SIZE,
+        max_delay=MODEL_BATCH_DELAY,
+        learn_batch=lambda samples: [predictor.update(ward_data, label) for ward_data, label in samples]
+    )
+
 class RealTimeState:
-    def __init__(self):
-        self.cases = []
+    def __init__(self, window_bucket: timedelta = timedelta(minutes=1),
+                 wards: Optional[WardStateBackend] = None):
+        self.cases = CaseLog(
+            segment_dir=CASE_LOG_DIR,
+            hot_window=timedelta(hours=CASE_LOG_HOT_HOURS),
+            retention=timedelta(days=CASE_LOG_RETENTION_DAYS),
+            hot=ColumnarCaseStore(
+                diseases=[d.value for d in DiseaseType],
+                severities=[s.value for s in Severity]
+            )
+        )
+        self.case_index = self.new_case_index()
         self.resources = {}
-        self.ward_stats = {}
-        self.alerts = []
-        self.ml_models = {}
+        self.wards = wards or InMemoryWardState(window_bucket)
+        self.watermark = Watermark(timedelta(hours=ALLOWED_LATENESS_HOURS))
+        self.late_cases: deque = deque(maxlen=LATE_CASE_HISTORY)  # side output, newest last
+        self.alerts = AlertStore(
+            max_alerts=ALERT_HISTORY_SIZE,
+            retention=ALERT_RETENTION_HOURS * 3600,
+            on_evict=lambda alert: self.dashboard.record_alert_status(alert['status'], None)
+        )
+        self.outbreak_model: Optional[MicroBatcher] = None  # see load_outbreak_model
+        self.outcome_samples = OutcomeSampler(
+            horizon=MODEL_LABEL_HORIZON,
+            sample_every=MODEL_SAMPLE_MINUTES * 60,
+            warmup=MODEL_WARMUP_LABELS
+        )
+        self.model_fallbacks = 0
+        self.window_bucket = window_bucket
+        self.dashboard = DashboardAggregates(window_bucket)
+        self._levels_refreshed_bucket = None
+        self.hospital_load = HospitalLoadView(self.get_zone)
+        self._load_refreshed_key = None
+        # ward_id -> (refresh bucket, score); dropped when the ward gets cases
+        self.risk_cache: Dict[str, Tuple[int, WardRiskScore]] = {}
+        self.risk_cache_hits = 0
+        self.risk_cache_misses = 0
+        # ward_id -> changes so far, so a score computed across a model call
+        # is not cached if the ward changed meanwhile
+        self.ward_changes: Dict[str, int] = defaultdict(int)
+        self.expiries = 0  # expiry passes that changed some ward
+        self.wal: Optional[WriteAheadLog] = None  # attached at startup, after recovery
     
-    def add_case(self, case: CaseEvent):
+    @staticmethod
+    def new_case_index() -> CaseCountIndex:
+        return CaseCountIndex(bucket=timedelta(minutes=CASE_INDEX_BUCKET_MINUTES),
+                              horizon=timedelta(days=CASE_LOG_RETENTION_DAYS))
+    
+    async def add_case(self, case: CaseEvent, case_id: Optional[str] = None) -> Dict[str, Any]:
         """Add case and update statistics"""
-        case_dict = case.dict()
-        case_dict['timestamp'] = case_dict['timestamp'] or datetime.now()
-        case_dict['id'] = f"case_{datetime.now().timestamp()}"
-        self.cases.append(case_dict)
-        
-        # Update ward stats
-        ward_id = case.ward_id
-        if ward_id not in self.ward_stats:
-            self.ward_stats[ward_id] = {
-                'cases_1h': [],
-                'cases_24h': [],
-                'disease_counts': defaultdict(int)
-            }
+        by_ward = await self.add_cases([case], [case_id] if case_id is not None else None)
+        return by_ward[case.ward_id][0]
+    
+    async def add_cases(self, cases: List[CaseEvent],
+                        case_ids: Optional[List[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Add a batch of cases, updating each ward's statistics once.
+        Cases get new IDs unless `case_ids` (already acknowledged) is given.
+        Each case is counted in the bucket of its own timestamp; cases behind
+        the watermark are stored with `late` set but not counted, and wards
+        that only received those keep their cached risk.
         
+        Returns:
+            Stored case dicts grouped by ward
+        """
         now = datetime.now()
-        self.ward_stats[ward_id]['cases_1h'].append(case_dict)
-        self.ward_stats[ward_id]['cases_24h'].append(case_dict)
-        self.ward_stats[ward_id]['disease_counts'][case.disease_type.value] += 1
+        by_ward: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        counted: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        bucket_counts = defaultdict(int)
+        case_dicts = []
+        for i, case in enumerate(cases):
+            case_dict = case.dict()
+            case_dict['timestamp'] = case_dict['timestamp'] or now
+            case_dict['id'] = case_ids[i] if case_ids is not None else new_case_id()
+            case_dicts.append(case_dict)
+        # The whole batch is encoded before any of it is stored, so a bad case
+        # fails the batch without leaving the case log ahead of the other tiers
+        self.cases.append_many(case_dicts)
         
-        # Clean old data
-        cutoff_1h = now - timedelta(hours=1)
-        cutoff_24h = now - timedelta(hours=24)
+        for case, case_dict in zip(cases, case_dicts):
+            late = not self.watermark.admit(case_dict['timestamp'], now)
+            if late:
+                case_dict['late'] = True
+            self.case_index.add(case.ward_id, case.disease_type.value, case_dict['timestamp'], now=now)
+            # Queued for the Redis stream (if available) in the same step as the
+            # state change, so snapshot markers split the stream exactly
+            data = orjson.dumps(case_dict, default=str)
+            stream_writer.submit("case_events", {"data": data.decode()})
+            if self.wal is not None:
+                self.wal.append(RECORD_CASE, data)
+            by_ward[case.ward_id].append(case_dict)
+            if late:
+                self.late_cases.append(case_dict)
+                stream_writer.submit("late_case_events", {"data": data.decode()})
+                continue
+            counted[case.ward_id].append(case_dict)
+            bucket_counts[self.dashboard.cases_24h.bucket_index(case_dict['timestamp'])] += 1
         
-        self.ward_stats[ward_id]['cases_1h'] = [
-            c for c in self.ward_stats[ward_id]['cases_1h']
-            if c['timestamp'] > cutoff_1h
-        ]
-        self.ward_stats[ward_id]['cases_24h'] = [
-            c for c in self.ward_stats[ward_id]['cases_24h']
-            if c['timestamp'] > cutoff_24h
-        ]
+        await self.wards.add_cases(counted)
+        for ward_id in counted:
+            self.risk_cache.pop(ward_id, None)
+            self.ward_changes[ward_id] += 1
+            if ward_id not in self.dashboard.ward_levels:
+                self.dashboard.record_ward_level(ward_id, RiskLevel.GREEN.value)
+        for bucket, count in bucket_counts.items():
+            self.dashboard.record_case(bucket * self.dashboard.cases_24h.bucket_seconds, count)
+        return by_ward
+    
+    def add_alert(self, alert: Alert) -> Dict[str, Any]:
+        """Store a new alert and update dashboard counters"""
+        alert_dict = alert.dict()
+        alert_dict['updated_at'] = alert_dict['updated_at'] or alert_dict['created_at']
+        if alert_dict['notified_case_count'] is None:
+            alert_dict['notified_case_count'] = alert_dict['case_count']
+        self.alerts.add(alert_dict)
+        self.dashboard.record_alert_status(None, alert_dict['status'])
+        if self.wal is not None:
+            self.wal.append(RECORD_ALERT, alert_dict)
+        return alert_dict
+    
+    def update_alert(self, alert_id: str, **changes) -> Optional[Dict[str, Any]]:
+        """Change a stored alert and update dashboard counters"""
+        alert_dict = self.alerts.get(alert_id)
+        if alert_dict is None:
+            return None
+        old_status = alert_dict['status']
+        alert_dict = self.alerts.update(alert_id, **changes)
+        self.dashboard.record_alert_status(old_status, alert_dict['status'])
+        if self.wal is not None:
+            # Logged whole, so replay is the same upsert as for new alerts
+            self.wal.append(RECORD_ALERT, alert_dict)
+        return alert_dict
+    
+    def store_alert(self, alert: Alert) -> Optional[Dict[str, Any]]:
+        """
+        Apply an alert recorded elsewhere (another node, the WAL): added if
+        unknown, replaced if it has more occurrences than the stored copy.
+        
+        Returns:
+            The stored alert dict, or None if the stored copy was already newer
+        """
+        existing = self.alerts.get(alert.id)
+        if existing is None:
+            return self.add_alert(alert)
+        if alert.occurrences <= existing['occurrences']:
+            return None
+        return self.update_alert(alert.id, **alert.dict(exclude={'id'}))
+    
+    def trigger_alert(self, alert: Alert) -> Tuple[Dict[str, Any], str]:
+        """
+        Raise `alert`, or fold it into the open alert for the same ward,
+        disease and severity if that was last triggered within
+        ALERT_DEBOUNCE_SECONDS.
+        
+        Returns:
+            (alert dict, outcome) with outcome "created", "escalated" (case count
+            grew by ALERT_ESCALATION_FACTOR since subscribers were last told)
+            or "coalesced" (counters updated, nothing to announce)
+        """
+        existing = self.alerts.find_open(alert.ward_id, alert.disease_type, alert.severity)
+        quiet = to_epoch(alert.created_at) - to_epoch(existing['updated_at']) if existing else None
+        if existing is None or quiet > ALERT_DEBOUNCE_SECONDS:
+            return self.add_alert(alert), "created"
+        
+        changes = {
+            'occurrences': existing['occurrences'] + 1,
+            'case_count': alert.case_count,
+            'outbreak_probability': max(existing['outbreak_probability'], alert.outbreak_probability),
+            'updated_at': alert.created_at
+        }
+        escalated = alert.case_count >= existing['notified_case_count'] * ALERT_ESCALATION_FACTOR
+        if escalated:
+            changes['notified_case_count'] = alert.case_count
+        return self.update_alert(existing['id'], **changes), "escalated" if escalated else "coalesced"
     
     def update_resource(self, resource: ResourceEvent):
         """Update hospital resource"""
@@ -201,6 +547,13 @@ class RealTimeState:
         
         key = f"{resource.hospital_id}_{resource.resource_type}"
         self.resources[key] = resource_dict
+        if self.wal is not None:
+            self.wal.append(RECORD_RESOURCE, resource_dict)
+    
+    async def sync(self):
+        """Wait until every change made so far is in the write-ahead log on disk (if WAL_SYNC_ACK)"""
+        if self.wal is not None and WAL_SYNC_ACK:
+            await self.wal.wait(self.wal.lsn)
     
     def get_zone(self, patient_count):
         if patient_count >= 100:
@@ -211,359 +564,1350 @@ class RealTimeState:
             return "blue"
 
 
-    def get_ward_risk(self, ward_id: str) -> WardRiskScore:
-        """Calculate real-time ward risk score"""
-        stats = self.ward_stats.get(ward_id, {
-            'cases_1h': [],
-            'cases_24h': [],
-            'disease_counts': defaultdict(int)
-        })
+    def _refresh_key(self) -> int:
+        """
+        Moves on when ward-derived caches may be stale without having been
+        told. In-memory windows only change through `add_cases` and
+        `expire_windows`, which invalidate what they touch; shared state also
+        changes under other workers, so it is re-read every SHARED_REFRESH_SECONDS.
+        """
+        if self.wards.shared:
+            return int(datetime.now().timestamp() // SHARED_REFRESH_SECONDS)
+        return 0
+    
+    async def get_ward_risk(self, ward_id: str) -> WardRiskScore:
+        """
+        Real-time ward risk score, memoized until the ward gets new cases
+        or its window counts expire.
+        """
+        bucket = self._refresh_key()
+        cached = self.risk_cache.get(ward_id)
+        if cached is not None and cached[0] == bucket:
+            self.risk_cache_hits += 1
+            return cached[1]
+        self.risk_cache_misses += 1
         
-        case_count_1h = len(stats['cases_1h'])
-        case_count_24h = len(stats['cases_24h'])
+        snapshot = await self.wards.ward_snapshot(ward_id)
+        if snapshot is None:
+            # Not cached: any ward ID can be requested
+            return score_ward_risk(ward_id, window_snapshot(0, 0, 0), {})
         
-        # Calculate case velocity (cases per hour)
-        case_velocity = case_count_1h
+        counts, disease_counts = snapshot
+        changes = self.ward_changes[ward_id]
+        outbreak_prob = await self.predict_outbreak(ward_id, counts, disease_counts)
+        ward_risk = score_ward_risk(ward_id, counts, disease_counts, outbreak_prob)
+        if self.ward_changes[ward_id] == changes:
+            self.dashboard.record_ward_level(ward_id, ward_risk.risk_level.value)
+            self.risk_cache[ward_id] = (bucket, ward_risk)
+        return ward_risk
+    
+    async def get_ward_risks(self, ward_ids: List[str]) -> Dict[str, WardRiskScore]:
+        """Risk for several wards; with an outbreak model their predictions share batches"""
+        if self.outbreak_model is None:
+            return {ward_id: await self.get_ward_risk(ward_id) for ward_id in ward_ids}
+        scores = await asyncio.gather(*(self.get_ward_risk(ward_id) for ward_id in ward_ids))
+        return dict(zip(ward_ids, scores))
+    
+    async def predict_outbreak(self, ward_id: str, counts: Dict[str, float],
+                               disease_counts: Dict[str, int]) -> Optional[float]:
+        """
+        Model outbreak probability, or None for the heuristic (no model, not
+        trained enough yet, or it failed or was slow)
+        """
+        if self.outbreak_model is None:
+            return None
+        ward_data = dict(counts, top_disease=top_ward_disease(disease_counts))
+        self.outcome_samples.record(ward_id, ward_data)
+        if not self.outcome_samples.warm:
+            return None
+        try:
+            # Awaiting yields the event loop; the model itself runs on its worker thread
+            return await asyncio.wait_for(self.outbreak_model.predict(ward_id, ward_data), MODEL_TIMEOUT)
+        except Exception as e:
+            self.model_fallbacks += 1
+            if self.model_fallbacks == 1 or self.model_fallbacks % 1000 == 0:
+                print(f"⚠ Outbreak model unavailable ({self.model_fallbacks} fallbacks):", repr(e))
+            return None
+    
+    def outbreak_model_stats(self) -> Optional[Dict[str, Any]]:
+        if self.outbreak_model is None:
+            return None
+        return dict(self.outbreak_model.stats(), fallbacks=self.model_fallbacks,
+                    training=self.outcome_samples.stats())
+    
+    def risk_cache_stats(self) -> Dict[str, Any]:
+        lookups = self.risk_cache_hits + self.risk_cache_misses
+        return {
+            "entries": len(self.risk_cache),
+            "hits": self.risk_cache_hits,
+            "misses": self.risk_cache_misses,
+            "hit_rate": round(self.risk_cache_hits / lookups, 3) if lookups else 0
+        }
+
+    async def get_dashboard_snapshot(self) -> Dict[str, Any]:
+        """
+        Precomputed dashboard counters. Levels of in-memory wards are kept
+        current by ingest and `expire_windows`; with a shared backend, totals
+        and levels written by other workers are pulled at most once every
+        SHARED_REFRESH_SECONDS.
+        """
+        bucket = self._refresh_key()
+        if bucket != self._levels_refreshed_bucket:
+            self._levels_refreshed_bucket = bucket
+            if self.wards.shared:
+                self.dashboard.record_shared_total(await self.wards.total_cases_24h())
+            await self.get_ward_risks(await self.wards.ward_ids())
+        return self.dashboard.snapshot()
+    
+    async def get_hospital_load(self) -> HospitalLoadView:
+        """
+        Versioned ward load for /realtime/hospital-load. Totals are re-read
+        only after new cases or expiries (shared backend: also once every
+        SHARED_REFRESH_SECONDS), so idle polls cost a key comparison.
+        """
+        key = (self._refresh_key(), self.dashboard.version, self.expiries)
+        if key != self._load_refreshed_key:
+            self._load_refreshed_key = key
+            self.hospital_load.refresh(await self.wards.ward_totals())
+        return self.hospital_load
+    
+    async def expire_windows(self, now: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Age ward windows to `now`, recomputing only the wards whose counts
+        changed; wards with nothing left in the last 24h are dropped.
         
-        # Calculate growth rate
-        if case_count_24h > 0:
-            recent_6h = len([c for c in stats['cases_24h'] 
-                           if c['timestamp'] > datetime.now() - timedelta(hours=6)])
-            old_6h = case_count_24h - recent_6h
-            growth_rate = ((recent_6h - old_6h) / max(old_6h, 1)) * 100
-        else:
-            growth_rate = 0
+        Returns:
+            Fresh risk data for every ward that changed (dropped wards score zero)
+        """
+        changed, evicted = await self.wards.expire(now)
+        if not changed:
+            return {}
+        self.expiries += 1
+        for ward_id in changed:
+            self.risk_cache.pop(ward_id, None)
+            self.ward_changes[ward_id] += 1
+        for ward_id in evicted:
+            self.ward_changes.pop(ward_id, None)
+        ward_risks = {ward_id: ward_risk.dict()
+                      for ward_id, ward_risk in (await self.get_ward_risks(changed)).items()}
+        for ward_id in evicted:
+            self.dashboard.record_ward_level(ward_id, RiskLevel.GREEN.value)
+        return ward_risks
+
+    # ----- Snapshots -----
+
+    def capture_snapshot(self, marker: Optional[str]) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        """
+        Copy state for `save_snapshot`: alerts, cases not yet in disk
+        segments, and ward windows. Synchronous, so it is consistent with
+        the stream position of `marker`.
+        """
+        now = datetime.now().timestamp()
+        wards = self.wards.export(now)
+        meta = {
+            "created": now,
+            "marker": marker,
+            "head": wards.pop('head'),
+            "bucket_seconds": self.window_bucket.total_seconds(),
+            "alerts": list(self.alerts),
+            "resources": self.resources,
+            "wal_lsn": self.wal.lsn if self.wal is not None else None
+        }
+        return meta, {**wards, **pack_cases(self.cases.unpersisted())}
+
+    def restore_snapshot(self, meta: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> int:
+        """
+        Load a snapshot into freshly started state.
         
-        # ML-based outbreak probability (simplified for prototype)
-        outbreak_prob = min(1.0, (case_velocity * 0.1 + growth_rate * 0.01))
+        Returns:
+            Number of cases restored to the hot tier
+        """
+        for alert in meta['alerts']:
+            self.add_alert(Alert.model_validate(alert))
+        for key, resource in meta['resources'].items():
+            self.resources[key] = ResourceEvent.model_validate(resource).dict()
         
-        # Anomaly detection (simple Z-score)
-        anomaly_detected = case_velocity > 10 or growth_rate > 100
+        if meta['bucket_seconds'] == self.window_bucket.total_seconds():
+            self.wards.restore(arrays['ward_ids'], meta['head'], arrays['windows'],
+                               arrays['diseases'], arrays['disease_counts'])
+        else:
+            print("⚠ Snapshot window bucket differs from config; windows rebuilt from cases only")
+            self.replay_windows(unpack_cases(arrays))
         
-        # Calculate composite risk score
-        risk_score = (
-            outbreak_prob * 40 +
-            (1 if anomaly_detected else 0) * 30 +
-            min(growth_rate, 100) * 0.2 +
-            min(case_velocity, 20) * 1.5
-        )
+        # Cases compacted to disk after the snapshot was taken are already in segments
+        cases = unpack_cases(arrays)
+        keep = ~np.isin(cases['id'], self.cases.segment_ids_since(meta['created']))
+        cases = {name: column[keep] for name, column in cases.items()}
+        self.cases.extend(cases)
+        return len(cases['id'])
+
+    def replay_cases(self, cases: Dict[str, np.ndarray], since: float):
+        """
+        Apply column-form cases recovered from a log written after `since`
+        (epoch seconds); cases that reached a disk segment already are not
+        added to the case log twice.
+        """
+        self.replay_windows(cases)
+        keep = ~np.isin(cases['id'], self.cases.segment_ids_since(since))
+        self.cases.extend({name: column[keep] for name, column in cases.items()})
+
+    def replay_wal(self, wal: WriteAheadLog, after_lsn: int, since: float) -> int:
+        """
+        Apply write-ahead log records after `after_lsn`. Call before the log
+        is attached, so replayed changes are not logged again.
         
-        # Determine risk level
-        if risk_score >= 60:
-            risk_level = RiskLevel.RED
-        elif risk_score >= 30:
-            risk_level = RiskLevel.YELLOW
-        else:
-            risk_level = RiskLevel.GREEN
+        Returns:
+            Number of cases replayed
+        """
+        replayed = 0
+        pending: List[Dict[str, Any]] = []
         
-        # Top disease
-        top_disease = max(stats['disease_counts'].items(), 
-                         key=lambda x: x[1])[0] if stats['disease_counts'] else "none"
+        def flush_cases():
+            nonlocal replayed
+            if pending:
+                self.replay_cases(cases_to_columns(pending), since)
+                replayed += len(pending)
+                pending.clear()
         
-        # Recommended actions
-        actions = []
-        if risk_level == RiskLevel.RED:
-            actions = [
-                "Deploy emergency response team immediately",
-                "Activate additional healthcare workers",
-                "Implement containment measures"
-            ]
-        elif risk_level == RiskLevel.YELLOW:
-            actions = [
-                "Enhanced surveillance required",
-                "Increase testing capacity",
-                "Prepare additional resources"
-            ]
-        else:
-            actions = ["Continue routine monitoring"]
+        for kind, record in wal.replay(after_lsn):
+            if kind == RECORD_CASE:
+                pending.append(record)
+                if len(pending) >= STREAM_REPLAY_PAGE_SIZE:
+                    flush_cases()
+            elif kind == RECORD_ALERT:
+                self.store_alert(Alert.model_validate(record))
+            elif kind == RECORD_RESOURCE:
+                resource = ResourceEvent.model_validate(record)
+                self.resources[f"{resource.hospital_id}_{resource.resource_type}"] = resource.dict()
+        flush_cases()
+        return replayed
+
+    def replay_windows(self, cases: Dict[str, np.ndarray]):
+        """Count column-form cases into ward windows, all wards in one vectorized pass"""
+        # Apply the watermark as live ingest did: cases are in ingest order, so the
+        # newest case time seen then is the running maximum (capped at the clock)
+        now = datetime.now().timestamp()
+        newest = np.maximum.accumulate(np.minimum(cases['timestamp'], now))
+        on_time = cases['timestamp'] >= newest - self.watermark.allowed_lateness
+        cases = {name: column[on_time] for name, column in cases.items()}
+        if not len(cases['id']):
+            return
+        bucket_seconds = int(self.window_bucket.total_seconds())
+        head = int(now // bucket_seconds)
+        ward_ids, ward_codes = np.unique(cases['ward_id'], return_inverse=True)
+        diseases, disease_codes = np.unique(cases['disease_type'], return_inverse=True)
         
-        return WardRiskScore(
-            ward_id=ward_id,
-            ward_name=f"Ward {ward_id}",
-            risk_score=round(risk_score, 2),
-            risk_level=risk_level,
-            outbreak_probability=round(outbreak_prob, 3),
-            anomaly_detected=anomaly_detected,
-            case_count_1h=case_count_1h,
-            case_count_24h=case_count_24h,
-            case_velocity=round(case_velocity, 2),
-            growth_rate=round(growth_rate, 2),
-            top_disease=top_disease,
-            recommended_actions=actions,
-            timestamp=datetime.now()
-        )
+        windows = bucket_matrix(ward_codes, cases['timestamp'], len(ward_ids), bucket_seconds,
+                                head, self.dashboard.cases_24h.num_buckets)
+        disease_counts = np.bincount(
+            ward_codes * len(diseases) + disease_codes, minlength=len(ward_ids) * len(diseases)
+        ).reshape(len(ward_ids), len(diseases))
+        self.wards.restore(ward_ids, head, windows, diseases, disease_counts)
+
+    def finish_restore(self):
+        """Rebuild dashboard counters from restored ward windows and the range index from the case log"""
+        self.case_index = self.new_case_index()
+        for batch in self.cases.batches():
+            self.case_index.add_columns(batch)
+        self.risk_cache.clear()
+        self._levels_refreshed_bucket = None
+        wards = self.wards.export()
+        self.dashboard.cases_24h.load(wards['head'], wards['windows'].sum(axis=0))
+        for ward_id in wards['ward_ids'].tolist():
+            self.dashboard.record_ward_level(ward_id, RiskLevel.GREEN.value)
 
 # Global state
 state = RealTimeState()
 
+async def ward_risk_data(ward_id: str) -> Dict[str, Any]:
+    return (await state.get_ward_risk(ward_id)).dict()
+
+# One shared risk publisher per watched ward (see /ws/ward/{ward_id})
+ward_publisher = ChangeDrivenPublisher(
+    manager,
+    compute=ward_risk_data,
+    channel_for=lambda ward_id: f"ward_{ward_id}",
+    message_type="ward_risk_update",
+    # Safety net only: in-memory expiries notify the publisher (see sweep_windows)
+    bucket_seconds=3600
+)
+
 # ===== STARTUP/SHUTDOWN =====
 
+async def compact_case_log():
+    """Periodically move old cases to disk segments and apply retention"""
+    while True:
+        await asyncio.sleep(CASE_LOG_COMPACT_INTERVAL)
+        try:
+            # Rows from a previously failed write are still in `compacting` and get retried
+            state.cases.take_compactable()
+            batch = list(state.cases.compacting)
+            segment = await asyncio.to_thread(state.cases.persist_batch, batch)
+            state.cases.register_segment(segment)
+            state.cases.expire()
+        except Exception as e:
+            print("⚠ Case log compaction failed:", e)
+
+def sync_remote_alert(event_id: int, message: Dict[str, Any]):
+    """Store alerts raised or escalated by other workers/nodes as they arrive on the event bus"""
+    existing = state.alerts.get(message['id'])
+    if existing is None or message.get('occurrences', 1) > existing['occurrences']:
+        state.store_alert(Alert.model_validate(message))
+
+event_bus.add_listener("alerts", sync_remote_alert)
+
+def capture_state_snapshot() -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """Copy in-memory state and mark the matching position in the case_events stream"""
+    marker = uuid.uuid4().hex
+    # Submitted in the same step as the capture: cases before it are in the snapshot
+    if not stream_writer.submit("case_events", {MARKER_FIELD: marker}):
+        marker = None
+    return state.capture_snapshot(marker)
+
+async def write_state_snapshot():
+    meta, arrays = capture_state_snapshot()
+    size = await asyncio.to_thread(save_snapshot, STATE_SNAPSHOT_PATH, meta, arrays)
+    dropped = state.wal.drop_before(meta['wal_lsn']) if state.wal is not None else 0
+    print(f"✓ State snapshot written ({size / 1024:.0f} KiB, {dropped} WAL segments released)")
+
+async def snapshot_state():
+    """Periodically snapshot in-memory state for warm restarts"""
+    while True:
+        await asyncio.sleep(STATE_SNAPSHOT_INTERVAL)
+        try:
+            await write_state_snapshot()
+        except Exception as e:
+            print("⚠ State snapshot failed:", e)
+
+async def sweep_windows():
+    """
+    At every window bucket boundary, expire cases that aged out of ward
+    windows and push fresh risk for just those wards to ward and admin
+    subscribers. With shared state every worker sweeps, but each change
+    is found (and pushed) by only one of them.
+    """
+    bucket_seconds = state.window_bucket.total_seconds()
+    while True:
+        await asyncio.sleep(bucket_seconds - time.time() % bucket_seconds + 0.01)
+        try:
+            if state.wards.shared:
+                await trim_alert_events()
+            ward_risks = await state.expire_windows()
+            if not ward_risks:
+                continue
+            for ward_id in ward_risks:
+                ward_publisher.notify(ward_id)
+            await manager.broadcast(
+                Payload({"type": "ward_risks_expired", "ward_risks": ward_risks}),
+                "admin"
+            )
+        except Exception as e:
+            print("⚠ Window expiry sweep failed:", e)
+
+async def train_outbreak_model():
+    """
+    Label outbreak model samples once their 6h outcome is known (the ward's
+    case_count_6h now) and train the model on them.
+    """
+    while True:
+        await asyncio.sleep(60)
+        try:
+            samples = []
+            for ward_id, ward_data in state.outcome_samples.due():
+                snapshot = await state.wards.ward_snapshot(ward_id)
+                cases_6h = snapshot[0]['case_count_6h'] if snapshot is not None else 0
+                samples.append((ward_data, cases_6h >= MODEL_OUTBREAK_CASES_6H))
+            if samples:
+                await state.outbreak_model.learn(samples)
+                state.outcome_samples.learned([label for _, label in samples])
+        except Exception as e:
+            print("⚠ Outbreak model training failed:", e)
+
+# Outcome of the startup warm start, reported by /health
+warm_start_stats: Dict[str, Any] = {}
+
+async def warm_start():
+    """
+    Rebuild in-memory state from the latest snapshot, then replay what was
+    logged after it: the write-ahead log if enabled, otherwise the
+    case_events stream (the last 24h of either without a snapshot).
+    """
+    started = time.perf_counter()
+    snapshot = await asyncio.to_thread(load_snapshot, STATE_SNAPSHOT_PATH)
+    restored = 0
+    if snapshot is not None:
+        meta, arrays = snapshot
+        restored = state.restore_snapshot(meta, arrays)
+        after_ms, marker = int(meta['created'] * 1000), meta['marker']
+    else:
+        after_ms, marker = int((time.time() - 24 * 3600) * 1000), None
+    
+    wal = None
+    if WAL_ENABLED:
+        wal = WriteAheadLog(WAL_DIR, segment_bytes=WAL_SEGMENT_MB * 1024 * 1024,
+                            commit_interval=WAL_COMMIT_INTERVAL)
+    
+    replayed, source = 0, "none"
+    # A snapshot taken with the log disabled has no position in it; use the stream then
+    if wal is not None and (snapshot is None or meta.get('wal_lsn') is not None):
+        after_lsn = meta['wal_lsn'] if snapshot is not None else 0
+        replayed = await asyncio.to_thread(state.replay_wal, wal, after_lsn, after_ms / 1000)
+        source = "write-ahead log"
+    elif redis_client is not None:
+        source = "stream"
+        async for page in replay_pages(redis_client, "case_events", after_ms, marker,
+                                       page_size=STREAM_REPLAY_PAGE_SIZE,
+                                       slack_ms=SNAPSHOT_MARKER_SLACK_MS if snapshot else 0):
+            cases = cases_from_entries(page)
+            state.replay_cases(cases, after_ms / 1000)
+            replayed += len(cases['id'])
+    
+    if wal is not None:
+        state.wal = wal
+        wal.start()
+    
+    state.finish_restore()
+    await state.get_dashboard_snapshot()
+    elapsed = time.perf_counter() - started
+    warm_start_stats.update({
+        "snapshot_cases": restored,
+        "replayed_cases": replayed,
+        "replayed_from": source,
+        "wards": len(state.dashboard.ward_levels),
+        "alerts": len(state.alerts),
+        "ready_ms": round(elapsed * 1000, 1)
+    })
+    print(f"✓ Warm start: {restored:,} cases from snapshot, {replayed:,} replayed from {source}, "
+          f"{len(state.dashboard.ward_levels)} wards - ready in {elapsed * 1000:.0f} ms")
+
+async def trim_alert_events() -> int:
+    """Drop `alert_events` entries older than ALERT_RETENTION_HOURS; returns the cutoff (ms)"""
+    after_ms = int((time.time() - ALERT_RETENTION_HOURS * 3600) * 1000)
+    await redis_client.xtrim("alert_events", minid=after_ms, approximate=False)
+    return after_ms
+
+async def load_shared_alerts():
+    """
+    Shared mode: load the last ALERT_RETENTION_HOURS of alerts from the
+    `alert_events` stream (each alert's latest record wins), dropping
+    older entries from it.
+    """
+    after_ms = await trim_alert_events()
+    async for page in read_stream(redis_client, "alert_events", str(after_ms),
+                                  page_size=STREAM_REPLAY_PAGE_SIZE):
+        for _, fields in page:
+            state.store_alert(Alert.model_validate(orjson.loads(fields["data"])))
+    print(f"✓ Loaded {len(state.alerts)} shared alerts")
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize connections on startup"""
-    global redis_client
+    global redis_client, idempotency_keys
+    asyncio.create_task(compact_case_log())
     try:
         redis_client = await redis.from_url("redis://localhost:6379", decode_responses=True)
+        await redis_client.ping()
         print("✓ Connected to Redis")
+        stream_writer.start(redis_client)
+        if STATE_BACKEND == "redis":
+            state.wards = RedisWardState(redis_client, prefix=STATE_KEY_PREFIX)
+            idempotency_keys = RedisIdempotencyKeys(redis_client, prefix=STATE_KEY_PREFIX,
+                                                    window=IDEMPOTENCY_WINDOW)
+            # Ward publishers only hear about local ingests; poll for the rest
+            ward_publisher.bucket_seconds = SHARED_REFRESH_SECONDS
+            await load_shared_alerts()
+            print("✓ Ward state, idempotency keys and alerts shared through Redis")
+        if EVENT_BUS_BACKEND == "redis" or STATE_BACKEND == "redis":
+            # Shared state also needs shared events, so every node sees every alert
+            await event_bus.attach_redis(redis_client)
+            print("✓ Event bus using Redis pub/sub")
+        if WS_FANOUT_BACKEND == "redis" or STATE_BACKEND == "redis":
+            await manager.attach_redis(redis_client)
+            print("✓ WebSocket broadcasts relayed through Redis pub/sub")
     except:
         print("⚠ Redis not available - using in-memory state only")
         redis_client = None
+    
+    state.outbreak_model = load_outbreak_model()
+    if state.outbreak_model is not None:
+        asyncio.create_task(train_outbreak_model())
+    if not state.wards.shared:
+        # Shared state already lives in Redis; in-memory state is rebuilt and snapshotted
+        await warm_start()
+        asyncio.create_task(snapshot_state())
+    asyncio.create_task(sweep_windows())
+    if INGEST_MODE == "queue":
+        ingest_queue.start()
+        print(f"✓ Queued ingest: {INGEST_WORKERS} workers, {INGEST_QUEUE_SIZE} cases max")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
+    # Acknowledged cases are applied before anything below is flushed or snapshotted
+    await ingest_queue.stop()
+    snapshot = capture_state_snapshot() if not state.wards.shared else None
+    await event_bus.close()
+    await manager.close()
+    await stream_writer.stop()
+    if state.outbreak_model is not None:
+        await state.outbreak_model.close()
+    if state.wal is not None:
+        await state.wal.stop()
+    if snapshot is not None:
+        # Written after the stream writer flushed, so the marker is in Redis first
+        await asyncio.to_thread(save_snapshot, STATE_SNAPSHOT_PATH, *snapshot)
+        if state.wal is not None:
+            state.wal.drop_before(snapshot[0]['wal_lsn'])
     if redis_client:
         await redis_client.aclose()
 
 # ===== EVENT INGESTION ENDPOINTS =====
 
-@app.post("/events/case", status_code=201)
-async def ingest_case_event(case: CaseEvent, background_tasks: BackgroundTasks):
+# Largest JSON array accepted by /events/case/batch; NDJSON uploads are processed in chunks this size
+CASE_BATCH_MAX_ITEMS = int(os.getenv("CASE_BATCH_MAX_ITEMS", "5000"))
+# Longest single NDJSON line; a longer one is reported and skipped without being buffered
+CASE_LINE_MAX_BYTES = int(os.getenv("CASE_LINE_MAX_BYTES", "65536"))
+
+# "queue": /events/case validates, assigns the case ID and answers 202; a pool of
+# workers applies queued cases in batches. A full queue answers 503 (shed).
+INGEST_MODE = os.getenv("INGEST_MODE", "sync")
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "200"))
+
+# Admission control: token buckets per reporter (cases) and per hospital (resource
+# updates), and a cap on ingest requests in progress. High-severity cases may
+# overdraw their reporter's bucket and use the reserved slots, so they are shed last.
+REPORTER_RATE = float(os.getenv("REPORTER_RATE", "5"))  # sustained cases/s per reporter
+REPORTER_BURST = float(os.getenv("REPORTER_BURST", "50"))
+HOSPITAL_RATE = float(os.getenv("HOSPITAL_RATE", "2"))  # sustained updates/s per hospital
+HOSPITAL_BURST = float(os.getenv("HOSPITAL_BURST", "20"))
+INGEST_MAX_IN_FLIGHT = int(os.getenv("INGEST_MAX_IN_FLIGHT", "256"))
+INGEST_PRIORITY_RESERVE = float(os.getenv("INGEST_PRIORITY_RESERVE", "0.2"))  # share kept for high severity
+
+reporter_limits = TokenBuckets(REPORTER_RATE, REPORTER_BURST)
+hospital_limits = TokenBuckets(HOSPITAL_RATE, HOSPITAL_BURST)
+ingest_limiter = ConcurrencyLimiter(
+    INGEST_MAX_IN_FLIGHT,
+    reserve=int(INGEST_MAX_IN_FLIGHT * INGEST_PRIORITY_RESERVE)
+)
+
+def overloaded(retry_after: float, detail: str) -> HTTPException:
+    return HTTPException(status_code=429, detail=detail,
+                         headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+def check_rate(limits: TokenBuckets, key: str, priority: bool = False):
+    wait = limits.take(key, priority)
+    if wait:
+        raise overloaded(wait, f"Rate limit exceeded for {key}")
+
+@contextmanager
+def admitted(priority: bool = False):
+    """Hold one of the INGEST_MAX_IN_FLIGHT slots for the request, or answer 429"""
+    if not ingest_limiter.try_acquire(priority):
+        raise overloaded(1, "Server busy, retry later")
+    try:
+        yield
+    finally:
+        ingest_limiter.release()
+
+def is_priority(case: CaseEvent) -> bool:
+    return case.severity == Severity.HIGH
+
+def rate_limit_cases(cases: List[CaseEvent]) -> Tuple[List[int], List[int], float]:
     """
-    Ingest a new disease case event.
-    Triggers real-time processing and ML inference.
+    Charge each case to its reporter's bucket, as /events/case does, so
+    batching does not get around the limit.
+    
+    Returns:
+        (positions within the limit, positions over it, longest Retry-After wait)
+    """
+    within, limited, retry_after = [], [], 0.0
+    for position, case in enumerate(cases):
+        wait = reporter_limits.take(case.reported_by, is_priority(case))
+        if wait:
+            limited.append(position)
+            retry_after = max(retry_after, wait)
+        else:
+            within.append(position)
+    return within, limited, retry_after
+
+def rate_limit_error(case: CaseEvent) -> List[Dict[str, Any]]:
+    return [{"loc": ["reported_by"], "msg": f"Rate limit exceeded for {case.reported_by}",
+             "type": "rate_limited"}]
+
+# Idempotency keys are remembered per reporter for IDEMPOTENCY_WINDOW_HOURS in a ring
+# of Bloom filters (fixed memory), and exactly, with their case IDs, for the last
+# IDEMPOTENCY_EXACT_MINUTES. That is per process; with STATE_BACKEND=redis the keys
+# live in Redis instead (exactly, for the whole window) and every worker shares them.
+IDEMPOTENCY_WINDOW = float(os.getenv("IDEMPOTENCY_WINDOW_HOURS", "72")) * 3600
+duplicate_filter = DuplicateFilter(
+    window=IDEMPOTENCY_WINDOW,
+    partitions=int(os.getenv("IDEMPOTENCY_PARTITIONS", "6")),
+    partition_capacity=int(os.getenv("IDEMPOTENCY_PARTITION_CAPACITY", "1000000")),
+    fp_rate=float(os.getenv("IDEMPOTENCY_FP_RATE", "1e-6")),
+    exact_window=float(os.getenv("IDEMPOTENCY_EXACT_MINUTES", "60")) * 60
+)
+# Keys are claimed while their case is ingested and only remembered once it is
+# stored (and in the WAL), so a failed ingest can be retried; meanwhile
+# concurrent retries are turned away. Replaced at startup in shared mode.
+idempotency_keys: IdempotencyKeys = IdempotencyKeys(duplicate_filter)
+
+def idempotency_key(case: CaseEvent) -> Optional[str]:
+    return f"{case.reported_by}\x00{case.idempotency_key}" if case.idempotency_key else None
+
+def _keyed(cases: List[CaseEvent], case_ids: List[str]) -> Tuple[List[int], List[str], List[str]]:
+    """(positions, keys, case IDs) of the cases that carry an idempotency key"""
+    positions = [p for p, case in enumerate(cases) if case.idempotency_key]
+    return (positions, [idempotency_key(cases[p]) for p in positions],
+            [case_ids[p] for p in positions])
+
+async def key_state(case: CaseEvent) -> Tuple[str, Optional[str]]:
+    """(NEW, INGESTING or STORED, original case ID if known) for a case's idempotency key"""
+    key = idempotency_key(case)
+    return (await idempotency_keys.lookup([key]))[0] if key else (NEW, None)
+
+async def claim_cases(cases: List[CaseEvent], case_ids: List[str]) -> List[int]:
     """
-    # Add to state
-    state.add_case(case)
+    Mark cases as being ingested; settle_cases() must follow.
     
-    # Publish to Redis stream (if available)
-    if redis_client:
-        try:
-            await redis_client.xadd(
-            "case_events",
-            {"data": json.dumps(case.dict(), default=str)}
-        )
-        except Exception as e:
-            print("⚠ Redis xadd failed:", e)
+    Returns:
+        Positions of the cases claimed (all but those whose key another
+        request claimed or stored since it was looked up)
+    """
+    positions, keys, ids = _keyed(cases, case_ids)
+    lost = {p for p, ok in zip(positions, await idempotency_keys.claim(keys, ids)) if not ok}
+    return [p for p in range(len(cases)) if p not in lost]
+
+async def settle_cases(cases: List[CaseEvent], case_ids: List[str], stored: bool):
+    """Release claimed cases, remembering their keys if they were stored durably"""
+    _, keys, ids = _keyed(cases, case_ids)
+    await idempotency_keys.settle(keys, ids, stored)
+
+@asynccontextmanager
+async def ingesting(cases: List[CaseEvent], case_ids: List[str]):
+    """
+    Claim cases for the block, which gets the positions claimed; only
+    those are settled, and their keys are remembered only if it completes.
+    """
+    claimed = await claim_cases(cases, case_ids)
+    stored = False
+    try:
+        yield claimed
+        stored = True
+    finally:
+        await settle_cases([cases[p] for p in claimed], [case_ids[p] for p in claimed], stored)
 
+async def drop_duplicates(cases: List[CaseEvent]) -> Tuple[List[int], int]:
+    """
+    Find the cases not already ingested, not being ingested by another
+    request and not repeated earlier in `cases`.
     
-    # Calculate updated ward risk
-    ward_risk = state.get_ward_risk(case.ward_id)
+    Returns:
+        (their positions in `cases`, number of duplicates dropped)
+    """
+    positions = [p for p, case in enumerate(cases) if case.idempotency_key]
+    found = await idempotency_keys.lookup([idempotency_key(cases[p]) for p in positions])
+    known = {p for p, (status, _) in zip(positions, found) if status != NEW}
+    fresh, seen = [], set()
+    for position, case in enumerate(cases):
+        key = idempotency_key(case)
+        if key is not None and (key in seen or position in known):
+            continue
+        seen.add(key)
+        fresh.append(position)
+    return fresh, len(cases) - len(fresh)
+
+async def screen_cases(cases: List[CaseEvent]) -> Tuple[List[int], List[int], int, float]:
+    """
+    Drop duplicates, then charge the rest to reporter rate limits, so
+    retries of ingested cases never spend tokens.
     
-    # Broadcast to WebSocket clients
-    background_tasks.add_task(
-        manager.broadcast,
-        {
-            "type": "case_added",
-            "case": case.dict(exclude={'timestamp'}),
-            "ward_risk": ward_risk.dict()
-        },
-        "admin"
+    Returns:
+        (positions to ingest, positions over the rate limit, duplicates dropped,
+        longest Retry-After wait)
+    """
+    fresh, duplicates = await drop_duplicates(cases)
+    within, limited, retry_after = rate_limit_cases([cases[p] for p in fresh])
+    return [fresh[p] for p in within], [fresh[p] for p in limited], duplicates, retry_after
+
+def in_progress() -> HTTPException:
+    return HTTPException(status_code=409, detail="A case with this Idempotency-Key is being ingested",
+                         headers={"Retry-After": "1"})
+
+def duplicate_response(case_id: Optional[str]) -> JSONResponse:
+    return JSONResponse(status_code=200, content={
+        "success": True,
+        "duplicate": True,
+        "case_id": case_id,
+        "message": "Duplicate case event ignored"
+    })
+
+async def wait_durable():
+    """Hold the response until this request's changes are in the write-ahead log"""
+    try:
+        await state.sync()
+    except Exception as e:
+        print("⚠ Write-ahead log unavailable:", e)
+        raise HTTPException(status_code=503, detail="Write-ahead log unavailable")
+
+async def raise_alert_if_needed(ward_id: str, disease_type: str,
+                                ward_risk: WardRiskScore) -> Optional[Dict[str, Any]]:
+    """
+    Raise an outbreak alert if the ward risk calls for one. Repeats within
+    the debounce window only update the open alert's counters.
+    
+    Returns:
+        The alert if subscribers should hear about it (new or escalated), else None
+    """
+    if not (ward_risk.risk_level == RiskLevel.RED and ward_risk.outbreak_probability > 0.7):
+        return None
+    
+    alert = Alert(
+        id=f"alert_{datetime.now().timestamp()}",
+        ward_id=ward_id,
+        ward_name=ward_risk.ward_name,
+        severity="CRITICAL",
+        disease_type=disease_type,
+        message=f"High outbreak risk detected in {ward_risk.ward_name}",
+        outbreak_probability=ward_risk.outbreak_probability,
+        case_count=ward_risk.case_count_24h,
+        threshold=10,
+        recommended_actions=[
+            {"action": "Deploy emergency team", "urgency": "immediate"},
+            {"action": "Arrange temporary beds", "urgency": "within_6h"}
+        ],
+        created_at=datetime.now()
     )
+    alert_data, outcome = state.trigger_alert(alert)
+    if outcome == "coalesced":
+        return None
+    if state.wards.shared:
+        # What other workers hear on the event bus, for workers that start later
+        stream_writer.submit("alert_events", {"data": orjson.dumps(alert_data, default=str).decode()})
+    await event_bus.publish("alerts", alert_data)
+    return alert_data
+
+def alert_message(alert_data: Dict[str, Any]) -> Payload:
+    """WebSocket message announcing a new or escalated alert"""
+    kind = "new_alert" if alert_data['occurrences'] == 1 else "alert_escalated"
+    return Payload({"type": kind, "alert": alert_data})
+
+@app.post("/events/case", status_code=201)
+async def ingest_case_event(case: CaseEvent, background_tasks: BackgroundTasks,
+                            idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    """
+    Ingest a new disease case event.
+    Triggers real-time processing and ML inference.
+    With INGEST_MODE=queue the case is only queued and 202 returned; its
+    effects show up on WebSockets and the realtime endpoints shortly after.
+    Over the reporter's rate or the server's capacity the answer is 429.
+    A repeat of an Idempotency-Key (header or field) already ingested for
+    the same reporter answers 200 with the original case ID, without
+    counting against the rate limit; one still being ingested answers 409.
+    The key is only remembered once the case is stored durably, so a
+    request that failed can be retried with the same key.
+    """
+    if idempotency_key:
+        case.idempotency_key = idempotency_key
+    status, original_id = await key_state(case)
+    if status == INGESTING:
+        raise in_progress()
+    if status == STORED:
+        return duplicate_response(original_id)
+    priority = is_priority(case)
+    check_rate(reporter_limits, case.reported_by, priority)
+    with admitted(priority):
+        now = datetime.now()
+        case_id = new_case_id()
+        
+        if ingest_queue.running:
+            # Stamped on receipt so queueing delay does not shift the case in its windows
+            case.timestamp = case.timestamp or now
+            # The queue worker settles the claim once the case is applied
+            if not await claim_cases([case], [case_id]):
+                raise in_progress()
+            if not ingest_queue.offer((case_id, case), priority):
+                await settle_cases([case], [case_id], stored=False)
+                raise overloaded(1, "Ingest queue full, retry later")
+            return JSONResponse(status_code=202, content={
+                "success": True,
+                "case_id": case_id,
+                "status": "queued",
+                "message": "Case event accepted for processing"
+            })
+        
+        async with ingesting([case], [case_id]) as claimed:
+            if not claimed:
+                raise in_progress()
+            # Add to state
+            stored_case = await state.add_case(case, case_id)
+            ward_publisher.notify(case.ward_id)
+            case_data = case.dict()
+            
+            # Calculate updated ward risk
+            ward_risk = await state.get_ward_risk(case.ward_id)
+            ward_risk_data = ward_risk.dict()
+            
+            # Broadcast to WebSocket clients (encoded once for all subscribers)
+            background_tasks.add_task(
+                manager.broadcast,
+                Payload({
+                    "type": "case_added",
+                    "case": {k: v for k, v in case_data.items() if k != 'timestamp'},
+                    "ward_risk": ward_risk_data
+                }),
+                "admin"
+            )
+            
+            # Check if alert should be generated
+            alert_data = await raise_alert_if_needed(case.ward_id, case.disease_type.value, ward_risk)
+            if alert_data is not None:
+                # Broadcast alert
+                background_tasks.add_task(
+                    manager.broadcast,
+                    alert_message(alert_data),
+                    "admin"
+                )
+            
+            await wait_durable()
+            return {
+                "success": True,
+                "case_id": stored_case['id'],
+                "ward_risk": ward_risk_data,
+                "message": "Case event ingested successfully"
+            }
+
+def _validation_errors(e: ValidationError) -> List[Dict[str, Any]]:
+    return [{"loc": list(err["loc"]), "msg": err["msg"], "type": err["type"]} for err in e.errors()]
+
+async def ingest_case_batch(cases: List[CaseEvent], background_tasks: BackgroundTasks,
+                            case_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Apply validated cases in one pass: state is updated once per ward, each
+    affected ward's risk is recomputed once and a single coalesced message
+    is broadcast for the whole batch.
+    """
+    by_ward = await state.add_cases(cases, case_ids)
     
-    # Check if alert should be generated
-    if ward_risk.risk_level == RiskLevel.RED and ward_risk.outbreak_probability > 0.7:
-        alert = Alert(
-            id=f"alert_{datetime.now().timestamp()}",
-            ward_id=case.ward_id,
-            ward_name=ward_risk.ward_name,
-            severity="CRITICAL",
-            disease_type=case.disease_type.value,
-            message=f"High outbreak risk detected in {ward_risk.ward_name}",
-            outbreak_probability=ward_risk.outbreak_probability,
-            case_count=ward_risk.case_count_24h,
-            threshold=10,
-            recommended_actions=[
-                {"action": "Deploy emergency team", "urgency": "immediate"},
-                {"action": "Arrange temporary beds", "urgency": "within_6h"}
-            ],
-            created_at=datetime.now()
-        )
-        state.alerts.append(alert.dict())
+    ward_risks = {}
+    new_alerts = []
+    case_ids = []
+    scores = await state.get_ward_risks(list(by_ward))
+    for ward_id, ward_cases in by_ward.items():
+        ward_publisher.notify(ward_id)
+        for case_dict in ward_cases:
+            case_ids.append(case_dict['id'])
+        
+        ward_risk = scores[ward_id]
+        ward_risks[ward_id] = ward_risk.dict()
         
-        # Broadcast alert
+        # Alert on the disease most reported for this ward in the batch
+        batch_diseases = defaultdict(int)
+        for case_dict in ward_cases:
+            batch_diseases[case_dict['disease_type'].value] += 1
+        top_disease = max(batch_diseases.items(), key=lambda x: x[1])[0]
+        alert_data = await raise_alert_if_needed(ward_id, top_disease, ward_risk)
+        if alert_data is not None:
+            new_alerts.append(alert_data)
+    
+    if by_ward:
         background_tasks.add_task(
             manager.broadcast,
-            {"type": "new_alert", "alert": alert.dict()},
+            Payload({
+                "type": "cases_added",
+                "count": len(case_ids),
+                "ward_risks": ward_risks,
+                "alerts": new_alerts
+            }),
             "admin"
         )
     
+    await wait_durable()
+    alerts_created = sum(1 for alert_data in new_alerts if alert_data['occurrences'] == 1)
+    return {"case_ids": case_ids, "ward_risk": ward_risks, "alerts_created": alerts_created}
+
+async def process_queued_cases(items: List[Tuple[str, CaseEvent]]):
+    """Ingest queue worker: apply acknowledged cases as one batch"""
+    background_tasks = BackgroundTasks()
+    cases, case_ids = [case for _, case in items], [case_id for case_id, _ in items]
+    stored = False
+    try:
+        await ingest_case_batch(cases, background_tasks, case_ids=case_ids)
+        stored = True
+    finally:
+        # Claimed by ingest_case_event when it queued them
+        await settle_cases(cases, case_ids, stored)
+    await background_tasks()
+
+ingest_queue = IngestQueue(
+    process_queued_cases,
+    max_size=INGEST_QUEUE_SIZE,
+    workers=INGEST_WORKERS,
+    batch_size=INGEST_BATCH_SIZE,
+    reserve=int(INGEST_QUEUE_SIZE * INGEST_PRIORITY_RESERVE)
+)
+
+@app.post("/events/case/batch", status_code=201)
+async def ingest_case_events_batch(items: List[Any], background_tasks: BackgroundTasks):
+    """
+    Ingest a JSON array of case events (e.g. a field team's offline backlog).
+    Invalid items are reported by index; valid ones are still ingested.
+    Items whose idempotency_key was already ingested (or is being ingested)
+    are counted as duplicates. Every other item counts against its
+    reporter's rate limit; items over it are reported by index (type
+    "rate_limited"), and if nothing was accepted or a duplicate the answer
+    is 429.
+    """
+    if len(items) > CASE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch limited to {CASE_BATCH_MAX_ITEMS} cases")
+    
+    valid, indices, errors = [], [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append(CaseEvent.model_validate(item))
+            indices.append(index)
+        except ValidationError as e:
+            errors.append({"index": index, "errors": _validation_errors(e)})
+    
+    accept, limited, duplicates, retry_after = await screen_cases(valid)
+    if limited and not accept and not duplicates:
+        raise overloaded(retry_after, "Rate limit exceeded for every case in the batch")
+    for position in limited:
+        errors.append({"index": indices[position], "errors": rate_limit_error(valid[position])})
+    errors.sort(key=lambda error: error["index"])
+    
+    fresh = [valid[position] for position in accept]
+    case_ids = [new_case_id() for _ in fresh]
+    with admitted(any(map(is_priority, fresh))):
+        async with ingesting(fresh, case_ids) as claimed:
+            # Cases another request claimed since screening are duplicates too
+            duplicates += len(fresh) - len(claimed)
+            fresh, case_ids = [fresh[p] for p in claimed], [case_ids[p] for p in claimed]
+            result = await ingest_case_batch(fresh, background_tasks, case_ids)
     return {
-        "success": True,
-        "case_id": f"case_{datetime.now().timestamp()}",
-        "ward_risk": ward_risk.dict(),
-        "message": "Case event ingested successfully"
+        "success": not errors,
+        "accepted": len(fresh),
+        "duplicates": duplicates,
+        "rejected": len(errors),
+        "rate_limited": len(limited),
+        "errors": errors,
+        **result
     }
 
-@app.post("/events/resource", status_code=201)
-async def ingest_resource_event(resource: ResourceEvent, background_tasks: BackgroundTasks):
+@app.post("/events/case/ndjson", status_code=201)
+async def ingest_case_events_ndjson(request: Request, background_tasks: BackgroundTasks):
     """
-    Ingest hospital resource update event.
+    Streaming upload of newline-delimited JSON case events.
+    The body is processed in chunks as it arrives, so uploads of any size use bounded memory.
+    Errors are reported by 1-based line number; lines over CASE_LINE_MAX_BYTES
+    are skipped (type "line_too_long"). Each case counts against its
+    reporter's rate limit as in /events/case/batch.
+    An in-flight slot is held per chunk rather than for the whole upload, so
+    a slow client does not pin one; a chunk that finds every slot busy is
+    reported line by line (type "overloaded") and the upload carries on.
     """
-    state.update_resource(resource)
+    result = await ingest_ndjson_body(request, background_tasks)
+    retry_after = result.pop("retry_after")
+    if (result["rate_limited"] or result["shed"]) and not result["accepted"] and not result["duplicates"]:
+        raise overloaded(retry_after, "No case in the upload could be admitted")
+    return result
+
+async def ingest_ndjson_body(request: Request, background_tasks: BackgroundTasks) -> Dict[str, Any]:
+    accepted, duplicates, errors = 0, 0, []
+    rate_limited, shed, retry_after = 0, 0, 0.0
+    case_ids: List[str] = []
+    ward_risks: Dict[str, Any] = {}
+    alerts_created = 0
+    chunk: List[Tuple[int, CaseEvent]] = []  # (line number, case)
     
-    # Publish to Redis
-    if redis_client:
-        await redis_client.xadd(
-            "resource_events",
-            {"data": json.dumps(resource.dict(), default=str)}
-        )
+    async def flush_chunk():
+        nonlocal accepted, duplicates, alerts_created, rate_limited, shed, retry_after
+        if not chunk:
+            return
+        cases = [case for _, case in chunk]
+        # Admitted before screening, so a shed chunk spends no rate-limit tokens
+        if not ingest_limiter.try_acquire(any(map(is_priority, cases))):
+            for line_no, _ in chunk:
+                errors.append({"line": line_no, "errors": [
+                    {"loc": [], "msg": "Server busy, retry later", "type": "overloaded"}]})
+            shed += len(chunk)
+            retry_after = max(retry_after, 1)
+            chunk.clear()
+            return
+        try:
+            accept, limited, dropped, wait = await screen_cases(cases)
+            for position in limited:
+                errors.append({"line": chunk[position][0], "errors": rate_limit_error(cases[position])})
+            rate_limited += len(limited)
+            retry_after = max(retry_after, wait)
+            fresh = [cases[position] for position in accept]
+            fresh_ids = [new_case_id() for _ in fresh]
+            async with ingesting(fresh, fresh_ids) as claimed:
+                dropped += len(fresh) - len(claimed)
+                fresh, fresh_ids = [fresh[p] for p in claimed], [fresh_ids[p] for p in claimed]
+                result = await ingest_case_batch(fresh, background_tasks, fresh_ids)
+        finally:
+            ingest_limiter.release()
+        accepted += len(fresh)
+        duplicates += dropped
+        case_ids.extend(result["case_ids"])
+        ward_risks.update(result["ward_risk"])
+        alerts_created += result["alerts_created"]
+        chunk.clear()
     
-    # Calculate stress level
-    utilization = ((resource.total_capacity - resource.available) / resource.total_capacity) * 100
-    stress_level = "CRITICAL" if utilization > 90 else "HIGH" if utilization > 75 else "NORMAL"
+    def parse_line(line: bytes, line_no: int, too_long: bool):
+        if too_long:
+            errors.append({"line": line_no, "errors": [{
+                "loc": [], "msg": f"Line longer than {CASE_LINE_MAX_BYTES} bytes", "type": "line_too_long"}]})
+            return
+        if not line.strip():
+            return
+        try:
+            chunk.append((line_no, CaseEvent.model_validate(orjson.loads(line))))
+        except orjson.JSONDecodeError as e:
+            errors.append({"line": line_no, "errors": [{"loc": [], "msg": str(e), "type": "json_invalid"}]})
+        except ValidationError as e:
+            errors.append({"line": line_no, "errors": _validation_errors(e)})
     
-    # Broadcast update
-    background_tasks.add_task(
-        manager.broadcast,
-        {
-            "type": "resource_updated",
-            "resource": resource.dict(),
-            "utilization": round(utilization, 2),
-            "stress_level": stress_level
-        },
-        "admin"
-    )
+    line_no = 0
+    line = bytearray()
+    too_long = False  # the current line passed the cap; the rest of it is discarded
+    async for data in request.stream():
+        start = 0
+        while start < len(data):
+            end = data.find(b"\n", start)
+            piece = data[start:] if end < 0 else data[start:end]
+            if not too_long:
+                if len(line) + len(piece) > CASE_LINE_MAX_BYTES:
+                    too_long = True
+                    line.clear()
+                else:
+                    line += piece
+            if end < 0:
+                break
+            line_no += 1
+            parse_line(line, line_no, too_long)
+            line.clear()
+            too_long = False
+            start = end + 1
+            if len(chunk) >= CASE_BATCH_MAX_ITEMS:
+                await flush_chunk()
+    
+    parse_line(line, line_no + 1, too_long)
+    await flush_chunk()
+    errors.sort(key=lambda error: error["line"])
     
     return {
-        "success": True,
-        "resource_id": f"{resource.hospital_id}_{resource.resource_type}",
-        "utilization": round(utilization, 2),
-        "stress_level": stress_level
+        "success": not errors,
+        "accepted": accepted,
+        "duplicates": duplicates,
+        "rejected": len(errors),
+        "rate_limited": rate_limited,
+        "shed": shed,
+        "retry_after": retry_after,
+        "errors": errors,
+        "case_ids": case_ids,
+        "ward_risk": ward_risks,
+        "alerts_created": alerts_created
     }
 
+@app.post("/events/resource", status_code=201)
+async def ingest_resource_event(resource: ResourceEvent, background_tasks: BackgroundTasks):
+    """
+    Ingest hospital resource update event.
+    """
+    check_rate(hospital_limits, resource.hospital_id)
+    with admitted():
+        state.update_resource(resource)
+        resource_data = resource.dict()
+        
+        # Queue for the Redis stream (if available)
+        stream_writer.submit("resource_events", {"data": orjson.dumps(resource_data, default=str).decode()})
+        
+        # Calculate stress level
+        utilization = ((resource.total_capacity - resource.available) / resource.total_capacity) * 100
+        stress_level = "CRITICAL" if utilization > 90 else "HIGH" if utilization > 75 else "NORMAL"
+        
+        # Broadcast update
+        background_tasks.add_task(
+            manager.broadcast,
+            Payload({
+                "type": "resource_updated",
+                "resource": resource_data,
+                "utilization": round(utilization, 2),
+                "stress_level": stress_level
+            }),
+            "admin"
+        )
+        
+        await wait_durable()
+        return {
+            "success": True,
+            "resource_id": f"{resource.hospital_id}_{resource.resource_type}",
+            "utilization": round(utilization, 2),
+            "stress_level": stress_level
+        }
+
 # ===== REAL-TIME DATA ENDPOINTS =====
 
 @app.websocket("/ws/admin")
 async def websocket_admin(websocket: WebSocket):
     """
     WebSocket endpoint for admin dashboard.
-    Streams real-time updates.
+    Streams real-time updates. `total_cases` is the case log's size, or with
+    shared state the 24h total of every worker.
     """
     await manager.connect(websocket, "admin")
     
     try:
         # Send initial state
-        await websocket.send_json({
+        await manager.send_personal(websocket, {
             "type": "initial_state",
-            "total_cases": len(state.cases),
-            "active_alerts": len([a for a in state.alerts if a['status'] == 'active']),
+            "total_cases": (await state.wards.total_cases_24h() if state.wards.shared
+                            else len(state.cases)),
+            "active_alerts": state.dashboard.active_alerts,
             "timestamp": datetime.now().isoformat()
-        })
+        }, "admin")
         
         # Keep connection alive and handle incoming messages
         while True:
             data = await websocket.receive_text()
             # Echo back for heartbeat
-            await websocket.send_json({"type": "pong"})
+            if not await manager.send_personal(websocket, {"type": "pong"}, "admin"):
+                break
             
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket, "admin")
 
 @app.websocket("/ws/ward/{ward_id}")
 async def websocket_ward(websocket: WebSocket, ward_id: str):
     """
     WebSocket endpoint for ward-specific updates.
+    Updates come from the ward's shared publisher when its risk actually changes.
     """
     channel = f"ward_{ward_id}"
     await manager.connect(websocket, channel)
+    ward_publisher.subscribe(ward_id)
     
     try:
         # Send initial ward risk
-        ward_risk = state.get_ward_risk(ward_id)
-        await websocket.send_json({
+        ward_risk = await state.get_ward_risk(ward_id)
+        await manager.send_personal(websocket, {
             "type": "ward_risk",
             "data": ward_risk.dict()
-        })
+        }, channel)
         
-        # Stream updates every 5 seconds
+        # Wait for the client to go away; incoming messages are ignored
         while True:
-            await asyncio.sleep(5)
-            ward_risk = state.get_ward_risk(ward_id)
-            await websocket.send_json({
-                "type": "ward_risk_update",
-                "data": ward_risk.dict()
-            })
+            await websocket.receive_text()
             
     except WebSocketDisconnect:
+        pass
+    finally:
+        ward_publisher.unsubscribe(ward_id)
         manager.disconnect(websocket, channel)
 
 @app.get("/realtime/ward-risk/{ward_id}")
 async def get_ward_risk(ward_id: str):
     """Get current ward risk score"""
-    ward_risk = state.get_ward_risk(ward_id)
+    ward_risk = await state.get_ward_risk(ward_id)
     return ward_risk
 
 @app.get("/realtime/dashboard-stats")
-async def get_dashboard_stats():
-    """Get real-time dashboard statistics"""
-    now = datetime.now()
-    cutoff_24h = now - timedelta(hours=24)
-    
-    recent_cases = [c for c in state.cases if c['timestamp'] > cutoff_24h]
-    
-    return {
-        "total_cases_24h": len(recent_cases),
-        "active_alerts": len([a for a in state.alerts if a['status'] == 'active']),
-        "wards_monitored": len(state.ward_stats),
-        "high_risk_wards": len([
-            w for w in state.ward_stats.keys()
-            if state.get_ward_risk(w).risk_level == RiskLevel.RED
-        ]),
-        "timestamp": now.isoformat()
-    }
+async def get_dashboard_stats(version: Optional[int] = None):
+    """
+    Get real-time dashboard statistics.
+    Pass the last seen `version` to get a short "unchanged" reply instead of the full payload.
+    """
+    snapshot = await state.get_dashboard_snapshot()
+    if version is not None and version == snapshot["version"]:
+        return {"version": version, "unchanged": True}
+    return snapshot
 
 @app.get("/realtime/hospital-load")
-async def get_hospital_load():
+async def get_hospital_load(since: Optional[int] = None,
+                            if_none_match: Optional[str] = Header(None)):
     """
     Lightweight endpoint for MAP frontend.
     Returns hospital/ward load + zone.
+    
+    Responses carry the load version as their ETag; a matching If-None-Match
+    gets 304 Not Modified. Pass the last seen version as `since` to get
+    {"version", "wards"} with only the wards whose patient count or zone
+    changed after it.
     """
+    load = await state.get_hospital_load()
+    headers = {"ETag": load.etag, "Cache-Control": "no-cache"}
+    
+    if since is not None:
+        return JSONResponse({"version": load.version, "wards": load.changed_since(since)},
+                            headers=headers)
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if load.etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(content=load.body(), media_type="application/json", headers=headers)
 
-    response = []
-
-    for ward_id, stats in state.ward_stats.items():
-        patient_count = len(stats["cases_24h"])
-
-        zone = state.get_zone(patient_count)
+def require_local_case_log():
+    """Case log endpoints would only see this worker's cases with shared state"""
+    if state.wards.shared:
+        raise HTTPException(status_code=501,
+                            detail="Not available with STATE_BACKEND=redis: the case log is per process")
 
-        response.append({
-            "ward_id": ward_id,
-            "patients": patient_count,
-            "zone": zone
-        })
+@app.get("/realtime/case-counts")
+async def get_case_counts(since: datetime, until: Optional[datetime] = None,
+                          ward_id: Optional[str] = None, disease: Optional[DiseaseType] = None):
+    """
+    Number of cases reported for `since <= timestamp < until` (until defaults
+    to now), optionally for one ward and/or disease. Answered from the
+    range-count index: the range is widened to whole CASE_INDEX_BUCKET_MINUTES
+    buckets and covers the case log's retention period. The case log is per
+    process, so with shared state (STATE_BACKEND=redis) this answers 501.
+    """
+    require_local_case_log()
+    # Epoch seconds, so naive and timezone-aware bounds compare
+    since_ts, until_ts = to_epoch(since), to_epoch(until)
+    if until_ts < since_ts:
+        raise HTTPException(status_code=400, detail="until must not be before since")
+    index = state.case_index
+    lo, hi = index.bucket_range(since_ts, until_ts)
+    return {
+        "ward_id": ward_id,
+        "disease": disease.value if disease else None,
+        "since": datetime.fromtimestamp(lo * index.bucket_seconds).isoformat(),
+        "until": datetime.fromtimestamp((hi + 1) * index.bucket_seconds).isoformat(),
+        "count": index.count(since_ts, until_ts, ward_id=ward_id,
+                             disease=disease.value if disease else None)
+    }
 
-    return response
+@app.get("/realtime/late-cases")
+async def get_late_cases(limit: int = 50):
+    """
+    Most recent cases that arrived behind the event-time watermark (newest
+    first). They are in the case log but not in ward windows or risk.
+    Per process, so not available with shared state (501).
+    """
+    require_local_case_log()
+    limit = max(0, min(limit, LATE_CASE_HISTORY))
+    recent = [state.late_cases[-i] for i in range(1, min(limit, len(state.late_cases)) + 1)]
+    return {
+        **state.watermark.stats(),
+        "cases": recent
+    }
 
 # ===== ALERT ENDPOINTS =====
 
+def _parse_cursor(cursor: Optional[str]) -> Optional[int]:
+    if cursor is None:
+        return None
+    try:
+        return int(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/alerts", response_model=List[Alert])
-async def get_alerts(status: Optional[str] = "active", limit: int = 50):
-    """Get alerts with optional filtering"""
-    filtered_alerts = [
-        Alert(**a) for a in state.alerts
-        if status is None or a['status'] == status
-    ]
-    return filtered_alerts[:limit]
+async def get_alerts(response: Response, status: Optional[str] = "active", limit: int = 50,
+                     ward_id: Optional[str] = None, disease: Optional[str] = None,
+                     cursor: Optional[str] = None):
+    """
+    Get alerts with optional filtering, newest first.
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
+    """
+    alerts, next_cursor = state.alerts.query(
+        status=status, ward_id=ward_id, disease_type=disease,
+        cursor=_parse_cursor(cursor), limit=limit
+    )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return alerts
 
 @app.get("/sse/alerts")
-async def stream_alerts():
-    """Server-Sent Events stream for alerts"""
+async def stream_alerts(last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")):
+    """
+    Server-Sent Events stream for alerts.
+    Alerts are pushed as soon as they are published; reconnecting clients
+    resume after their Last-Event-ID without gaps or duplicates. An ID ahead
+    of the bus is from before a restart (or Redis reset) and replays the
+    whole log.
+    """
+    try:
+        last_id = int(last_event_id) if last_event_id else event_bus.last_id
+    except ValueError:
+        last_id = event_bus.last_id
+    if last_id > event_bus.last_id:
+        last_id = 0
+    
     async def event_generator():
-        last_alert_count = len(state.alerts)
-        
-        while True:
-            # Check for new alerts
-            current_count = len(state.alerts)
-            if current_count > last_alert_count:
-                new_alerts = state.alerts[last_alert_count:]
-                for alert in new_alerts:
-                    yield f"data: {json.dumps(alert, default=str)}\n\n"
-                last_alert_count = current_count
-            
-            await asyncio.sleep(2)
+        nonlocal last_id
+        # Subscribe before replaying so nothing published in between is missed
+        subscription = event_bus.subscribe("alerts")
+        try:
+            backlog = event_bus.replay("alerts", last_id)
+            while True:
+                for event_id, payload in backlog:
+                    if event_id > last_id:
+                        yield f"id: {event_id}\ndata: {payload.text}\n\n"
+                        last_id = event_id
+                
+                if subscription.lagged:
+                    # Fell behind the live queue; catch up from the replay log
+                    event_bus.unsubscribe(subscription)
+                    subscription = event_bus.subscribe("alerts")
+                    backlog = event_bus.replay("alerts", last_id)
+                    continue
+                
+                try:
+                    backlog = [await asyncio.wait_for(subscription.get(), SSE_KEEPALIVE_SECONDS)]
+                except asyncio.TimeoutError:
+                    backlog = []
+                    yield ": keepalive\n\n"
+        finally:
+            event_bus.unsubscribe(subscription)
     
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 # ===== CITIZEN ENDPOINTS =====
 
+PREVENTION_TIPS = {
+    "dengue": [
+        "Eliminate standing water around your home",
+        "Use mosquito repellent",
+        "Wear long-sleeved clothing",
+        "Use mosquito nets while sleeping"
+    ],
+    "malaria": [
+        "Sleep under insecticide-treated bed nets",
+        "Use mosquito repellent on exposed skin",
+        "Wear protective clothing",
+        "Keep windows and doors screened"
+    ],
+    "covid": [
+        "Wear masks in crowded places",
+        "Maintain social distancing",
+        "Wash hands frequently",
+        "Get vaccinated"
+    ],
+    "typhoid": [
+        "Drink only boiled or bottled water",
+        "Wash hands before eating",
+        "Avoid street food",
+        "Get vaccinated"
+    ]
+}
+DEFAULT_PREVENTION_TIPS = ["Consult healthcare provider"]
+
 @app.get("/citizen/alerts")
-async def get_citizen_alerts(ward_id: Optional[str] = None):
+async def get_citizen_alerts(response: Response, ward_id: Optional[str] = None,
+                             limit: int = 50, cursor: Optional[str] = None):
     """Get alerts relevant to citizens"""
-    filtered_alerts = [
-        a for a in state.alerts
-        if a['status'] == 'active' and (ward_id is None or a['ward_id'] == ward_id)
-    ]
+    filtered_alerts, next_cursor = state.alerts.query(
+        status='active', ward_id=ward_id, cursor=_parse_cursor(cursor), limit=limit
+    )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
     
     # Simplify for citizens
     citizen_alerts = []
@@ -573,7 +1917,7 @@ async def get_citizen_alerts(ward_id: Optional[str] = None):
             "area": alert['ward_name'],
             "severity": alert['severity'],
             "message": alert['message'],
-            "prevention_tips": get_prevention_tips(alert['disease_type'])
+            "prevention_tips": PREVENTION_TIPS.get(alert['disease_type'], DEFAULT_PREVENTION_TIPS)
         })
     
     return citizen_alerts
@@ -581,36 +1925,9 @@ async def get_citizen_alerts(ward_id: Optional[str] = None):
 @app.get("/citizen/prevention-tips")
 async def get_prevention_tips(disease: str):
     """Get prevention tips for a disease"""
-    tips = {
-        "dengue": [
-            "Eliminate standing water around your home",
-            "Use mosquito repellent",
-            "Wear long-sleeved clothing",
-            "Use mosquito nets while sleeping"
-        ],
-        "malaria": [
-            "Sleep under insecticide-treated bed nets",
-            "Use mosquito repellent on exposed skin",
-            "Wear protective clothing",
-            "Keep windows and doors screened"
-        ],
-        "covid": [
-            "Wear masks in crowded places",
-            "Maintain social distancing",
-            "Wash hands frequently",
-            "Get vaccinated"
-        ],
-        "typhoid": [
-            "Drink only boiled or bottled water",
-            "Wash hands before eating",
-            "Avoid street food",
-            "Get vaccinated"
-        ]
-    }
-    
     return {
         "disease": disease,
-        "tips": tips.get(disease, ["Consult healthcare provider"])
+        "tips": PREVENTION_TIPS.get(disease, DEFAULT_PREVENTION_TIPS)
     }
 
 # ===== HEALTH CHECK =====
@@ -623,6 +1940,22 @@ async def health_check():
         "service": "SMC Real-Time API",
         "version": "2.0.0",
         "redis_connected": redis_client is not None,
+        "stream_writer": stream_writer.stats(),
+        "websocket": manager.stats(),
+        "ward_publisher": ward_publisher.stats(),
+        "warm_start": warm_start_stats,
+        "wal": state.wal.stats() if state.wal is not None else None,
+        "ward_risk_cache": state.risk_cache_stats(),
+        "outbreak_model": state.outbreak_model_stats(),
+        "event_time": state.watermark.stats(),
+        "case_index": state.case_index.stats(),
+        "ingest_queue": ingest_queue.stats() if ingest_queue.running else None,
+        "admission": {
+            "in_flight": ingest_limiter.stats(),
+            "reporters": reporter_limits.stats(),
+            "hospitals": hospital_limits.stats()
+        },
+        "idempotency": idempotency_keys.stats(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -635,10 +1968,14 @@ if __name__ == "__main__":
     print("=" * 60)
     print("\nEndpoints:")
     print("  POST /events/case - Ingest case event")
+    print("  POST /events/case/batch - Ingest a JSON array of cases")
+    print("  POST /events/case/ndjson - Stream NDJSON cases")
     print("  POST /events/resource - Ingest resource event")
     print("  WS   /ws/admin - Admin WebSocket")
     print("  WS   /ws/ward/{id} - Ward WebSocket")
     print("  GET  /realtime/ward-risk/{id} - Ward risk score")
+    print("  GET  /realtime/case-counts - Case counts for any time range")
+    print("  GET  /realtime/late-cases - Cases behind the watermark")
     print("  GET  /alerts - Get alerts")
     print("  GET  /sse/alerts - Alert stream (SSE)")
     print("  GET  /citizen/alerts - Citizen alerts")
@@ -0,0 +1,525 @@
+"""
+Smart Public Health Management System - WebSocket Fan-out
+Per-client bounded send queues and writer tasks with slow-consumer policies,
+relayed between nodes through Redis pub/sub
+
+Author: SMC Real-Time Team
+Date: October 2026
+"""
+
+import asyncio
+import inspect
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional, Set
+import orjson
+
+try:
+    import msgpack
+except ImportError:  # binary sub-protocol is optional
+    msgpack = None
+
+MSGPACK_SUBPROTOCOL = "msgpack"
+REDIS_CHANNEL_PREFIX = "ws:"
+
+# What to do when a client's send queue is full
+DROP_OLDEST = "drop_oldest"  # discard the oldest queued message (client skips ahead)
+DROP_NEW = "drop_new"        # discard the message being broadcast
+DISCONNECT = "disconnect"    # evict the client
+SLOW_CLIENT_POLICIES = (DROP_OLDEST, DROP_NEW, DISCONNECT)
+
+
+class Payload:
+    """
+    A broadcast message encoded at most once per wire format.
+
+    Every subscriber of a broadcast shares one Payload, so the JSON text
+    (and the MessagePack bytes, if any client negotiated them) are built
+    once no matter how many sockets receive it.
+    """
+
+    __slots__ = ('message', '_json', '_text', '_msgpack')
+
+    def __init__(self, message: Any):
+        self.message = message
+        self._json: Optional[bytes] = None
+        self._text: Optional[str] = None
+        self._msgpack: Optional[bytes] = None
+
+    @property
+    def json(self) -> bytes:
+        if self._json is None:
+            self._json = orjson.dumps(self.message, default=str)
+        return self._json
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.json.decode()
+        return self._text
+
+    @property
+    def msgpack(self) -> bytes:
+        if self._msgpack is None:
+            # Round-trip through JSON types so datetimes/enums match the JSON form
+            self._msgpack = msgpack.packb(orjson.loads(self.json))
+        return self._msgpack
+
+
+class ClientConnection:
+    """
+    One WebSocket subscriber with its own bounded outbound queue.
+
+    A dedicated writer task drains the queue, so a slow or stalled socket
+    only ever delays its own messages. Any send error or timeout evicts the
+    client through `on_evict`.
+    """
+
+    def __init__(self, websocket, channel: str, max_queue: int, policy: str,
+                 send_timeout: float, on_evict, binary: bool = False):
+        self.websocket = websocket
+        self.channel = channel
+        self.binary = binary
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.on_evict = on_evict
+
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.closed = False
+        self.task = asyncio.create_task(self._writer())
+
+    def offer(self, message: Payload) -> bool:
+        """
+        Queue an encoded message without waiting.
+
+        Returns:
+            False if the client is closed or was evicted by the policy
+        """
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        self.dropped += 1
+        if self.policy == DISCONNECT:
+            self.on_evict(self)
+            return False
+        if self.policy == DROP_OLDEST:
+            self.queue.get_nowait()
+            self.queue.put_nowait(message)
+        return True
+
+    async def _send(self, message: Payload):
+        if self.binary:
+            await self.websocket.send_bytes(message.msgpack)
+        else:
+            await self.websocket.send_text(message.text)
+
+    async def _writer(self):
+        try:
+            # Checking `closed` also covers a cancellation swallowed by wait_for
+            while not self.closed:
+                message = await self.queue.get()
+                await asyncio.wait_for(self._send(message), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Dead or stalled socket
+            self.on_evict(self)
+
+
+class ConnectionManager:
+    """
+    Channel-based WebSocket fan-out.
+
+    `broadcast` only enqueues, so its cost is O(subscribers) queue puts
+    regardless of how fast each socket drains.
+
+    With `attach_redis`, each broadcast is also published once to Redis and
+    other nodes deliver it to their own sockets. A node subscribes to a
+    channel's Redis topic when its first local socket joins and
+    unsubscribes when the last one leaves, so only nodes with listeners
+    receive the traffic.
+    """
+
+    def __init__(self, max_queue: int = 100, policy: str = DROP_OLDEST,
+                 send_timeout: float = 10.0):
+        """
+        Args:
+            max_queue: Outbound messages buffered per client
+            policy: Slow-consumer policy, one of SLOW_CLIENT_POLICIES
+            send_timeout: Seconds a single send may take before the client is evicted
+        """
+        if policy not in SLOW_CLIENT_POLICIES:
+            raise ValueError(f"Unknown slow-client policy: {policy}")
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+
+        self.active_connections: Dict[str, Dict[Any, ClientConnection]] = defaultdict(dict)
+        self.evicted = 0
+
+        # Cross-node relay (see attach_redis)
+        self.node = uuid.uuid4().hex[:12]
+        self.redis_client = None
+        self.pubsub = None
+        self.relay_channels: Set[str] = set()
+        self._relay_lock = asyncio.Lock()
+        self._listener: Optional[asyncio.Task] = None
+        self.relayed_out = 0
+        self.relayed_in = 0
+
+    async def connect(self, websocket, channel: str):
+        """Accept a socket, negotiating the MessagePack sub-protocol if offered and available"""
+        offered = websocket.scope.get('subprotocols') or []
+        binary = msgpack is not None and MSGPACK_SUBPROTOCOL in offered
+        await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL if binary else None)
+        self.active_connections[channel][websocket] = ClientConnection(
+            websocket, channel, self.max_queue, self.policy,
+            self.send_timeout, self._evict, binary
+        )
+        if self.pubsub is not None and channel not in self.relay_channels:
+            await self._sync_relay(channel)
+
+    def disconnect(self, websocket, channel: str):
+        client = self.active_connections.get(channel, {}).pop(websocket, None)
+        if client is not None:
+            client.closed = True
+            client.task.cancel()
+        if channel in self.active_connections and not self.active_connections[channel]:
+            del self.active_connections[channel]
+            if self.pubsub is not None:
+                asyncio.ensure_future(self._sync_relay(channel))
+
+    def _evict(self, client: ClientConnection):
+        if client.closed:
+            return
+        self.evicted += 1
+        self.disconnect(client.websocket, client.channel)
+        asyncio.ensure_future(self._close(client.websocket))
+
+    @staticmethod
+    async def _close(websocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    async def send_personal(self, websocket, message: Any, channel: str) -> bool:
+        """Queue a message for one client; False if it is no longer connected"""
+        client = self.active_connections.get(channel, {}).get(websocket)
+        if not isinstance(message, Payload):
+            message = Payload(message)
+        return client is not None and client.offer(message)
+
+    async def broadcast(self, message: Any, channel: str, local: bool = False):
+        """
+        Broadcast message to all connections in a channel, encoding it once.
+
+        Args:
+            local: Skip the cross-node relay (for messages every node derives itself)
+        """
+        if not isinstance(message, Payload):
+            message = Payload(message)
+        self._deliver(channel, message)
+
+        if self.redis_client is not None and not local:
+            try:
+                await self.redis_client.publish(
+                    REDIS_CHANNEL_PREFIX + channel,
+                    self.node.encode() + b" " + message.json
+                )
+                self.relayed_out += 1
+            except Exception as e:
+                print("⚠ WebSocket relay publish failed, delivered locally only:", e)
+
+    def _deliver(self, channel: str, message: Payload):
+        for client in list(self.active_connections.get(channel, {}).values()):
+            client.offer(message)
+
+    # ----- Cross-node relay -----
+
+    async def attach_redis(self, redis_client):
+        """Relay broadcasts between nodes through Redis pub/sub"""
+        self.redis_client = redis_client
+        self.pubsub = redis_client.pubsub()
+        for channel in list(self.active_connections):
+            await self._sync_relay(channel)
+
+    async def _sync_relay(self, channel: str):
+        """Subscribe to or drop a channel's Redis topic to match local listeners"""
+        async with self._relay_lock:
+            wanted = channel in self.active_connections
+            if wanted == (channel in self.relay_channels):
+                return
+            try:
+                if wanted:
+                    await self.pubsub.subscribe(REDIS_CHANNEL_PREFIX + channel)
+                    self.relay_channels.add(channel)
+                    if self._listener is None:
+                        self._listener = asyncio.create_task(self._listen())
+                else:
+                    await self.pubsub.unsubscribe(REDIS_CHANNEL_PREFIX + channel)
+                    self.relay_channels.discard(channel)
+            except Exception as e:
+                print(f"⚠ WebSocket relay (un)subscribe for {channel} failed:", e)
+
+    async def _listen(self):
+        while self.pubsub is not None:
+            try:
+                item = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("⚠ WebSocket relay listener error:", e)
+                await asyncio.sleep(1.0)
+                continue
+            if item is None or item.get('type') != 'message':
+                continue
+
+            data = item['data']
+            if isinstance(data, str):
+                data = data.encode()
+            node, _, body = data.partition(b" ")
+            if node.decode() == self.node:
+                continue  # our own broadcast, already delivered
+            channel = item['channel']
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+
+            message = Payload(orjson.loads(body))
+            message._json = body  # reuse the relayed encoding
+            self.relayed_in += 1
+            self._deliver(channel[len(REDIS_CHANNEL_PREFIX):], message)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self.pubsub is not None:
+            try:
+                await self.pubsub.aclose()
+            except Exception:
+                pass
+        self.pubsub = None
+        self.redis_client = None
+        self.relay_channels.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": sum(len(c) for c in self.active_connections.values()),
+            "channels": len(self.active_connections),
+            "queued": sum(client.queue.qsize()
+                          for c in self.active_connections.values() for client in c.values()),
+            "dropped": sum(client.dropped
+                           for c in self.active_connections.values() for client in c.values()),
+            "evicted": self.evicted,
+            "policy": self.policy,
+            "relay": {
+                "enabled": self.redis_client is not None,
+                "channels": len(self.relay_channels),
+                "published": self.relayed_out,
+                "received": self.relayed_in
+            }
+        }
+
+
+class ChangeDrivenPublisher:
+    """
+    One shared publisher task per key (e.g. per ward) instead of one polling
+    loop per socket.
+
+    The task sleeps until `notify(key)` signals a state change or the next
+    time-bucket boundary passes, recomputes once, and broadcasts to the
+    key's channel only if the result differs from what was last sent.
+    The task starts with the first subscriber and stops with the last.
+    """
+
+    def __init__(self, manager: ConnectionManager, compute: Callable[[str], Dict[str, Any]],
+                 channel_for: Callable[[str], str], message_type: str,
+                 bucket_seconds: float = 60.0):
+        """
+        Args:
+            manager: Connection manager that owns the channels
+            compute: Builds the current payload data for a key (plain or async function)
+            channel_for: Maps a key to its channel name
+            message_type: `type` field of published messages
+            bucket_seconds: Recompute at least at every multiple of this many seconds
+        """
+        self.manager = manager
+        self.compute = compute
+        self.channel_for = channel_for
+        self.message_type = message_type
+        self.bucket_seconds = bucket_seconds
+
+        self.subscribers: Dict[str, int] = defaultdict(int)
+        self.events: Dict[str, asyncio.Event] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.last_sent: Dict[str, Dict[str, Any]] = {}
+
+        self.recomputes = 0
+        self.published = 0
+        self.suppressed = 0
+        self.failures = 0
+
+    def subscribe(self, key: str):
+        self.subscribers[key] += 1
+        if key not in self.tasks:
+            self.events[key] = asyncio.Event()
+            self.tasks[key] = asyncio.create_task(self._run(key))
+
+    def unsubscribe(self, key: str):
+        self.subscribers[key] -= 1
+        if self.subscribers[key] > 0:
+            return
+        del self.subscribers[key]
+        task = self.tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+        self.events.pop(key, None)
+        self.last_sent.pop(key, None)
+
+    def notify(self, key: str):
+        """Signal that the state behind `key` changed (no-op without subscribers)"""
+        event = self.events.get(key)
+        if event is not None:
+            event.set()
+
+    @staticmethod
+    def _fingerprint(data: Dict[str, Any]) -> Dict[str, Any]:
+        # The computation timestamp changes every time and carries no news
+        return {k: v for k, v in data.items() if k != 'timestamp'}
+
+    async def _run(self, key: str):
+        event = self.events[key]
+        while key in self.tasks:
+            until_boundary = self.bucket_seconds - time.time() % self.bucket_seconds
+            try:
+                await asyncio.wait_for(event.wait(), until_boundary)
+            except asyncio.TimeoutError:
+                pass
+            event.clear()
+            try:
+                await self._publish(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep the publisher alive; the next change or boundary retries
+                self.failures += 1
+                print(f"⚠ {self.message_type} publisher for {key} failed:", e)
+
+    async def _publish(self, key: str):
+        data = self.compute(key)
+        if inspect.isawaitable(data):
+            data = await data
+        self.recomputes += 1
+        fingerprint = self._fingerprint(data)
+        if fingerprint == self.last_sent.get(key):
+            self.suppressed += 1
+            return
+        # Each node runs its own publishers, so results are not relayed
+        await self.manager.broadcast(
+            Payload({"type": self.message_type, "data": data}),
+            self.channel_for(key),
+            local=True
+        )
+        # Only once sent, so a failed broadcast is not suppressed as a repeat
+        self.last_sent[key] = fingerprint
+        self.published += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "publishers": len(self.tasks),
+            "recomputes": self.recomputes,
+            "published": self.published,
+            "suppressed": self.suppressed,
+            "failures": self.failures
+        }
+
+
+# ===== BENCHMARK =====
+
+if __name__ == "__main__":
+    import json
+    import time
+
+    class FakeWebSocket:
+        """Stand-in socket; every 10th client is slow"""
+
+        def __init__(self, delay: float):
+            self.delay = delay
+            self.received = 0
+
+        scope = {}
+
+        async def accept(self, subprotocol=None):
+            pass
+
+        async def close(self):
+            pass
+
+        async def send_text(self, message):
+            await asyncio.sleep(self.delay)
+            self.received += 1
+
+    async def sequential_broadcast(sockets, message):
+        for ws in sockets:
+            try:
+                await ws.send_text(json.dumps(message))
+            except Exception:
+                pass
+
+    async def run(n_clients: int, n_messages: int = 20):
+        sockets = [FakeWebSocket(0.05 if i % 10 == 0 else 0) for i in range(n_clients)]
+        message = {"type": "case_added", "ward_id": "W001"}
+
+        t0 = time.perf_counter()
+        await sequential_broadcast(sockets, message)
+        sequential = time.perf_counter() - t0
+
+        manager = ConnectionManager(max_queue=8, policy=DROP_OLDEST)
+        for ws in sockets:
+            ws.received = 0
+            await manager.connect(ws, "admin")
+
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(n_messages):
+            t0 = time.perf_counter()
+            await manager.broadcast(message, "admin")
+            latencies.append(time.perf_counter() - t0)
+            await asyncio.sleep(0.005)  # inter-arrival gap between events
+
+        fast = [ws for ws in sockets if ws.delay == 0]
+        while any(ws.received < n_messages for ws in fast):
+            await asyncio.sleep(0.001)
+        fast_done = time.perf_counter() - started
+
+        stats = manager.stats()
+        tasks = [client.task for client in manager.active_connections["admin"].values()]
+        for ws in sockets:
+            manager.disconnect(ws, "admin")
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        latencies.sort()
+        print(f"\n{n_clients:,} clients (10% slow at 50ms/send)")
+        print(f"  Sequential broadcast        : {sequential * 1000:9.1f} ms")
+        print(f"  Queued broadcast p50 / max  : {latencies[len(latencies) // 2] * 1000:9.3f} / "
+              f"{latencies[-1] * 1000:.3f} ms")
+        print(f"  Fast clients got all {n_messages} msgs: {fast_done * 1000:9.1f} ms "
+              f"(includes {n_messages * 5} ms of inter-event gaps)")
+        print(f"  Dropped for slow clients    : {stats['dropped']}")
+
+    async def main():
+        print("=" * 60)
+        print("WebSocket Fan-out Benchmark")
+        print("=" * 60)
+        for n in (1_000, 2_000):
+            await run(n)
+
+    asyncio.run(main())
@@ -0,0 +1,277 @@
+"""
+Smart Public Health Management System - Case Count Index
+Per-(ward, disease) Fenwick trees over time buckets for range count queries
+
+Author: SMC Real-Time Team
+Date: October 2026
+"""
+
+import math
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+
+from realtime_windows import TimeLike, to_epoch
+
+
+class FenwickTree:
+    """
+    Binary indexed tree over `size` slots: point update and prefix sum in
+    O(log size), built from a dense count array in O(size).
+    """
+
+    def __init__(self, size: int, dtype=np.int32):
+        self.size = size
+        self.tree = np.zeros(size + 1, dtype=dtype)  # 1-based
+
+    def load(self, counts: np.ndarray):
+        """Replace the contents with `counts` (one per slot)"""
+        prefix = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+        index = np.arange(1, self.size + 1)
+        self.tree[1:] = prefix[index] - prefix[index - (index & -index)]
+
+    def add(self, slot: int, delta: int):
+        tree, size = self.tree, self.size
+        i = slot + 1
+        while i <= size:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, slot: int) -> int:
+        """Sum of slots 0..slot inclusive (0 for slot < 0)"""
+        tree = self.tree
+        total = 0
+        i = min(slot, self.size - 1) + 1
+        while i > 0:
+            total += int(tree[i])
+            i -= i & -i
+        return total
+
+    def range_sum(self, lo: int, hi: int) -> int:
+        """Sum of slots lo..hi inclusive"""
+        return self.prefix(hi) - self.prefix(lo - 1) if lo <= hi else 0
+
+
+class BucketSeries:
+    """
+    Event counts for the last `num_buckets` time buckets, as a ring of
+    slots under a Fenwick tree. Buckets leaving the horizon are cleared as
+    the head advances, so any sub-range of the horizon is counted in
+    O(log num_buckets).
+    """
+
+    def __init__(self, num_buckets: int):
+        self.num_buckets = num_buckets
+        self.counts = np.zeros(num_buckets, dtype=np.int32)
+        self.tree = FenwickTree(num_buckets)
+        self.head: Optional[int] = None  # absolute index of the newest bucket
+
+    def advance(self, head: int):
+        if self.head is None:
+            self.head = head
+            return
+        steps = head - self.head
+        if steps <= 0:
+            return
+        if steps >= self.num_buckets:
+            self.counts[:] = 0
+            self.tree.tree[:] = 0
+        else:
+            for bucket in range(self.head + 1, head + 1):
+                slot = bucket % self.num_buckets
+                if self.counts[slot]:
+                    self.tree.add(slot, -int(self.counts[slot]))
+                    self.counts[slot] = 0
+        self.head = head
+
+    def add(self, bucket: int, count: int = 1) -> bool:
+        """Count events in absolute `bucket` (future buckets count in the head); False if too old"""
+        bucket = min(bucket, self.head)
+        if self.head - bucket >= self.num_buckets:
+            return False
+        slot = bucket % self.num_buckets
+        self.counts[slot] += count
+        self.tree.add(slot, count)
+        return True
+
+    def add_many(self, buckets: np.ndarray):
+        """Count one event per entry of `buckets` (absolute indices) and rebuild the tree once"""
+        buckets = np.minimum(buckets, self.head)
+        buckets = buckets[self.head - buckets < self.num_buckets]
+        self.counts += np.bincount(buckets % self.num_buckets,
+                                   minlength=self.num_buckets).astype(np.int32)
+        self.tree.load(self.counts)
+
+    def count(self, lo: int, hi: int) -> int:
+        """Events in absolute buckets lo..hi inclusive (clipped to the horizon)"""
+        lo = max(lo, self.head - self.num_buckets + 1)
+        hi = min(hi, self.head)
+        if lo > hi:
+            return 0
+        lo_slot, hi_slot = lo % self.num_buckets, hi % self.num_buckets
+        if lo_slot <= hi_slot:
+            return self.tree.range_sum(lo_slot, hi_slot)
+        # The range wraps around the end of the ring
+        return (self.tree.range_sum(lo_slot, self.num_buckets - 1) +
+                self.tree.range_sum(0, hi_slot))
+
+
+class CaseCountIndex:
+    """
+    Case counts per (ward, disease) over time buckets, for arbitrary
+    range queries without scanning the case log.
+
+    Each pair has a BucketSeries covering `horizon`; a query sums the
+    matching series, so it costs O(pairs matched * log buckets). Ranges
+    are half-open and rounded outward to whole buckets.
+    """
+
+    def __init__(self, bucket: timedelta = timedelta(minutes=15),
+                 horizon: timedelta = timedelta(days=30)):
+        self.bucket_seconds = int(bucket.total_seconds())
+        if self.bucket_seconds <= 0:
+            raise ValueError("bucket width must be at least one second")
+        self.num_buckets = max(1, int(horizon.total_seconds()) // self.bucket_seconds)
+        # ward_id -> disease -> series
+        self.series: Dict[str, Dict[str, BucketSeries]] = {}
+
+    def _series(self, ward_id: str, disease: str, head: int) -> BucketSeries:
+        by_disease = self.series.setdefault(ward_id, {})
+        series = by_disease.get(disease)
+        if series is None:
+            series = by_disease[disease] = BucketSeries(self.num_buckets)
+        series.advance(head)
+        return series
+
+    def add(self, ward_id: str, disease: str, ts: TimeLike, count: int = 1,
+            now: Optional[TimeLike] = None) -> bool:
+        """Count cases at `ts`; False if older than the horizon"""
+        head = int(to_epoch(now) // self.bucket_seconds)
+        bucket = int(to_epoch(ts) // self.bucket_seconds)
+        return self._series(ward_id, disease, head).add(bucket, count)
+
+    def add_columns(self, batch: Dict[str, np.ndarray], now: Optional[TimeLike] = None):
+        """Count column-form cases (case log segment layout) in one vectorized pass per pair"""
+        if not len(batch['timestamp']):
+            return
+        head = int(to_epoch(now) // self.bucket_seconds)
+        buckets = (batch['timestamp'] // self.bucket_seconds).astype(np.int64)
+        ward_ids, ward_codes = np.unique(batch['ward_id'], return_inverse=True)
+        diseases, disease_codes = np.unique(batch['disease_type'], return_inverse=True)
+        pair_codes = ward_codes.reshape(-1) * len(diseases) + disease_codes.reshape(-1)
+        order = np.argsort(pair_codes, kind='stable')
+        pairs, starts = np.unique(pair_codes[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        for pair, lo, hi in zip(pairs.tolist(), starts.tolist(), ends.tolist()):
+            ward_id, disease = ward_ids[pair // len(diseases)], diseases[pair % len(diseases)]
+            self._series(str(ward_id), str(disease), head).add_many(buckets[order[lo:hi]])
+
+    def bucket_range(self, since: TimeLike, until: TimeLike) -> Tuple[int, int]:
+        """Absolute buckets lo..hi covering [since, until)"""
+        lo = int(to_epoch(since) // self.bucket_seconds)
+        hi = math.ceil(to_epoch(until) / self.bucket_seconds) - 1
+        return lo, hi
+
+    def count(self, since: TimeLike, until: TimeLike, ward_id: Optional[str] = None,
+              disease: Optional[str] = None, now: Optional[TimeLike] = None) -> int:
+        """Cases in [since, until) for a ward and/or disease (all when None)"""
+        head = int(to_epoch(now) // self.bucket_seconds)
+        lo, hi = self.bucket_range(since, until)
+        wards = [ward_id] if ward_id is not None else list(self.series)
+        total = 0
+        for ward in wards:
+            by_disease = self.series.get(ward, {})
+            diseases = [disease] if disease is not None else list(by_disease)
+            for name in diseases:
+                series = by_disease.get(name)
+                if series is not None:
+                    series.advance(head)
+                    total += series.count(lo, hi)
+        return total
+
+    def stats(self) -> Dict[str, Any]:
+        pairs = sum(len(by_disease) for by_disease in self.series.values())
+        return {
+            "wards": len(self.series),
+            "series": pairs,
+            "bucket_seconds": self.bucket_seconds,
+            "buckets": self.num_buckets,
+            "bytes": pairs * self.num_buckets * 8
+        }
+
+
+# ===== BENCHMARK =====
+
+if __name__ == "__main__":
+    import time
+    from realtime_case_store import ColumnarCaseStore
+
+    def main(n: int = 10_000_000, wards: int = 200, queries: int = 200):
+        diseases = ['dengue', 'malaria', 'typhoid', 'covid', 'tuberculosis', 'cholera']
+        now = time.time()
+        start = now - 30 * 24 * 3600
+        rng = np.random.default_rng(7)
+
+        print("=" * 60)
+        print(f"Case Count Index Benchmark - {n:,} cases, {wards} wards x {len(diseases)} diseases")
+        print("=" * 60)
+
+        store = ColumnarCaseStore(diseases=diseases, capacity=n)
+        index = CaseCountIndex()
+        ward_names = np.array([f"W{i:03d}" for i in range(wards)])
+        build = 0.0
+        for lo in range(0, n, 1_000_000):
+            size = min(1_000_000, n - lo)
+            batch = {
+                'timestamp': np.sort(rng.uniform(start, now, size)),
+                'id': np.array([f"case_{now}"] * size),
+                'ward_id': ward_names[rng.integers(0, wards, size)],
+                'disease_type': np.array(diseases)[rng.integers(0, len(diseases), size)],
+                'severity': np.full(size, 'low'),
+                'patient_gender': np.full(size, 'F'),
+                'reported_by': np.full(size, 'PHC_0001'),
+                'notes': np.full(size, ''),
+                'patient_age': np.full(size, 30),
+            }
+            store.extend(batch)
+            t0 = time.perf_counter()
+            index.add_columns(batch, now=now)
+            build += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for i in range(10_000):
+            index.add("W_NEW", diseases[i % len(diseases)], now - i, now=now)
+        append = (time.perf_counter() - t0) / 10_000
+
+        ranges = []
+        for _ in range(queries):
+            since = rng.uniform(start, now - 3600)
+            until = since + rng.uniform(3600, 7 * 24 * 3600)
+            # Whole buckets, so both answers count exactly the same cases
+            since -= since % index.bucket_seconds
+            until -= until % index.bucket_seconds
+            ranges.append((since, until, str(rng.choice(ward_names)), str(rng.choice(diseases))))
+
+        t0 = time.perf_counter()
+        scanned = [store.count(since=s, until=u - 1e-3, ward_id=w, disease_type=d)
+                   for s, u, w, d in ranges]
+        scan = (time.perf_counter() - t0) / queries
+
+        t0 = time.perf_counter()
+        indexed = [index.count(s, u, ward_id=w, disease=d, now=now) for s, u, w, d in ranges]
+        fenwick = (time.perf_counter() - t0) / queries
+
+        t0 = time.perf_counter()
+        for s, u, _, d in ranges:
+            index.count(s, u, disease=d, now=now)
+        all_wards = (time.perf_counter() - t0) / queries
+
+        agree = sum(a == b for a, b in zip(indexed, scanned))
+        print(f"\nIndex build (vectorized) : {build:.2f}s, {index.stats()['bytes'] / 2**20:.1f} MiB")
+        print(f"Append one case          : {append * 1e6:.2f} us")
+        print(f"Range count, linear scan : {scan * 1000:8.2f} ms")
+        print(f"Range count, Fenwick     : {fenwick * 1000:8.3f} ms ({scan / fenwick:,.0f}x faster)")
+        print(f"One disease, all wards   : {all_wards * 1000:8.3f} ms")
+        print(f"Answers agree            : {agree} of {queries} queries")
+
+    main()
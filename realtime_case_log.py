@@ -0,0 +1,253 @@
+"""
+Smart Public Health Management System - Tiered Case Log
+Bounded in-memory hot tier with compressed on-disk segments and retention
+
+Author: SMC Real-Time Team
+Date: October 2026
+"""
+
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+import numpy as np
+
+from realtime_case_store import ColumnarCaseStore
+from realtime_windows import TimeLike, to_epoch
+
+# Columns persisted in cold segments (timestamp is stored as epoch seconds)
+STRING_COLUMNS = ['id', 'ward_id', 'disease_type', 'severity',
+                  'patient_gender', 'reported_by', 'notes']
+INT_COLUMNS = ['patient_age']
+COLUMNS = ['timestamp'] + STRING_COLUMNS + INT_COLUMNS
+
+
+def concat_columns(batches: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Join column batches (in the segment layout) into one"""
+    return {name: np.concatenate([batch[name] for batch in batches]) for name in COLUMNS}
+
+
+class Segment:
+    """Metadata for one compressed on-disk segment of case events"""
+
+    def __init__(self, path: Path, start_ts: float, end_ts: float, count: int):
+        self.path = path
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.count = count
+
+    @classmethod
+    def from_path(cls, path: Path) -> "Segment":
+        # cases-<start_ms>-<end_ms>-<count>.npz
+        _, start_ms, end_ms, count = path.stem.split('-')
+        return cls(path, int(start_ms) / 1000, int(end_ms) / 1000, int(count))
+
+    def overlaps(self, since: Optional[float], until: Optional[float]) -> bool:
+        return ((since is None or self.end_ts >= since) and
+                (until is None or self.start_ts <= until))
+
+    def load(self) -> Dict[str, np.ndarray]:
+        with np.load(self.path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+
+
+class CaseLog:
+    """
+    Append-only case log split into two tiers.
+
+    The hot tier keeps the most recent `hot_window` of cases in memory in a
+    ColumnarCaseStore. `compact()` moves older cases into compressed columnar
+    `.npz` segments under `segment_dir` and deletes segments past
+    `retention`. `query()` and `count()` read both tiers, so callers never
+    need to know where a case lives.
+    """
+
+    def __init__(self, segment_dir: str = "data/case_log",
+                 hot_window: timedelta = timedelta(hours=24),
+                 retention: timedelta = timedelta(days=30),
+                 hot: Optional[ColumnarCaseStore] = None):
+        """
+        Args:
+            segment_dir: Directory for cold segments (created on demand)
+            hot_window: Age after which cases are eligible for compaction
+            retention: Age after which cold segments are deleted
+            hot: Hot-tier store (a fresh ColumnarCaseStore if omitted)
+        """
+        self.segment_dir = Path(segment_dir)
+        self.hot_window = hot_window
+        self.retention = retention
+
+        # Hot tier in ingest order
+        self.hot = hot if hot is not None else ColumnarCaseStore()
+        # Column batches taken out of the hot tier but not yet written to disk
+        self.compacting: List[Dict[str, np.ndarray]] = []
+        self.segments: List[Segment] = []
+
+        if self.segment_dir.exists():
+            for path in sorted(self.segment_dir.glob("cases-*.npz")):
+                self.segments.append(Segment.from_path(path))
+
+    def append(self, case_dict: Dict[str, Any]):
+        """Add a case to the hot tier"""
+        self.hot.append(case_dict)
+
+    def append_many(self, case_dicts: List[Dict[str, Any]]):
+        """Add cases to the hot tier, all or none of them"""
+        self.hot.append_many(case_dicts)
+
+    def extend(self, batch: Dict[str, np.ndarray]):
+        """Add column-form cases (segment layout) to the hot tier"""
+        self.hot.extend(batch)
+
+    def segment_ids_since(self, ts: float) -> np.ndarray:
+        """IDs of cases in segments written at or after `ts` (epoch seconds)"""
+        batches = [segment.load()['id'] for segment in self.segments
+                   if segment.path.stat().st_mtime >= ts]
+        return np.concatenate(batches) if batches else np.array([], dtype=str)
+
+    def unpersisted(self) -> Dict[str, np.ndarray]:
+        """Every case not yet in a disk segment (compacting buffer, then hot tier)"""
+        return concat_columns(list(self.compacting) + [self.hot.export(0, len(self.hot))])
+
+    def __len__(self) -> int:
+        return (len(self.hot) +
+                sum(len(batch['timestamp']) for batch in self.compacting) +
+                sum(segment.count for segment in self.segments))
+
+    # ----- Compaction -----
+
+    def take_compactable(self, now: Optional[TimeLike] = None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Detach cases older than the hot window from the head of the hot tier.
+
+        The hot tier is in ingest order, so a late report with an old
+        timestamp is compacted once the cases ingested before it age out.
+
+        Cheap enough to run on the event loop; the detached batch stays
+        visible to queries until `register_segment` publishes it.
+        """
+        cutoff = to_epoch(now) - self.hot_window.total_seconds()
+        n = self.hot.head_run_before(cutoff)
+        if n == 0:
+            return None
+        batch = self.hot.export(0, n)
+        self.hot.drop_head(n)
+        self.compacting.append(batch)
+        return batch
+
+    def persist_batch(self, batches: List[Dict[str, np.ndarray]]) -> Optional[Segment]:
+        """
+        Write detached batches as one compressed columnar segment.
+
+        Blocking I/O with no shared-state mutation, so it is safe to run in a
+        worker thread. Call `register_segment` afterwards to publish it.
+        """
+        if not batches:
+            return None
+
+        columns = concat_columns(batches)
+        timestamps = columns['timestamp']
+        count = len(timestamps)
+
+        self.segment_dir.mkdir(parents=True, exist_ok=True)
+        start_ms = int(timestamps.min() * 1000)
+        end_ms = int(timestamps.max() * 1000)
+        path = self.segment_dir / f"cases-{start_ms}-{end_ms}-{count}.npz"
+        tmp_path = self.segment_dir / f"tmp-{path.name}"
+        np.savez_compressed(tmp_path, **columns)
+        tmp_path.replace(path)
+
+        return Segment(path, start_ms / 1000, end_ms / 1000, count)
+
+    def register_segment(self, segment: Optional[Segment]):
+        """Make a persisted segment visible and drop its rows from the compacting buffer"""
+        if segment is None:
+            return
+        self.segments.append(segment)
+        remaining = segment.count
+        while self.compacting and remaining > 0:
+            remaining -= len(self.compacting.pop(0)['timestamp'])
+
+    def expire(self, now: Optional[TimeLike] = None) -> int:
+        """Delete cold segments whose newest case is past retention"""
+        cutoff = to_epoch(now) - self.retention.total_seconds()
+        expired = [s for s in self.segments if s.end_ts < cutoff]
+        for segment in expired:
+            segment.path.unlink(missing_ok=True)
+        self.segments = [s for s in self.segments if s.end_ts >= cutoff]
+        return sum(segment.count for segment in expired)
+
+    def compact(self, now: Optional[TimeLike] = None) -> Optional[Segment]:
+        """Synchronous compaction plus retention in one call"""
+        self.take_compactable(now)
+        segment = self.persist_batch(list(self.compacting))
+        self.register_segment(segment)
+        self.expire(now)
+        return segment
+
+    # ----- Queries -----
+
+    def _cold_batches(self, since_ts: Optional[float],
+                      until_ts: Optional[float]) -> Iterator[Dict[str, np.ndarray]]:
+        """Column batches from disk segments and the compacting buffer"""
+        for segment in self.segments:
+            if segment.overlaps(since_ts, until_ts):
+                yield segment.load()
+        yield from list(self.compacting)
+
+    def batches(self) -> Iterator[Dict[str, np.ndarray]]:
+        """Every case as column batches (segment layout), oldest tier first"""
+        yield from self._cold_batches(None, None)
+        yield self.hot.export(0, len(self.hot))
+
+    def query(self, since: Optional[TimeLike] = None, until: Optional[TimeLike] = None,
+              ward_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over cases with `since <= timestamp <= until`, oldest tier first.
+        Cold cases are returned as dicts with a naive local `timestamp`.
+        """
+        since_ts = to_epoch(since) if since is not None else None
+        until_ts = to_epoch(until) if until is not None else None
+
+        for data in self._cold_batches(since_ts, until_ts):
+            mask = self._mask(data, since_ts, until_ts, ward_id)
+            for i in np.flatnonzero(mask):
+                case = {name: data[name][i].item() for name in STRING_COLUMNS + INT_COLUMNS}
+                case['notes'] = case['notes'] or None
+                case['timestamp'] = datetime.fromtimestamp(float(data['timestamp'][i]))
+                yield case
+
+        yield from self.hot.rows(self.hot.mask(since=since, until=until, ward_id=ward_id))
+
+    def count(self, since: Optional[TimeLike] = None, until: Optional[TimeLike] = None,
+              ward_id: Optional[str] = None) -> int:
+        """Count cases in a time range without materializing rows"""
+        since_ts = to_epoch(since) if since is not None else None
+        until_ts = to_epoch(until) if until is not None else None
+
+        total = 0
+        for segment in self.segments:
+            if not segment.overlaps(since_ts, until_ts):
+                continue
+            fully_inside = ((since_ts is None or segment.start_ts >= since_ts) and
+                            (until_ts is None or segment.end_ts <= until_ts))
+            if fully_inside and ward_id is None:
+                total += segment.count
+            else:
+                total += int(self._mask(segment.load(), since_ts, until_ts, ward_id).sum())
+
+        for batch in list(self.compacting):
+            total += int(self._mask(batch, since_ts, until_ts, ward_id).sum())
+
+        return total + self.hot.count(since=since, until=until, ward_id=ward_id)
+
+    @staticmethod
+    def _mask(data: Dict[str, np.ndarray], since_ts: Optional[float],
+              until_ts: Optional[float], ward_id: Optional[str]) -> np.ndarray:
+        mask = np.ones(len(data['timestamp']), dtype=bool)
+        if since_ts is not None:
+            mask &= data['timestamp'] >= since_ts
+        if until_ts is not None:
+            mask &= data['timestamp'] <= until_ts
+        if ward_id is not None:
+            mask &= data['ward_id'] == ward_id
+        return mask
@@ -0,0 +1,373 @@
+"""
+Smart Public Health Management System - Columnar Case Store
+Struct-of-arrays storage for case events with interned strings and NumPy filters
+
+Author: SMC Real-Time Team
+Date: October 2026
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+
+from realtime_windows import TimeLike, to_epoch
+
+
+class Interner:
+    """Two-way mapping between strings and small integer codes"""
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+        for value in values:
+            self.code(value)
+
+    def code(self, value: Any) -> int:
+        """Code for a value, assigning a new one if unseen (enums are interned by value)"""
+        value = '' if value is None else str(getattr(value, 'value', value))
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def lookup(self, value: Any) -> Optional[int]:
+        """Code for a value without interning it (None if unseen)"""
+        if value is None:
+            return None
+        return self.codes.get(str(getattr(value, 'value', value)))
+
+    def encode(self, values: np.ndarray) -> np.ndarray:
+        """Vectorized string -> code conversion, interning unseen values"""
+        unique, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+        return np.array([self.code(v) for v in unique.tolist()], dtype=np.int64)[inverse]
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Vectorized code -> string conversion"""
+        return np.array(self.values)[codes] if len(codes) else np.array([], dtype=str)
+
+
+class ColumnarCaseStore:
+    """
+    Append-only struct-of-arrays store for case events.
+
+    Each field lives in its own NumPy array: ward and reporter IDs, disease
+    type, severity and gender are interned to int32 codes (gender is free
+    text, so its codes are not bounded by a small enum), timestamps are
+    int64 epoch milliseconds. Case IDs ("case_<process tag>_<counter>")
+    are stored as an interned tag plus an int64 counter; any other ID is
+    interned whole (counter -1). Notes are rare and kept
+    in a sparse dict. Rows can be dropped from the head (oldest first),
+    which is how the case log hands old cases to its cold tier.
+    """
+
+    INT_FIELDS = {
+        'ward': np.int32,
+        'reporter': np.int32,
+        'disease': np.int32,
+        'severity': np.int32,
+        'gender': np.int32,
+        'age': np.int16,
+        'timestamp_ms': np.int64,
+        'id_tag': np.int32,
+        'id_seq': np.int64,
+    }
+
+    def __init__(self, diseases: Iterable[str] = (), severities: Iterable[str] = (),
+                 capacity: int = 1024):
+        """
+        Args:
+            diseases: Known disease types, so they get stable low codes
+            severities: Known severity levels
+            capacity: Initial number of rows to allocate
+        """
+        self.wards = Interner()
+        self.reporters = Interner()
+        self.diseases = Interner(diseases)
+        self.severities = Interner(severities)
+        self.genders = Interner()
+        self.id_tags = Interner()
+
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.zeros(capacity, dtype=dtype)
+            for name, dtype in self.INT_FIELDS.items()
+        }
+        self.notes: Dict[int, str] = {}  # slot -> note
+        self.head = 0  # first live slot
+        self.tail = 0  # one past the last live slot
+
+    def __len__(self) -> int:
+        return self.tail - self.head
+
+    @property
+    def capacity(self) -> int:
+        return len(self.columns['timestamp_ms'])
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the column arrays (allocated capacity, not just live rows)"""
+        return sum(column.nbytes for column in self.columns.values())
+
+    def _make_room(self):
+        live = len(self)
+        if self.head >= self.capacity // 2:
+            # Reclaim space freed by dropped head rows
+            for name, column in self.columns.items():
+                column[:live] = column[self.head:self.tail]
+            self.notes = {slot - self.head: note for slot, note in self.notes.items()}
+        else:
+            for name, column in self.columns.items():
+                grown = np.zeros(self.capacity * 2, dtype=column.dtype)
+                grown[:live] = column[self.head:self.tail]
+                self.columns[name] = grown
+            self.notes = {slot - self.head: note for slot, note in self.notes.items()}
+        self.head, self.tail = 0, live
+
+    def append(self, case_dict: Dict[str, Any]) -> int:
+        """
+        Append one case.
+
+        Returns:
+            Row position of the case among live rows
+        """
+        return self.append_many([case_dict])
+
+    def append_many(self, case_dicts: List[Dict[str, Any]]) -> int:
+        """
+        Append case dicts all or nothing: every row is encoded (and checked
+        against its column type) before any is written.
+
+        Returns:
+            Row position of the first case among live rows
+        """
+        n = len(case_dicts)
+        ids = [split_case_id(case['id']) for case in case_dicts]
+        encoded = {
+            'ward': [self.wards.code(case['ward_id']) for case in case_dicts],
+            'reporter': [self.reporters.code(case['reported_by']) for case in case_dicts],
+            'disease': [self.diseases.code(case['disease_type']) for case in case_dicts],
+            'severity': [self.severities.code(case['severity']) for case in case_dicts],
+            'gender': [self.genders.code(case['patient_gender']) for case in case_dicts],
+            'age': [case.get('patient_age') or 0 for case in case_dicts],
+            'timestamp_ms': [int(to_epoch(case['timestamp']) * 1000) for case in case_dicts],
+            'id_tag': [self.id_tags.code(tag) for tag, _ in ids],
+            'id_seq': [seq for _, seq in ids],
+        }
+        # Raises (OverflowError) on a value its column cannot hold, before anything is written
+        arrays = {name: np.array(values, dtype=self.INT_FIELDS[name])
+                  for name, values in encoded.items()}
+
+        while self.capacity - self.tail < n:
+            self._make_room()
+        lo = self.tail
+        for name, values in arrays.items():
+            self.columns[name][lo:lo + n] = values
+        for i, case in enumerate(case_dicts):
+            if case.get('notes'):
+                self.notes[lo + i] = case['notes']
+
+        self.tail += n
+        return lo - self.head
+
+    def extend(self, batch: Dict[str, np.ndarray]) -> int:
+        """
+        Append many cases given as columns in the `export()` layout (e.g. a
+        restored snapshot or a decoded stream replay).
+
+        Returns:
+            Number of cases appended
+        """
+        n = len(batch['timestamp'])
+        while self.capacity - self.tail < n:
+            self._make_room()
+
+        lo, hi = self.tail, self.tail + n
+        c = self.columns
+        c['ward'][lo:hi] = self.wards.encode(batch['ward_id'])
+        c['reporter'][lo:hi] = self.reporters.encode(batch['reported_by'])
+        c['disease'][lo:hi] = self.diseases.encode(batch['disease_type'])
+        c['severity'][lo:hi] = self.severities.encode(batch['severity'])
+        c['gender'][lo:hi] = self.genders.encode(batch['patient_gender'])
+        c['age'][lo:hi] = batch['patient_age']
+        c['timestamp_ms'][lo:hi] = np.asarray(batch['timestamp'], dtype=np.float64) * 1000
+        ids = [split_case_id(case_id) for case_id in batch['id'].tolist()]
+        c['id_tag'][lo:hi] = [self.id_tags.code(tag) for tag, _ in ids]
+        c['id_seq'][lo:hi] = [seq for _, seq in ids]
+        for i in np.flatnonzero(batch['notes'] != ''):
+            self.notes[lo + int(i)] = str(batch['notes'][i])
+
+        self.tail = hi
+        return n
+
+    def column(self, name: str) -> np.ndarray:
+        """Live view of one column"""
+        return self.columns[name][self.head:self.tail]
+
+    # ----- Vectorized filters -----
+
+    def mask(self, since: Optional[TimeLike] = None, until: Optional[TimeLike] = None,
+             ward_id: Optional[str] = None, disease_type: Optional[str] = None,
+             severity: Optional[str] = None, reported_by: Optional[str] = None) -> np.ndarray:
+        """Boolean mask over live rows matching every given filter"""
+        mask = np.ones(len(self), dtype=bool)
+        if since is not None:
+            mask &= self.column('timestamp_ms') >= int(to_epoch(since) * 1000)
+        if until is not None:
+            mask &= self.column('timestamp_ms') <= int(to_epoch(until) * 1000)
+
+        for value, interner, name in ((ward_id, self.wards, 'ward'),
+                                      (disease_type, self.diseases, 'disease'),
+                                      (severity, self.severities, 'severity'),
+                                      (reported_by, self.reporters, 'reporter')):
+            if value is None:
+                continue
+            code = interner.lookup(value)
+            if code is None:
+                return np.zeros(len(self), dtype=bool)
+            mask &= self.column(name) == code
+        return mask
+
+    def count(self, **filters) -> int:
+        """Number of live rows matching `mask(**filters)`"""
+        return int(np.count_nonzero(self.mask(**filters)))
+
+    def row(self, i: int) -> Dict[str, Any]:
+        """Rebuild the case dict for live row `i`"""
+        slot = self.head + i
+        c = self.columns
+        return {
+            'id': join_case_id(self.id_tags.values[c['id_tag'][slot]], int(c['id_seq'][slot])),
+            'ward_id': self.wards.values[c['ward'][slot]],
+            'disease_type': self.diseases.values[c['disease'][slot]],
+            'patient_age': int(c['age'][slot]),
+            'patient_gender': self.genders.values[c['gender'][slot]],
+            'severity': self.severities.values[c['severity'][slot]],
+            'timestamp': datetime.fromtimestamp(c['timestamp_ms'][slot] / 1000),
+            'reported_by': self.reporters.values[c['reporter'][slot]],
+            'notes': self.notes.get(slot)
+        }
+
+    def rows(self, mask: Optional[np.ndarray] = None) -> Iterator[Dict[str, Any]]:
+        """Case dicts for live rows selected by `mask` (all rows if None)"""
+        indices = range(len(self)) if mask is None else np.flatnonzero(mask)
+        for i in indices:
+            yield self.row(int(i))
+
+    # ----- Head eviction -----
+
+    def head_run_before(self, cutoff: TimeLike) -> int:
+        """Number of leading rows whose timestamp is before `cutoff`"""
+        newer = np.flatnonzero(self.column('timestamp_ms') >= int(to_epoch(cutoff) * 1000))
+        return int(newer[0]) if len(newer) else len(self)
+
+    def export(self, start: int, stop: int) -> Dict[str, np.ndarray]:
+        """
+        Decoded copy of live rows [start, stop) in the cold-segment column
+        layout: strings for categorical fields, float epoch seconds for time.
+        """
+        lo, hi = self.head + start, self.head + stop
+        c = self.columns
+        return {
+            'timestamp': c['timestamp_ms'][lo:hi] / 1000,
+            'id': np.array([join_case_id(tag, seq) for tag, seq in
+                            zip(self.id_tags.decode(c['id_tag'][lo:hi]).tolist(),
+                                c['id_seq'][lo:hi].tolist())], dtype=str),
+            'ward_id': self.wards.decode(c['ward'][lo:hi]),
+            'disease_type': self.diseases.decode(c['disease'][lo:hi]),
+            'severity': self.severities.decode(c['severity'][lo:hi]),
+            'patient_gender': self.genders.decode(c['gender'][lo:hi]),
+            'reported_by': self.reporters.decode(c['reporter'][lo:hi]),
+            'notes': np.array([self.notes.get(slot, '') for slot in range(lo, hi)], dtype=str),
+            'patient_age': c['age'][lo:hi].copy(),
+        }
+
+    def drop_head(self, n: int):
+        """Forget the `n` oldest rows"""
+        n = min(n, len(self))
+        for slot in range(self.head, self.head + n):
+            self.notes.pop(slot, None)
+        self.head += n
+        if self.head == self.tail:
+            self.head = self.tail = 0
+            self.notes.clear()
+
+
+def split_case_id(case_id: str) -> Tuple[str, int]:
+    """("case_<tag>", counter) for a "case_<tag>_<counter>" ID; any other ID whole, with -1"""
+    tag, _, seq = case_id.rpartition('_')
+    # Only counters that print back the same and fit the int64 column
+    if tag and seq.isascii() and seq.isdigit() and len(seq) <= 18 and str(int(seq)) == seq:
+        return tag, int(seq)
+    return case_id, -1
+
+
+def join_case_id(tag: str, seq: int) -> str:
+    return tag if seq < 0 else f"{tag}_{seq}"
+
+
+# ===== BENCHMARK =====
+
+if __name__ == "__main__":
+    import random
+    import time
+    import tracemalloc
+    from datetime import timedelta
+
+    N = 1_000_000
+    diseases = ['dengue', 'malaria', 'typhoid', 'covid', 'tuberculosis', 'cholera']
+    severities = ['low', 'medium', 'high']
+    wards = [f"W{i:03d}" for i in range(1, 201)]
+    reporters = [f"PHC_{i:04d}" for i in range(1, 2001)]
+    start = datetime.now() - timedelta(hours=24)
+
+    random.seed(7)
+    cases = [{
+        'id': f"case_bench_{i}",
+        'ward_id': random.choice(wards),
+        'disease_type': random.choice(diseases),
+        'patient_age': random.randint(0, 90),
+        'patient_gender': random.choice(['M', 'F']),
+        'severity': random.choice(severities),
+        'timestamp': start + timedelta(seconds=i * 0.0864),
+        'reported_by': random.choice(reporters),
+        'notes': None,
+    } for i in range(N)]
+
+    print("=" * 60)
+    print(f"Columnar Case Store vs dict list - {N:,} cases")
+    print("=" * 60)
+
+    # Memory: rebuild the dict list under tracemalloc so only it is measured
+    tracemalloc.start()
+    dict_list = [dict(c) for c in cases]
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    store = ColumnarCaseStore(diseases, severities)
+    t0 = time.perf_counter()
+    for c in cases:
+        store.append(c)
+    append_s = time.perf_counter() - t0
+
+    print(f"\nMemory   dict list: {dict_bytes / 1e6:8.1f} MB "
+          f"({dict_bytes / N:.0f} B/case, excluding shared datetimes/strings)")
+    print(f"Memory   columnar : {store.nbytes / 1e6:8.1f} MB "
+          f"({store.nbytes / N:.0f} B/case at capacity {store.capacity:,})")
+    print(f"Append   columnar : {N / append_s:,.0f} cases/s")
+
+    # Scan: dengue cases in one ward over the last 6 hours
+    cutoff = datetime.now() - timedelta(hours=6)
+    t0 = time.perf_counter()
+    slow = sum(1 for c in dict_list
+               if c['ward_id'] == 'W042' and c['disease_type'] == 'dengue'
+               and c['timestamp'] > cutoff)
+    list_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fast = store.count(ward_id='W042', disease_type='dengue', since=cutoff)
+    store_s = time.perf_counter() - t0
+
+    print(f"\nScan     dict list: {list_s * 1000:8.1f} ms ({slow} matches)")
+    print(f"Scan     columnar : {store_s * 1000:8.1f} ms ({fast} matches)")
+    print(f"Speedup           : {list_s / store_s:.1f}x")
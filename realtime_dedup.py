@@ -0,0 +1,353 @@
+"""
+Smart Public Health Management System - Duplicate Filter
+Time-partitioned Bloom filter with an exact recent window for idempotency keys,
+and the key stores behind ingest (per process, or shared through Redis)
+
+Author: SMC Real-Time Team
+Date: October 2026
+"""
+
+import math
+import time
+from collections import OrderedDict, deque
+from hashlib import blake2b
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)"""
+
+    def __init__(self, capacity: int, fp_rate: float):
+        """
+        Args:
+            capacity: Keys the filter is sized for
+            fp_rate: False-positive rate once `capacity` keys are in
+        """
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, key: str) -> List[int]:
+        """Bit positions of `key`; the same for every filter of this size"""
+        digest = blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, key: str, positions: Optional[List[int]] = None):
+        bits = self.bits
+        for position in positions or self.positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def has(self, positions: List[int]) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in positions)
+
+    def __contains__(self, key: str) -> bool:
+        return self.has(self.positions(key))
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class DuplicateFilter:
+    """
+    Remembers idempotency keys for `window` seconds in bounded memory.
+
+    Keys go into a ring of `partitions` Bloom filters. The newest takes
+    inserts; when it has covered `window / partitions` seconds or holds
+    `partition_capacity` keys, the oldest is dropped and a fresh one
+    started. Memory is therefore fixed at `partitions` filters however
+    long the server runs, and a key is remembered for at least
+    `window * (partitions - 1) / partitions` seconds at normal load.
+
+    Keys seen in the last `exact_window` seconds (client retries, almost
+    always) are also kept exactly, with the case ID they were first
+    accepted under. A Bloom hit is checked against them; only hits that
+    could be on older keys rely on the Bloom filters alone, at their
+    false-positive rate.
+    """
+
+    def __init__(self, window: float = 72 * 3600, partitions: int = 6,
+                 partition_capacity: int = 1_000_000, fp_rate: float = 1e-6,
+                 exact_window: float = 3600, max_exact: int = 200_000):
+        """
+        Args:
+            window: Seconds a key is remembered (the Bloom filters' horizon)
+            partitions: Bloom filters in the ring
+            partition_capacity: Keys per filter before it is rotated early
+            fp_rate: False-positive rate of each full filter
+            exact_window: Seconds keys are also held exactly
+            max_exact: Exact keys held at most, however recent
+        """
+        self.partition_seconds = window / partitions
+        self.partitions = partitions
+        self.partition_capacity = partition_capacity
+        self.fp_rate = fp_rate
+        self.exact_window = exact_window
+        self.max_exact = max_exact
+
+        self.filters: Deque[Tuple[float, BloomFilter]] = deque()  # (started, filter), oldest first
+        # key -> (case_id, epoch seconds accepted), oldest first
+        self.exact: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self.exact_since = -math.inf  # every key accepted after this is in `exact`
+
+        self.checked = 0
+        self.duplicates = 0
+        self.bloom_only = 0  # duplicates decided by a Bloom filter alone
+        self.rotations = 0
+
+    def _current(self, now: float) -> BloomFilter:
+        if not self.filters or self.filters[-1][1].full or \
+                now - self.filters[-1][0] >= self.partition_seconds:
+            self.filters.append((now, BloomFilter(self.partition_capacity, self.fp_rate)))
+            if len(self.filters) > self.partitions:
+                self.filters.popleft()
+                self.rotations += 1
+        return self.filters[-1][1]
+
+    def _expire_exact(self, now: float):
+        exact = self.exact
+        while exact and (len(exact) > self.max_exact or
+                         now - next(iter(exact.values()))[1] > self.exact_window):
+            self.exact_since = exact.popitem(last=False)[1][1]
+
+    def seen(self, key: str, now: Optional[float] = None) -> Tuple[bool, Any]:
+        """
+        Whether `key` was added before. Callers add() it in the same step
+        once they accept the item, so nothing can slip in between.
+
+        Returns:
+            (duplicate, value stored with the key). The value is None for
+            duplicates only the Bloom filters remember.
+        """
+        now = time.time() if now is None else now
+        self.checked += 1
+        self._expire_exact(now)
+        if key in self.exact:
+            self.duplicates += 1
+            return True, self.exact[key][0]
+        if self.filters and self.filters[0][0] <= self.exact_since:
+            # The filters remember keys the exact window has dropped: trust them
+            positions = self.filters[-1][1].positions(key)
+            if any(bloom.has(positions) for _, bloom in self.filters):
+                self.duplicates += 1
+                self.bloom_only += 1
+                return True, None
+        return False, None
+
+    def add(self, key: str, value: Any = None, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self._current(now).add(key)
+        self.exact[key] = (value, now)
+        self._expire_exact(now)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "bloom_only": self.bloom_only,
+            "partitions": len(self.filters),
+            "rotations": self.rotations,
+            "exact_keys": len(self.exact),
+            "bloom_bytes": sum(bloom.nbytes for _, bloom in self.filters)
+        }
+
+
+# Key states reported by IdempotencyKeys.lookup
+NEW = "new"
+INGESTING = "ingesting"
+STORED = "stored"
+
+
+class IdempotencyKeys:
+    """
+    Idempotency keys of one process: stored ones in a DuplicateFilter, ones
+    still being ingested (claimed but not yet durable) in a dict.
+
+    A key is claimed before its case is ingested and settled afterwards;
+    it is only remembered as stored if the ingest completed, so a failed
+    request can be retried with the same key.
+    """
+
+    shared = False
+
+    def __init__(self, duplicate_filter: DuplicateFilter):
+        self.filter = duplicate_filter
+        self.ingesting: Dict[str, str] = {}  # key -> case ID
+
+    def _state(self, key: str) -> Tuple[str, Optional[str]]:
+        if key in self.ingesting:
+            return INGESTING, self.ingesting[key]
+        duplicate, case_id = self.filter.seen(key)
+        return (STORED, case_id) if duplicate else (NEW, None)
+
+    async def lookup(self, keys: List[str]) -> List[Tuple[str, Optional[str]]]:
+        """(NEW, INGESTING or STORED, case ID if known) for each key"""
+        return [self._state(key) for key in keys]
+
+    async def claim(self, keys: List[str], case_ids: List[str]) -> List[bool]:
+        """Claim each key that is still new; settle() must follow for those"""
+        claimed = []
+        for key, case_id in zip(keys, case_ids):
+            new = self._state(key)[0] == NEW
+            if new:
+                self.ingesting[key] = case_id
+            claimed.append(new)
+        return claimed
+
+    async def settle(self, keys: List[str], case_ids: List[str], stored: bool):
+        """Release claimed keys, remembering them if their cases were stored durably"""
+        for key, case_id in zip(keys, case_ids):
+            self.ingesting.pop(key, None)
+            if stored:
+                self.filter.add(key, case_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.filter.stats(), "ingesting": len(self.ingesting)}
+
+
+class RedisIdempotencyKeys(IdempotencyKeys):
+    """
+    Idempotency keys shared by every worker and node through Redis: one
+    string key per idempotency key, holding its case ID.
+
+    A claim is a SET NX of "ingesting:<case id>" that lapses after
+    `claim_ttl` seconds (so a crashed worker cannot hold a key forever);
+    settling a stored case overwrites it with the case ID for `window`
+    seconds. Exact, but memory grows with every key in the window, unlike
+    the fixed-size DuplicateFilter.
+    """
+
+    shared = True
+
+    # Drops a claim only if it is still this request's
+    RELEASE = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, redis_client, prefix: str = "smc:", window: float = 72 * 3600,
+                 claim_ttl: float = 300):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.window = int(window)
+        self.claim_ttl = int(claim_ttl)
+        self._release = redis_client.register_script(self.RELEASE)
+        self.checked = 0
+        self.duplicates = 0
+        self.lost_claims = 0  # claimed by another request between lookup and claim
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}idem:{key}"
+
+    async def lookup(self, keys: List[str]) -> List[Tuple[str, Optional[str]]]:
+        if not keys:
+            return []
+        states = []
+        for value in await self.redis.mget([self._key(key) for key in keys]):
+            if isinstance(value, bytes):
+                value = value.decode()
+            if value is None:
+                states.append((NEW, None))
+            elif value.startswith(INGESTING + ":"):
+                states.append((INGESTING, value[len(INGESTING) + 1:]))
+            else:
+                states.append((STORED, value))
+        self.checked += len(keys)
+        self.duplicates += sum(state == STORED for state, _ in states)
+        return states
+
+    async def claim(self, keys: List[str], case_ids: List[str]) -> List[bool]:
+        if not keys:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        for key, case_id in zip(keys, case_ids):
+            pipe.set(self._key(key), f"{INGESTING}:{case_id}", nx=True, ex=self.claim_ttl)
+        claimed = [bool(ok) for ok in await pipe.execute()]
+        self.lost_claims += claimed.count(False)
+        return claimed
+
+    async def settle(self, keys: List[str], case_ids: List[str], stored: bool):
+        if not keys:
+            return
+        if not stored:
+            # Failed ingests only; one round trip each is fine
+            for key, case_id in zip(keys, case_ids):
+                await self._release(keys=[self._key(key)], args=[f"{INGESTING}:{case_id}"])
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for key, case_id in zip(keys, case_ids):
+            pipe.set(self._key(key), case_id, ex=self.window)
+        await pipe.execute()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "lost_claims": self.lost_claims
+        }
+
+
+# ===== BENCHMARK =====
+
+if __name__ == "__main__":
+    import sys
+    import uuid
+
+    def main(n: int = 200_000, probes: int = 200_000):
+        print("=" * 60)
+        print(f"Duplicate Filter Benchmark - {n:,} keys, {probes:,} fresh probes")
+        print("=" * 60)
+
+        keys = [uuid.uuid4().hex for _ in range(n)]
+        fresh = [uuid.uuid4().hex for _ in range(probes)]
+
+        for fp_rate in (1e-4, 1e-6):
+            bloom = BloomFilter(n, fp_rate)
+            t0 = time.perf_counter()
+            for key in keys:
+                bloom.add(key)
+            insert = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            false_positives = sum(key in bloom for key in fresh)
+            lookup = time.perf_counter() - t0
+            print(f"\nBloom filter, target fp {fp_rate:g} ({bloom.hashes} hashes)")
+            print(f"  False-positive rate : {false_positives / probes:.2e} "
+                  f"({false_positives} of {probes:,})")
+            print(f"  Memory / 1M keys    : {bloom.nbytes / n * 1e6 / 2**20:6.2f} MiB")
+            print(f"  Insert / lookup     : {insert / n * 1e6:.2f} / {lookup / probes * 1e6:.2f} us")
+
+        exact = {key: "case_0000000000.000000" for key in keys}
+        exact_bytes = (sys.getsizeof(exact) + sum(map(sys.getsizeof, keys))
+                       + sys.getsizeof("case_0000000000.000000"))
+        print(f"\nExact dict of keys    : {exact_bytes / n * 1e6 / 2**20:6.2f} MiB / 1M keys")
+
+        # Hours of distinct keys through a 1h filter: memory stays flat, and
+        # every duplicate it reports is a false positive
+        dedup = DuplicateFilter(window=3600, partitions=6, partition_capacity=n // 6,
+                                exact_window=600, max_exact=n // 10)
+        now = 0.0
+        for i, key in enumerate(keys * 3):
+            now += 0.05  # 20 keys/s, over 8 hours
+            key = key if i < n else f"{key}/{i}"
+            if not dedup.seen(key, now=now)[0]:
+                dedup.add(key, now=now)
+        stats = dedup.stats()
+        print(f"Partitioned, 8h of keys: {stats['bloom_bytes'] / 2**20:6.2f} MiB in "
+              f"{stats['partitions']} filters after {stats['rotations']} rotations, "
+              f"{stats['duplicates']} false duplicates in {stats['checked']:,} keys")
+
+    main()
@@ -0,0 +1,184 @@
+"""
+Smart Public Health Management System - Event Bus
+In-process async pub/sub with monotonic event IDs, replay and optional Redis fan-in
+
+Author: SMC Real-Time Team
+Date: October 2026
+"""
+
+import asyncio
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+import orjson
+
+from realtime_broadcast import Payload
+
+REDIS_CHANNEL_PREFIX = "events:"
+REDIS_SEQUENCE_KEY = "events:seq"
+
+
+def epoch_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class Subscription:
+    """
+    A live feed of (event_id, Payload) for one topic.
+
+    The queue is bounded; if a consumer falls behind it is marked `lagged`
+    and should re-read from the bus replay log instead of the queue.
+    """
+
+    def __init__(self, topic: str, max_queue: int):
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.lagged = False
+
+    def deliver(self, event_id: int, payload: Payload):
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait((event_id, payload))
+        except asyncio.QueueFull:
+            self.lagged = True
+
+    async def get(self) -> Tuple[int, Payload]:
+        return await self.queue.get()
+
+
+class EventBus:
+    """
+    Topic-based pub/sub for pushing events to streaming clients.
+
+    Every published event gets a monotonically increasing ID and is kept in
+    a bounded per-topic replay log, so reconnecting clients can resume after
+    the last ID they saw. Publishing wakes subscribers immediately.
+
+    Without Redis, IDs are at least the publish time in epoch milliseconds,
+    so they keep increasing across restarts and a client resuming with an ID
+    from before one is not left waiting for the counter to catch up.
+
+    With `attach_redis`, IDs come from a shared Redis counter and events
+    travel through Redis pub/sub, so subscribers on every node see every
+    event exactly once and with the same IDs.
+    """
+
+    def __init__(self, replay_size: int = 10000, subscriber_queue: int = 1000):
+        """
+        Args:
+            replay_size: Events kept per topic for Last-Event-ID resume
+            subscriber_queue: Live events buffered per subscriber before it is marked lagged
+        """
+        self.replay_size = replay_size
+        self.subscriber_queue = subscriber_queue
+
+        self.last_id = epoch_ms()
+        self.logs: Dict[str, Deque[Tuple[int, Payload]]] = defaultdict(
+            lambda: deque(maxlen=self.replay_size)
+        )
+        self.subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+        self.listeners: Dict[str, List[Callable[[int, Dict[str, Any]], None]]] = defaultdict(list)
+
+        self.redis_client = None
+        self._listener: Optional[asyncio.Task] = None
+
+    # ----- Subscribing -----
+
+    def subscribe(self, topic: str) -> Subscription:
+        subscription = Subscription(topic, self.subscriber_queue)
+        self.subscribers[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers[subscription.topic].discard(subscription)
+
+    def add_listener(self, topic: str, callback: Callable[[int, Dict[str, Any]], None]):
+        """
+        Call `callback(event_id, message)` synchronously for every event of a
+        topic delivered to this node, including those published elsewhere.
+        """
+        self.listeners[topic].append(callback)
+
+    def replay(self, topic: str, after_id: int) -> List[Tuple[int, Payload]]:
+        """Logged events of a topic with ID greater than `after_id`, oldest first"""
+        events = []
+        for event_id, payload in reversed(self.logs[topic]):
+            if event_id <= after_id:
+                break
+            events.append((event_id, payload))
+        events.reverse()
+        return events
+
+    # ----- Publishing -----
+
+    def _deliver(self, topic: str, event_id: int, payload: Payload):
+        self.last_id = max(self.last_id, event_id)
+        self.logs[topic].append((event_id, payload))
+        for subscription in list(self.subscribers[topic]):
+            subscription.deliver(event_id, payload)
+        for callback in self.listeners[topic]:
+            try:
+                callback(event_id, payload.message)
+            except Exception as e:
+                print(f"⚠ Event listener for {topic} failed:", e)
+
+    async def publish(self, topic: str, message: Dict[str, Any]) -> int:
+        """
+        Publish a copy of a message dict with its `event_id` field set to the
+        assigned ID; the caller's dict is left as it is.
+
+        Returns:
+            The event ID
+        """
+        if self.redis_client is not None:
+            try:
+                event_id = await self.redis_client.incr(REDIS_SEQUENCE_KEY)
+                await self.redis_client.publish(
+                    REDIS_CHANNEL_PREFIX + topic,
+                    orjson.dumps(dict(message, event_id=event_id), default=str)
+                )
+                # Delivered locally by the listener, like on every other node
+                return event_id
+            except Exception as e:
+                print("⚠ Redis event publish failed, delivering locally:", e)
+
+        event_id = self.last_id + 1
+        if self.redis_client is None:
+            event_id = max(event_id, epoch_ms())
+        self._deliver(topic, event_id, Payload(dict(message, event_id=event_id)))
+        return event_id
+
+    # ----- Redis backend -----
+
+    async def attach_redis(self, redis_client):
+        """Route events through Redis pub/sub so all nodes share one event sequence"""
+        pubsub = redis_client.pubsub()
+        await pubsub.psubscribe(REDIS_CHANNEL_PREFIX + "*")
+        # The shared counter takes over from the local clock-based IDs
+        self.last_id = int(await redis_client.get(REDIS_SEQUENCE_KEY) or 0)
+        self.redis_client = redis_client
+        self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def _listen(self, pubsub):
+        try:
+            async for item in pubsub.listen():
+                if item.get('type') != 'pmessage':
+                    continue
+                channel = item['channel']
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                message = orjson.loads(item['data'])
+                self._deliver(channel[len(REDIS_CHANNEL_PREFIX):],
+                              int(message['event_id']), Payload(message))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("⚠ Redis event listener stopped, falling back to local delivery:", e)
+            self.redis_client = None
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        self.redis_client = None
@@ -0,0 +1,342 @@
+"""
+Smart Public Health Management System - Micro-Batched Model Inference
+Async front end that batches per-ward predictions onto a model worker thread
+
+Author: SMC Real-Time Team
+Date: October 2026
+"""
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+
+class MicroBatcher:
+    """
+    Collects prediction requests from many coroutines and runs them through
+    a model in batches on a single worker thread.
+
+    A batch is sent when `max_batch` distinct keys are waiting or `max_delay`
+    seconds after the first one arrived, whichever comes first. Requests
+    for a key already in the pending batch share its result (the newest
+    features win). The model only ever runs on the worker thread, so models
+    that are not thread-safe (e.g. River pipelines) need no locking, and the
+    event loop never waits on model code. Online training (`learn()`) runs
+    on the same thread, between prediction batches.
+    """
+
+    def __init__(self, predict_batch: Callable[[List[Dict[str, Any]]], List[Any]],
+                 max_batch: int = 64, max_delay: float = 0.002,
+                 learn_batch: Optional[Callable[[List[Tuple[Dict[str, Any], Any]]], None]] = None):
+        """
+        Args:
+            predict_batch: Maps a list of feature dicts to one result each (runs on the worker thread)
+            max_batch: Most distinct keys per batch
+            max_delay: Longest a request waits for its batch to fill, in seconds
+            learn_batch: Trains the model on (features, label) pairs (runs on the worker thread)
+        """
+        self.predict_batch = predict_batch
+        self.learn_batch = learn_batch
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model")
+        self.pending: Dict[str, Tuple[Dict[str, Any], asyncio.Future]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._in_flight: set = set()
+
+        self.requests = 0
+        self.batches = 0
+        self.predicted = 0
+        self.learned = 0
+        self.failures = 0
+        self.model_seconds = 0.0
+
+    async def predict(self, key: str, features: Dict[str, Any]) -> Any:
+        """Result of the model for `features`, batched with other pending keys"""
+        self.requests += 1
+        loop = asyncio.get_running_loop()
+        entry = self.pending.get(key)
+        if entry is None:
+            future = loop.create_future()
+        else:
+            future = entry[1]
+        self.pending[key] = (features, future)
+
+        if len(self.pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_delay, self._flush)
+        # Shielded: one caller timing out must not cancel the shared result
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, {}
+        task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _run_batch(self, batch: Dict[str, Tuple[Dict[str, Any], asyncio.Future]]):
+        futures = [future for _, future in batch.values()]
+        try:
+            started = time.perf_counter()
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.predict_batch, [features for features, _ in batch.values()]
+            )
+            self.model_seconds += time.perf_counter() - started
+        except Exception as e:
+            self.failures += 1
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.predicted += len(futures)
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def learn(self, samples: List[Tuple[Dict[str, Any], Any]]):
+        """Train the model on labelled (features, label) pairs, on the worker thread"""
+        if self.learn_batch is None or not samples:
+            return
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.learn_batch, samples)
+        self.learned += len(samples)
+
+    async def close(self):
+        """Finish queued and running batches, then stop the worker thread"""
+        self._flush()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        self.executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "predicted": self.predicted,
+            "avg_batch": round(self.predicted / self.batches, 1) if self.batches else 0,
+            "avg_batch_ms": round(self.model_seconds / self.batches * 1000, 3) if self.batches else 0,
+            "learned": self.learned,
+            "failures": self.failures,
+            "pending": len(self.pending)
+        }
+
+
+class OutcomeSampler:
+    """
+    Features a model was asked about, held until their outcome is known so
+    the model can learn online from what actually happened.
+
+    `record()` keeps at most one sample per key every `sample_every`
+    seconds; `due()` hands back those recorded at least `horizon` seconds
+    ago for the caller to label and learn. Until `warmup` labels of each
+    class have been learned the model is not `warm`, and callers should
+    not trust its predictions yet.
+    """
+
+    def __init__(self, horizon: float, sample_every: float = 900, warmup: int = 50,
+                 max_pending: int = 100000):
+        """
+        Args:
+            horizon: Seconds after a sample that its outcome is judged
+            sample_every: Shortest gap between samples of one key, in seconds
+            warmup: Labels of each class learned before the model is warm
+            max_pending: Samples held at most (the oldest are dropped beyond)
+        """
+        self.horizon = horizon
+        self.sample_every = sample_every
+        self.warmup = warmup
+
+        self.pending: Deque[Tuple[float, str, Dict[str, Any]]] = deque(maxlen=max_pending)
+        self.last_sampled: Dict[str, float] = {}
+        self.labels: Dict[bool, int] = {False: 0, True: 0}
+
+    def record(self, key: str, features: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """Hold `features` for labelling later; False if `key` was sampled too recently"""
+        now = time.time() if now is None else now
+        if now - self.last_sampled.get(key, -self.sample_every) < self.sample_every:
+            return False
+        self.last_sampled[key] = now
+        self.pending.append((now, key, features))
+        return True
+
+    def due(self, now: Optional[float] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """(key, features) of samples whose outcome can now be judged, oldest first"""
+        now = time.time() if now is None else now
+        ready = []
+        while self.pending and now - self.pending[0][0] >= self.horizon:
+            _, key, features = self.pending.popleft()
+            ready.append((key, features))
+        return ready
+
+    def learned(self, labels: List[bool]):
+        for label in labels:
+            self.labels[bool(label)] += 1
+
+    @property
+    def warm(self) -> bool:
+        return min(self.labels.values()) >= self.warmup
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self.pending),
+            "positive_labels": self.labels[True],
+            "negative_labels": self.labels[False],
+            "warm": self.warm
+        }
+
+
+# ===== BENCHMARK =====
+
+if __name__ == "__main__":
+    import math
+    import random
+    import statistics
+
+    import httpx
+    import realtime_backend
+    from realtime_admission import TokenBuckets
+
+    CASE = {"disease_type": "dengue", "patient_age": 30, "patient_gender": "F",
+            "severity": "low", "reported_by": "PHC_0001"}
+
+    class StandInPredictor:
+        """
+        Used only when river is missing: a pure-Python scaler plus online
+        logistic regression over the same features, so the per-call cost
+        (and the GIL it holds) is in the same range as the River pipeline.
+        """
+
+        def __init__(self, learning_rate: float = 0.05):
+            self.learning_rate = learning_rate
+            self.n = 0
+            self.mean = {}
+            self.var = {}
+            self.weights = {}
+            self.bias = 0.0
+
+        def _scaled(self, ward_data):
+            features = {name: float(ward_data.get(name, 0)) for name in
+                        ('case_count_1h', 'case_count_6h', 'case_count_24h', 'case_velocity', 'growth_rate')}
+            features['primary_disease_dengue'] = float(ward_data.get('top_disease') == 'dengue')
+            return {name: (value - self.mean.get(name, 0.0)) /
+                          math.sqrt(self.var.get(name, 0.0) / max(self.n, 1) + 1e-9)
+                    for name, value in features.items()}, features
+
+        def predict(self, ward_data):
+            scaled, _ = self._scaled(ward_data)
+            z = self.bias + sum(self.weights.get(name, 0.0) * value for name, value in scaled.items())
+            return {'outbreak_probability': round(1 / (1 + math.exp(-max(-30.0, min(30.0, z)))), 3)}
+
+        def update(self, ward_data, actual_outbreak: bool):
+            _, features = self._scaled(ward_data)
+            self.n += 1
+            for name, value in features.items():
+                mean = self.mean.get(name, 0.0)
+                delta = value - mean
+                mean += delta / self.n
+                self.var[name] = self.var.get(name, 0.0) + delta * (value - mean)
+                self.mean[name] = mean
+            scaled, _ = self._scaled(ward_data)
+            error = float(actual_outbreak) - self.predict(ward_data)['outbreak_probability']
+            self.bias += self.learning_rate * error
+            for name, value in scaled.items():
+                self.weights[name] = self.weights.get(name, 0.0) + self.learning_rate * error * value
+
+    def labelled_outcomes(n: int, seed: int = 7) -> List[Tuple[Dict[str, Any], bool]]:
+        """Synthetic ward windows labelled by whether the next 6h reach the outbreak level"""
+        rng = random.Random(seed)
+        samples = []
+        for _ in range(n):
+            count_24h = rng.randint(0, 40)
+            count_6h = rng.randint(0, count_24h)
+            count_1h = rng.randint(0, count_6h)
+            ward_data = dict(realtime_backend.window_snapshot(count_1h, count_6h, count_24h),
+                             top_disease=rng.choice(['dengue', 'malaria', 'covid']))
+            next_6h = count_6h * rng.uniform(0.5, 2.0) + count_1h * rng.uniform(0, 2)
+            samples.append((ward_data, next_6h >= realtime_backend.MODEL_OUTBREAK_CASES_6H))
+        return samples
+
+    async def ingest(n: int, concurrency: int, model: Optional[MicroBatcher]) -> List[float]:
+        """Per-request latency of POST /events/case in-process (ASGI), in ms"""
+        realtime_backend.state = realtime_backend.RealTimeState()
+        realtime_backend.state.outbreak_model = model
+        # Trained before the run (model_batcher), so serve its predictions from the start
+        realtime_backend.state.outcome_samples.warmup = 0
+        # One reporter sends everything here; measure the model, not admission control
+        realtime_backend.reporter_limits = TokenBuckets(rate=1e9, burst=1e9)
+        transport = httpx.ASGITransport(app=realtime_backend.app)
+        latencies = []
+        remaining = n
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def handler():
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    started = time.perf_counter()
+                    response = await client.post("/events/case",
+                                                 json=dict(CASE, ward_id=f"W{remaining % 500:03d}"))
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    response.raise_for_status()
+
+            await asyncio.gather(*(handler() for _ in range(concurrency)))
+        if model is not None:
+            await model.close()
+        return latencies
+
+    TRAINING = labelled_outcomes(2000)
+    HELD_OUT = labelled_outcomes(1000, seed=11)
+
+    def trained_predictor():
+        """A model trained on labelled outcomes, as the backend's is once warm"""
+        if realtime_backend.StreamingOutbreakPredictor is not None:
+            predictor = realtime_backend.StreamingOutbreakPredictor()
+        else:
+            predictor = StandInPredictor()
+        for ward_data, label in TRAINING:
+            predictor.update(ward_data, label)
+        return predictor
+
+    def model_batcher(**kwargs) -> MicroBatcher:
+        predictor = trained_predictor()
+        return MicroBatcher(lambda batch: [predictor.predict(w)['outbreak_probability'] for w in batch],
+                            **kwargs)
+
+    def report(label: str, latencies: List[float], model: Optional[MicroBatcher] = None):
+        cuts = statistics.quantiles(latencies, n=100)
+        line = f"{label:<28}: p50 {cuts[49]:6.2f} ms   p99 {cuts[98]:6.2f} ms"
+        if model is not None:
+            line += f"   ({model.stats()['avg_batch']} wards/batch)"
+        print(line)
+
+    async def main(n: int = 10_000, concurrency: int = 64):
+        model_name = ("StreamingOutbreakPredictor" if realtime_backend.StreamingOutbreakPredictor
+                      else "stand-in model (river not installed)")
+        print("=" * 60)
+        print(f"Ingest Latency With Outbreak Model - {n:,} case POSTs, {concurrency} concurrent")
+        print(f"Model: {model_name}")
+        print("=" * 60 + "\n")
+
+        predictor = trained_predictor()
+        hits = sum((predictor.predict(w)['outbreak_probability'] >= 0.5) == label for w, label in HELD_OUT)
+        majority = max(sum(label for _, label in HELD_OUT), sum(not label for _, label in HELD_OUT))
+        print(f"Held-out accuracy after {len(TRAINING):,} outcomes: {hits / len(HELD_OUT):.1%} "
+              f"(majority class {majority / len(HELD_OUT):.1%})\n")
+
+        report("Heuristic only", await ingest(n, concurrency, None))
+        unbatched = model_batcher(max_batch=1, max_delay=0)
+        report("Model, one call per request", await ingest(n, concurrency, unbatched), unbatched)
+        batched = model_batcher(max_batch=realtime_backend.MODEL_BATCH_SIZE,
+                                max_delay=realtime_backend.MODEL_BATCH_DELAY)
+        report("Model, micro-batched", await ingest(n, concurrency, batched), batched)
+
+    asyncio.run(main())
@@ -0,0 +1,180 @@
+"""
+Smart Public Health Management System - Async Ingest Queue
+Bounded queue between request acknowledgement and case processing
+
+Author: SMC Real-Time Team
+Date: October 2026
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+Processor = Callable[[List[Any]], Awaitable[None]]
+
+
+class IngestQueue:
+    """
+    Accepts items from request handlers and processes them in the background.
+
+    `offer()` only puts the item on a bounded `asyncio.Queue`; if the queue
+    is full the item is shed and the caller is told so. The last `reserve`
+    places are kept for priority items, so they are shed last. `workers` tasks
+    drain the queue, each taking whatever is waiting (up to `batch_size`
+    items) and handing it to `process_batch` in one call.
+
+    Lag is measured from `offer()` until `process_batch` returns.
+    """
+
+    def __init__(self, process_batch: Processor, max_size: int = 10000,
+                 workers: int = 4, batch_size: int = 200, reserve: int = 0,
+                 lag_samples: int = 1000):
+        """
+        Args:
+            process_batch: Coroutine applying a list of items
+            max_size: Items queued before new ones are shed
+            workers: Processing tasks draining the queue
+            batch_size: Most items handed to one process_batch call
+            reserve: Places only priority items may take
+            lag_samples: Recent per-item lags kept for the p99
+        """
+        self.process_batch = process_batch
+        self.max_size = max_size
+        self.workers = workers
+        self.batch_size = batch_size
+        self.reserve = min(reserve, max_size)
+
+        self.queue: Optional[asyncio.Queue] = None  # created on start, inside the event loop
+        self._tasks: List[asyncio.Task] = []
+        self.lags: Deque[float] = deque(maxlen=lag_samples)
+
+        self.accepted = 0
+        self.processed = 0
+        self.failed = 0
+        self.shed = 0
+        self.batches = 0
+        self.max_depth = 0
+        self.max_lag = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.max_size)
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Process everything already accepted, then stop the workers"""
+        if not self._tasks:
+            return
+        await self.queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def offer(self, item: Any, priority: bool = False) -> bool:
+        """
+        Queue one item without waiting.
+
+        Returns:
+            False if the queue is full (the item was shed)
+        """
+        if not priority and self.queue.qsize() >= self.max_size - self.reserve:
+            self.shed += 1
+            return False
+        try:
+            self.queue.put_nowait((time.monotonic(), item))
+        except asyncio.QueueFull:
+            self.shed += 1
+            return False
+        self.accepted += 1
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+
+    async def _run(self):
+        while True:
+            batch: List[Tuple[float, Any]] = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await self.process_batch([item for _, item in batch])
+                self.processed += len(batch)
+                self.batches += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"⚠ Ingest batch of {len(batch)} failed:", e)
+            finally:
+                done = time.monotonic()
+                for enqueued, _ in batch:
+                    self.lags.append(done - enqueued)
+                self.max_lag = max(self.max_lag, done - batch[0][0])
+                for _ in batch:
+                    self.queue.task_done()
+
+    def lag_p99(self) -> float:
+        if not self.lags:
+            return 0.0
+        ordered = sorted(self.lags)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_depth": self.max_depth,
+            "capacity": self.max_size,
+            "accepted": self.accepted,
+            "processed": self.processed,
+            "failed": self.failed,
+            "shed": self.shed,
+            "batches": self.batches,
+            "lag_ms_p99": round(self.lag_p99() * 1000, 2),
+            "lag_ms_max": round(self.max_lag * 1000, 2)
+        }
+
+
+# ===== BENCHMARK =====
+
+if __name__ == "__main__":
+    async def main(n: int = 20000, burst: int = 5000):
+        async def process(items):
+            # Roughly what ingest_case_batch costs: a fixed part per batch plus a per-item part
+            await asyncio.sleep(0.002)
+            time.sleep(len(items) * 20e-6)
+
+        print("=" * 60)
+        print(f"Ingest Queue Benchmark - {n:,} items in bursts of {burst:,}")
+        print("=" * 60)
+
+        t0 = time.perf_counter()
+        for i in range(n):
+            await process([i])
+        inline = time.perf_counter() - t0
+
+        queue = IngestQueue(process, max_size=burst * 2)
+        queue.start()
+        t0 = time.perf_counter()
+        offer_time = 0.0
+        for start in range(0, n, burst):
+            t1 = time.perf_counter()
+            for i in range(start, min(n, start + burst)):
+                queue.offer(i)
+            offer_time += time.perf_counter() - t1
+            await asyncio.sleep(0.05)
+        await queue.stop()
+        queued = time.perf_counter() - t0
+        stats = queue.stats()
+
+        print(f"\nInline, one item per call : {n / inline:10,.0f} items/s")
+        print(f"Acknowledge (offer) cost  : {offer_time / n * 1e6:10.2f} us/item")
+        print(f"Queued, batched workers   : {n / queued:10,.0f} items/s "
+              f"({stats['batches']} batches)")
+        print(f"Processing lag            : p99 {stats['lag_ms_p99']} ms, max {stats['lag_ms_max']} ms")
+
+    asyncio.run(main())
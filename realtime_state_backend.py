@@ -0,0 +1,390 @@
+"""
+Smart Public Health Management System - Ward State Backends
+Pluggable storage for per-ward case windows: in-process or shared through Redis
+
+Author: SMC Real-Time Team
+Date: October 2026
+"""
+
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+from realtime_windows import TimerWheel, WardWindow, to_epoch, window_snapshot
+
+HOUR = 3600
+SIX_HOURS = 6 * HOUR
+DAY = 24 * HOUR
+
+
+class WardStateBackend:
+    """
+    Interface for the per-ward statistics behind risk scoring.
+
+    `shared` is True when several processes see the same data, in which
+    case callers must not assume their own writes are the only ones.
+    """
+
+    shared = False
+
+    async def add_cases(self, by_ward: Dict[str, List[Dict[str, Any]]]):
+        """Record stored case dicts grouped by ward"""
+        raise NotImplementedError
+
+    async def ward_snapshot(self, ward_id: str) -> Optional[Tuple[Dict[str, float], Dict[str, int]]]:
+        """(window counts, disease counts) for a ward, or None if it has no cases"""
+        raise NotImplementedError
+
+    async def ward_ids(self) -> List[str]:
+        raise NotImplementedError
+
+    async def ward_totals(self) -> Dict[str, int]:
+        """24h case count per ward"""
+        raise NotImplementedError
+
+    async def total_cases_24h(self) -> int:
+        raise NotImplementedError
+
+    async def expire(self, now: Optional[float] = None) -> Tuple[List[str], List[str]]:
+        """
+        Age windows up to `now`.
+
+        Returns:
+            (wards whose window counts changed, wards dropped because they
+            have no cases left in the horizon)
+        """
+        raise NotImplementedError
+
+
+class InMemoryWardState(WardStateBackend):
+    """
+    Per-process bucketed windows; the default, and what tests run against.
+
+    Each ward sits on a timer wheel at the bucket where its oldest case
+    next leaves the 1h, 6h or 24h span, so `expire()` only touches wards
+    whose counts actually change and drops wards left empty.
+    """
+
+    def __init__(self, bucket: timedelta = timedelta(minutes=1)):
+        self.bucket = bucket
+        self.ward_stats: Dict[str, Dict[str, Any]] = {}
+        num_buckets = WardWindow(bucket).num_buckets
+        self.expiry = TimerWheel(num_buckets + 1, int(to_epoch(None) // bucket.total_seconds()))
+
+    def get_or_create(self, ward_id: str) -> Dict[str, Any]:
+        if ward_id not in self.ward_stats:
+            self.ward_stats[ward_id] = {
+                'window': WardWindow(self.bucket),
+                'disease_counts': defaultdict(int)
+            }
+        return self.ward_stats[ward_id]
+
+    async def add_cases(self, by_ward: Dict[str, List[Dict[str, Any]]]):
+        for ward_id, ward_cases in by_ward.items():
+            ward_stats = self.get_or_create(ward_id)
+            window = ward_stats['window']
+            bucket_counts = defaultdict(int)
+            for case_dict in ward_cases:
+                bucket_counts[window.bucket_index(case_dict['timestamp'])] += 1
+                ward_stats['disease_counts'][_value(case_dict['disease_type'])] += 1
+            for bucket, count in bucket_counts.items():
+                window.add(bucket * window.bucket_seconds, count)
+            self._schedule_new(ward_id, window, bucket_counts)
+
+    def _schedule_new(self, ward_id: str, window: WardWindow, buckets: Dict[int, int]):
+        """Bring a ward's expiry forward if newly counted buckets leave a span sooner"""
+        nearest = self.expiry.deadline(ward_id)
+        for bucket in buckets:
+            bucket = min(bucket, window.head)
+            # Smallest tracked span still counting this bucket (totals are ascending)
+            span = next((s for s in window.totals if window.head - bucket < s), None)
+            if span is not None and (nearest is None or bucket + span < nearest):
+                nearest = bucket + span
+        if nearest is not None:
+            self.expiry.schedule(ward_id, nearest)
+
+    async def expire(self, now: Optional[float] = None):
+        now = to_epoch(now)
+        changed, evicted = [], []
+        for ward_id in self.expiry.advance(int(now // self.bucket.total_seconds())):
+            stats = self.ward_stats.get(ward_id)
+            if stats is None:
+                continue
+            window = stats['window']
+            window.advance(now)
+            changed.append(ward_id)
+            next_change = window.next_change()
+            if next_change is None:
+                del self.ward_stats[ward_id]
+                evicted.append(ward_id)
+            else:
+                self.expiry.schedule(ward_id, next_change)
+        return changed, evicted
+
+    async def ward_snapshot(self, ward_id: str):
+        stats = self.ward_stats.get(ward_id)
+        if stats is None:
+            return None
+        return stats['window'].snapshot(), stats['disease_counts']
+
+    async def ward_ids(self) -> List[str]:
+        return list(self.ward_stats)
+
+    async def ward_totals(self) -> Dict[str, int]:
+        return {ward_id: stats['window'].total() for ward_id, stats in self.ward_stats.items()}
+
+    async def total_cases_24h(self) -> int:
+        return sum(stats['window'].total() for stats in self.ward_stats.values())
+
+    def export(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Windows and disease counts as dense arrays, for snapshots (see `restore`)"""
+        now = to_epoch(now)
+        ward_ids = list(self.ward_stats)
+        diseases = sorted({d for stats in self.ward_stats.values() for d in stats['disease_counts']})
+        num_buckets = WardWindow(self.bucket).num_buckets
+        windows = np.zeros((len(ward_ids), num_buckets), dtype=np.int32)
+        disease_counts = np.zeros((len(ward_ids), len(diseases)), dtype=np.int64)
+        for i, ward_id in enumerate(ward_ids):
+            stats = self.ward_stats[ward_id]
+            windows[i] = stats['window'].series(now)
+            for j, disease in enumerate(diseases):
+                disease_counts[i, j] = stats['disease_counts'].get(disease, 0)
+        return {
+            'ward_ids': np.array(ward_ids, dtype=str),
+            'head': int(now // self.bucket.total_seconds()),
+            'windows': windows,
+            'diseases': np.array(diseases, dtype=str),
+            'disease_counts': disease_counts
+        }
+
+    def restore(self, ward_ids: np.ndarray, head: int, windows: np.ndarray,
+                diseases: np.ndarray, disease_counts: np.ndarray):
+        """
+        Add exported (or replay-built) window series and disease counts to
+        the current state. `head` must not be older than any existing window.
+        """
+        for i, ward_id in enumerate(ward_ids.tolist()):
+            stats = self.get_or_create(ward_id)
+            window = stats['window']
+            window.load(head, window.series(head * window.bucket_seconds) + windows[i])
+            next_change = window.next_change()
+            if next_change is not None:
+                self.expiry.schedule(ward_id, next_change)
+            for j, disease in enumerate(diseases.tolist()):
+                if disease_counts[i, j]:
+                    stats['disease_counts'][disease] += int(disease_counts[i, j])
+
+
+class RedisWardState(WardStateBackend):
+    """
+    Ward statistics shared by every worker and node through Redis.
+
+    Layout (all keys under `prefix`):
+        wards                     SET   ward IDs with cases in the last 24h
+        ward:<id>:cases           ZSET  "<case id>:<node>" scored by epoch timestamp
+        ward:<id>:disease_types   SET   diseases with a disease ZSET below
+        ward:<id>:disease:<name>  ZSET  the ward's cases of that disease, as above
+        cases                     ZSET  all case IDs, for the global 24h count
+        expired_at                STRING  epoch seconds of the last `expire` pass
+
+    Windows and disease counts are ZCOUNTs over score ranges; entries older
+    than 24h are trimmed on write with ZREMRANGEBYSCORE, and `expire` trims
+    quiet wards and drops them from `wards` once they are empty. Case IDs
+    are only unique per process, so members carry a per-process node tag.
+    Raw events continue to go to the `case_events` stream through the
+    stream writer.
+    """
+
+    shared = True
+
+    # One pass over every ward since the last pass by any worker (ward keys are
+    # derived from ARGV[1], so this assumes a single Redis, not a cluster). Wards are only dropped once their cases ZSET
+    # is empty; add_cases writes it before adding the ward to `wards`, so a
+    # concurrent write re-adds a ward dropped under it.
+    EXPIRE = """
+    local prefix, now = ARGV[1], tonumber(ARGV[2])
+    local prev = tonumber(redis.call('GET', KEYS[2]) or ARGV[2])
+    local changed, evicted = {}, {}
+    if prev > now then
+        return {changed, evicted}
+    end
+    redis.call('SET', KEYS[2], ARGV[2])
+    for _, ward in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+        local cases = prefix .. 'ward:' .. ward .. ':cases'
+        local moved = false
+        for _, span in ipairs({3600, 21600, 86400}) do
+            if redis.call('ZCOUNT', cases, '(' .. (prev - span), now - span) > 0 then
+                moved = true
+            end
+        end
+        redis.call('ZREMRANGEBYSCORE', cases, '-inf', now - 86400)
+        local types = prefix .. 'ward:' .. ward .. ':disease_types'
+        for _, disease in ipairs(redis.call('SMEMBERS', types)) do
+            local key = prefix .. 'ward:' .. ward .. ':disease:' .. disease
+            redis.call('ZREMRANGEBYSCORE', key, '-inf', now - 86400)
+            if redis.call('EXISTS', key) == 0 then
+                redis.call('SREM', types, disease)
+            end
+        end
+        if redis.call('EXISTS', cases) == 0 then
+            redis.call('SREM', KEYS[1], ward)
+            table.insert(evicted, ward)
+            moved = true
+        end
+        if moved then
+            table.insert(changed, ward)
+        end
+    end
+    return {changed, evicted}
+    """
+
+    def __init__(self, redis_client, prefix: str = "smc:"):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.node = uuid.uuid4().hex[:12]
+        self._expire = redis_client.register_script(self.EXPIRE)
+
+    def _key(self, *parts: str) -> str:
+        return self.prefix + ":".join(parts)
+
+    async def add_cases(self, by_ward: Dict[str, List[Dict[str, Any]]]):
+        now = to_epoch(None)
+        pipe = self.redis.pipeline(transaction=False)
+        all_cases = {}
+        for ward_id, ward_cases in by_ward.items():
+            members = {}
+            by_disease = defaultdict(dict)
+            for case_dict in ward_cases:
+                member = f"{case_dict['id']}:{self.node}"
+                members[member] = by_disease[_value(case_dict['disease_type'])][member] = \
+                    to_epoch(case_dict['timestamp'])
+            all_cases.update(members)
+            cases_key = self._key("ward", ward_id, "cases")
+            pipe.zadd(cases_key, members)
+            pipe.zremrangebyscore(cases_key, "-inf", now - DAY)
+            for disease, disease_members in by_disease.items():
+                disease_key = self._key("ward", ward_id, "disease", disease)
+                pipe.zadd(disease_key, disease_members)
+                pipe.zremrangebyscore(disease_key, "-inf", now - DAY)
+            # Sets last: `expire` only drops what has no entries (see EXPIRE)
+            pipe.sadd(self._key("ward", ward_id, "disease_types"), *by_disease)
+            pipe.sadd(self._key("wards"), ward_id)
+        if all_cases:
+            pipe.zadd(self._key("cases"), all_cases)
+            pipe.zremrangebyscore(self._key("cases"), "-inf", now - DAY)
+        await pipe.execute()
+
+    async def ward_snapshot(self, ward_id: str):
+        now = to_epoch(None)
+        cases_key = self._key("ward", ward_id, "cases")
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.sismember(self._key("wards"), ward_id)
+        pipe.zcount(cases_key, now - HOUR, "+inf")
+        pipe.zcount(cases_key, now - SIX_HOURS, "+inf")
+        pipe.zcount(cases_key, now - DAY, "+inf")
+        pipe.smembers(self._key("ward", ward_id, "disease_types"))
+        known, count_1h, count_6h, count_24h, diseases = await pipe.execute()
+        if not known:
+            return None
+        diseases = sorted(map(_text, diseases))
+        pipe = self.redis.pipeline(transaction=False)
+        for disease in diseases:
+            pipe.zcount(self._key("ward", ward_id, "disease", disease), now - DAY, "+inf")
+        disease_counts = {disease: count for disease, count in zip(diseases, await pipe.execute())
+                          if count}
+        return window_snapshot(count_1h, count_6h, count_24h), disease_counts
+
+    async def ward_ids(self) -> List[str]:
+        return sorted(_text(w) for w in await self.redis.smembers(self._key("wards")))
+
+    async def ward_totals(self) -> Dict[str, int]:
+        ward_ids = await self.ward_ids()
+        cutoff = to_epoch(None) - DAY
+        pipe = self.redis.pipeline(transaction=False)
+        for ward_id in ward_ids:
+            pipe.zcount(self._key("ward", ward_id, "cases"), cutoff, "+inf")
+        return dict(zip(ward_ids, await pipe.execute()))
+
+    async def total_cases_24h(self) -> int:
+        return await self.redis.zcount(self._key("cases"), to_epoch(None) - DAY, "+inf")
+
+    async def expire(self, now: Optional[float] = None):
+        """
+        Trim every ward to the last 24h and drop empty ones. Any worker may
+        call this; each pass covers the time since the previous one (by
+        whichever worker), so a ward's change is reported once.
+        """
+        changed, evicted = await self._expire(keys=[self._key("wards"), self._key("expired_at")],
+                                              args=[self.prefix, repr(to_epoch(now))])
+        return [_text(w) for w in changed], [_text(w) for w in evicted]
+
+
+def _value(value: Any) -> str:
+    return str(getattr(value, 'value', value))
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+# ===== BENCHMARK =====
+
+if __name__ == "__main__":
+    # Ingest throughput of realtime_backend with STATE_BACKEND=redis at 1-8 workers.
+    # Needs Redis on localhost:6379 (as realtime_backend expects) and httpx.
+    import asyncio
+    import os
+    import subprocess
+    import sys
+    import time
+    import httpx
+
+    REQUESTS = 4000
+    CONCURRENCY = 64
+    CASE = {"ward_id": "W001", "disease_type": "dengue", "patient_age": 30,
+            "patient_gender": "F", "severity": "low", "reported_by": "bench"}
+
+    async def hammer(url: str) -> float:
+        async with httpx.AsyncClient(timeout=30) as client:
+            for _ in range(600):  # 8 workers take a while to start on a small machine
+                try:
+                    if (await client.get(url + "/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+
+            sent = 0
+
+            async def worker():
+                nonlocal sent
+                while sent < REQUESTS:
+                    sent += 1
+                    response = await client.post(url + "/events/case",
+                                                 json=dict(CASE, ward_id=f"W{sent % 50:03d}"))
+                    response.raise_for_status()
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+            return REQUESTS / (time.perf_counter() - t0)
+
+    print("=" * 60)
+    print(f"Ingest scaling with STATE_BACKEND=redis ({REQUESTS} requests, "
+          f"{CONCURRENCY} concurrent)")
+    print("=" * 60)
+    # One reporter sends everything here; measure the backend, not admission control
+    env = dict(os.environ, STATE_BACKEND="redis", REPORTER_RATE="1e9", REPORTER_BURST="1e9")
+    for workers in (1, 2, 4, 8):
+        port = 8100 + workers
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "realtime_backend:app", "--port", str(port),
+             "--workers", str(workers), "--log-level", "warning"],
+            env=env
+        )
+        try:
+            rate = asyncio.run(hammer(f"http://127.0.0.1:{port}"))
+            print(f"  {workers} worker(s): {rate:8,.0f} cases/s")
+        finally:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,223 @@
+"""
+Smart Public Health Management System - Redis Streams Writer
+Background, batched and pipelined XADD with a local spill file for outages
+
+Author: SMC Real-Time Team
+Date: October 2026
+"""
+
+import asyncio
+import time
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import orjson
+
+Entry = Tuple[str, Dict[str, Any]]  # (stream name, fields)
+
+
+class StreamWriter:
+    """
+    Decouples request handlers from Redis round-trips.
+
+    `submit()` only appends to an in-memory buffer. A background task
+    flushes the buffer as pipelined XADD batches when `batch_size` entries
+    are waiting or `flush_interval` seconds have passed. If Redis fails,
+    the batch is appended to an NDJSON spill file, which is replayed into
+    Redis before new entries once it is reachable again.
+    """
+
+    def __init__(self, redis_client=None, batch_size: int = 200,
+                 flush_interval: float = 0.05, max_buffer: int = 50000,
+                 spill_path: str = "data/stream_spill.ndjson",
+                 retry_interval: float = 5.0):
+        """
+        Args:
+            redis_client: redis.asyncio client (submit is a no-op while None)
+            batch_size: Entries per pipeline; also the size flush trigger
+            flush_interval: Longest time an entry waits in the buffer (seconds)
+            max_buffer: Entries held in memory before new ones are dropped
+            spill_path: NDJSON file for batches that could not be written
+            retry_interval: Seconds to spill straight to disk after a Redis failure
+        """
+        self.redis_client = redis_client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.spill_path = Path(spill_path)
+        self.retry_interval = retry_interval
+        self._retry_at = 0.0  # monotonic time before which Redis is not retried
+
+        self.buffer: Deque[Entry] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.written = 0
+        self.batches = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dropped = 0
+
+    def start(self, redis_client=None):
+        if redis_client is not None:
+            self.redis_client = redis_client
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write out whatever is still buffered"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        await self.flush()
+
+    def submit(self, stream: str, fields: Dict[str, Any]) -> bool:
+        """
+        Queue one XADD without waiting for Redis.
+
+        Returns:
+            False if Redis is not configured or the buffer is full
+        """
+        if self.redis_client is None:
+            return False
+        if len(self.buffer) >= self.max_buffer:
+            self.dropped += 1
+            return False
+        self.buffer.append((stream, fields))
+        if len(self.buffer) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("⚠ Stream writer flush failed:", e)
+
+    async def _pipeline(self, entries: List[Entry]):
+        pipe = self.redis_client.pipeline(transaction=False)
+        for stream, fields in entries:
+            pipe.xadd(stream, fields)
+        await pipe.execute()
+
+    async def flush(self):
+        """Write buffered entries (and any spilled backlog) to Redis"""
+        if self.redis_client is None:
+            return
+        if time.monotonic() < self._retry_at:
+            await self._spill_buffer()
+            return
+
+        try:
+            if self.spill_path.exists():
+                await self._replay_spill()
+
+            while self.buffer:
+                # Entries leave the buffer only once written or spilled
+                batch = list(islice(self.buffer, self.batch_size))
+                await self._pipeline(batch)
+                for _ in batch:
+                    self.buffer.popleft()
+                self.written += len(batch)
+                self.batches += 1
+        except Exception as e:
+            print(f"⚠ Redis stream write failed, spilling to disk for {self.retry_interval}s:", e)
+            self._retry_at = time.monotonic() + self.retry_interval
+            await self._spill_buffer()
+
+    async def _spill_buffer(self):
+        pending = list(self.buffer)
+        self.buffer.clear()
+        await asyncio.to_thread(self._spill, pending)
+
+    def _spill(self, entries: List[Entry]):
+        if not entries:
+            return
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spill_path, 'ab') as f:
+            for stream, fields in entries:
+                f.write(orjson.dumps({"stream": stream, "fields": fields}, default=str) + b"\n")
+        self.spilled += len(entries)
+
+    async def _replay_spill(self):
+        """
+        Push spilled entries to Redis; the file is removed only after all
+        succeed, so a failure part-way can re-send entries (at-least-once).
+        """
+        lines = await asyncio.to_thread(self.spill_path.read_bytes)
+        entries = [(record["stream"], record["fields"])
+                   for record in map(orjson.loads, lines.splitlines()) if record]
+        for start in range(0, len(entries), self.batch_size):
+            await self._pipeline(entries[start:start + self.batch_size])
+        self.spill_path.unlink(missing_ok=True)
+        self.replayed += len(entries)
+        print(f"✓ Replayed {len(entries)} spilled stream entries into Redis")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self.buffer),
+            "written": self.written,
+            "batches": self.batches,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "dropped": self.dropped
+        }
+
+
+# ===== BENCHMARK =====
+
+if __name__ == "__main__":
+    async def main(n: int = 20000):
+        try:
+            import fakeredis
+            import fakeredis.aioredis
+            client = fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer())
+            target = "fakeredis"
+        except ImportError:
+            import redis.asyncio as redis
+            client = redis.from_url("redis://localhost:6379")
+            target = "redis://localhost:6379"
+
+        fields = {"data": orjson.dumps({"ward_id": "W001", "disease_type": "dengue"}).decode()}
+
+        print("=" * 60)
+        print(f"Redis Streams Writer Benchmark - {n:,} events ({target})")
+        print("=" * 60)
+
+        t0 = time.perf_counter()
+        for _ in range(n):
+            await client.xadd("bench_direct", fields)
+        direct = time.perf_counter() - t0
+
+        writer = StreamWriter(client, spill_path="data/bench_spill.ndjson")
+        writer.start()
+        t0 = time.perf_counter()
+        for i in range(n):
+            writer.submit("bench_batched", fields)
+            if i % 100 == 0:
+                await asyncio.sleep(0)  # let the flusher run, as between requests
+        submit = time.perf_counter() - t0
+        await writer.stop()
+        batched = time.perf_counter() - t0
+
+        print(f"\nAwaited XADD per event : {n / direct:10,.0f} events/s")
+        print(f"Submit (handler cost)  : {submit / n * 1e6:10.2f} us/event")
+        print(f"Batched + pipelined    : {n / batched:10,.0f} events/s "
+              f"({writer.batches} pipelines)")
+        print(f"Stream lengths         : {await client.xlen('bench_direct')} / "
+              f"{await client.xlen('bench_batched')}")
+
+    asyncio.run(main())
@@ -0,0 +1,343 @@
+"""
+Smart Public Health Management System - Write-Ahead Log
+Append-only, CRC-checked event log with group commit for the in-memory state
+
+Author: SMC Real-Time Team
+Date: October 2026
+"""
+
+import asyncio
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple, Union
+import orjson
+
+# Record kinds
+RECORD_CASE = 1
+RECORD_ALERT = 2
+RECORD_RESOURCE = 3
+
+# length (of kind + body), CRC32 (of kind + body)
+HEADER = struct.Struct("<II")
+SEGMENT_GLOB = "wal-*.log"
+
+
+class WriteAheadLog:
+    """
+    Durable log of state-changing events for the in-memory backend.
+
+    `append()` encodes a record into an in-memory buffer and returns its
+    log sequence number (LSN: the byte offset just past the record across
+    all segments). A background task writes and fsyncs the buffer every
+    `commit_interval` seconds, so one fsync covers every record appended
+    in that interval (group commit). `wait(lsn)` resolves once a record is
+    on disk.
+
+    Each record is framed as length + CRC32 + kind byte + JSON body. On
+    open, a torn or corrupt tail (from a crash mid-write) is truncated at
+    the last valid record. Segments are rotated at `segment_bytes` and
+    named after the LSN they start at, so `drop_before(lsn)` can discard
+    segments fully covered by a snapshot.
+    """
+
+    def __init__(self, directory: str = "data/wal", segment_bytes: int = 64 * 1024 * 1024,
+                 commit_interval: float = 0.005, fsync: bool = True):
+        """
+        Args:
+            directory: Where segment files live (created on demand)
+            segment_bytes: Size after which a new segment is started
+            commit_interval: Longest time a record waits before being written and synced
+            fsync: Sync to stable storage on every commit (disable only for testing)
+        """
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.commit_interval = commit_interval
+        self.fsync = fsync
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segments: List[int] = sorted(
+            int(path.stem.split('-')[1]) for path in self.directory.glob(SEGMENT_GLOB)
+        )
+        if not self.segments:
+            self.segments.append(0)
+        self.durable_lsn = self.segments[-1] + self._recover_tail(self.segments[-1])
+        self.lsn = self.durable_lsn  # end of buffered records
+
+        self._file = open(self._path(self.segments[-1]), 'ab')
+        self._buffer = bytearray()
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._repair = False  # a failed commit may have left bytes past durable_lsn
+
+        self.records = 0
+        self.commits = 0
+        self.sync_seconds = 0.0
+        self.error: Optional[Exception] = None
+
+    def _path(self, start_lsn: int) -> Path:
+        return self.directory / f"wal-{start_lsn:020d}.log"
+
+    # ----- Writing -----
+
+    def append(self, kind: int, record: Union[Dict[str, Any], bytes]) -> int:
+        """
+        Buffer one record (a dict, or already JSON-encoded bytes);
+        returns the LSN to `wait()` on for durability.
+        """
+        if not isinstance(record, bytes):
+            record = orjson.dumps(record, default=str)
+        body = bytes((kind,)) + record
+        self._buffer += HEADER.pack(len(body), zlib.crc32(body))
+        self._buffer += body
+        self.lsn += HEADER.size + len(body)
+        self.records += 1
+        return self.lsn
+
+    async def wait(self, lsn: int):
+        """Return once everything up to `lsn` is on disk; raises if the commit failed"""
+        if lsn <= self.durable_lsn:
+            return
+        if self.error is not None:
+            raise self.error
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((lsn, future))
+        self._wakeup.set()
+        await future
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Commit anything buffered and close the current segment"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        await self.commit()
+        self._file.close()
+
+    async def _run(self):
+        while not self._stopping:
+            # Commit as soon as a writer waits, otherwise on the timer; records
+            # appended while a commit is in flight are grouped into the next one
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.commit_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.commit()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("⚠ WAL commit failed:", e)
+
+    async def commit(self):
+        """Write and sync buffered records, then release their waiters"""
+        if not self._buffer:
+            return
+        data, self._buffer = self._buffer, bytearray()
+        end_lsn = self.lsn
+        try:
+            await asyncio.to_thread(self._write, data)
+        except Exception as e:
+            # Records are in memory but not durable; stop acknowledging writes.
+            # They stay buffered, ahead of anything appended since, and the next
+            # commit rewrites them from the durable end of the segment, so LSNs
+            # keep matching file offsets
+            self._buffer[:0] = data
+            self._repair = True
+            self.error = e
+            for _, future in self._waiters:
+                if not future.done():
+                    future.set_exception(e)
+            self._waiters.clear()
+            raise
+
+        self._repair = False
+        self.error = None
+        self.durable_lsn = end_lsn
+        self.commits += 1
+        while self._waiters and self._waiters[0][0] <= end_lsn:
+            _, future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+
+        if end_lsn - self.segments[-1] >= self.segment_bytes:
+            self._rotate(end_lsn)
+
+    def _write(self, data: bytes):
+        started = time.perf_counter()
+        if self._repair:
+            self._truncate_to_durable()
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.sync_seconds += time.perf_counter() - started
+
+    def _truncate_to_durable(self):
+        """Reopen the current segment and cut whatever a failed commit wrote past durable_lsn"""
+        try:
+            self._file.close()  # may flush leftovers; they are cut below
+        except Exception:
+            pass
+        self._file = open(self._path(self.segments[-1]), 'ab')
+        self._file.truncate(self.durable_lsn - self.segments[-1])
+
+    def _rotate(self, start_lsn: int):
+        self._file.close()
+        self.segments.append(start_lsn)
+        self._file = open(self._path(start_lsn), 'ab')
+
+    def drop_before(self, lsn: int) -> int:
+        """Delete segments whose records all precede `lsn` (e.g. covered by a snapshot)"""
+        dropped = 0
+        while len(self.segments) > 1 and self.segments[1] <= lsn:
+            self._path(self.segments.pop(0)).unlink(missing_ok=True)
+            dropped += 1
+        return dropped
+
+    # ----- Reading -----
+
+    def _recover_tail(self, start_lsn: int) -> int:
+        """Length of the valid prefix of a segment, truncating anything after it"""
+        path = self._path(start_lsn)
+        if not path.exists():
+            path.touch()
+            return 0
+        valid = 0
+        for _, _, end in self._scan(path, 0):
+            valid = end
+        if valid < path.stat().st_size:
+            print(f"⚠ WAL: truncating torn tail of {path.name} at byte {valid}")
+            with open(path, 'r+b') as f:
+                f.truncate(valid)
+        return valid
+
+    @staticmethod
+    def _scan(path: Path, offset: int) -> Iterator[Tuple[int, Dict[str, Any], int]]:
+        """(kind, record, end offset) for each valid record from `offset`; stops at corruption"""
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        pos = 0
+        while pos + HEADER.size <= len(data):
+            length, crc = HEADER.unpack_from(data, pos)
+            body = data[pos + HEADER.size:pos + HEADER.size + length]
+            if length == 0 or len(body) < length or zlib.crc32(body) != crc:
+                return
+            pos += HEADER.size + length
+            yield body[0], orjson.loads(body[1:]), offset + pos
+
+    def replay(self, after_lsn: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """(kind, record) for every committed record after `after_lsn`, oldest first"""
+        for i, start in enumerate(self.segments):
+            end = self.segments[i + 1] if i + 1 < len(self.segments) else None
+            if end is not None and end <= after_lsn:
+                continue
+            offset = max(after_lsn - start, 0)
+            for kind, record, _ in self._scan(self._path(start), offset):
+                yield kind, record
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lsn": self.lsn,
+            "durable_lsn": self.durable_lsn,
+            "segments": len(self.segments),
+            "records": self.records,
+            "commits": self.commits,
+            "avg_commit_ms": round(self.sync_seconds / self.commits * 1000, 3) if self.commits else 0,
+            "healthy": self.error is None
+        }
+
+
+# ===== BENCHMARK =====
+
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+
+    import httpx
+    import realtime_backend
+    from realtime_admission import TokenBuckets
+
+    CASE = {"disease_type": "dengue", "patient_age": 30, "patient_gender": "F",
+            "severity": "low", "reported_by": "PHC_0001"}
+
+    async def ingest(n: int, concurrency: int, wal: Optional[WriteAheadLog],
+                     sync_ack: bool = True) -> float:
+        """POST /events/case in-process (ASGI); with `sync_ack`, acked once in the WAL on disk"""
+        realtime_backend.state = realtime_backend.RealTimeState()
+        realtime_backend.state.wal = wal
+        realtime_backend.WAL_SYNC_ACK = sync_ack
+        # One reporter sends everything here; measure the WAL, not admission control
+        realtime_backend.reporter_limits = TokenBuckets(rate=1e9, burst=1e9)
+        transport = httpx.ASGITransport(app=realtime_backend.app)
+        remaining = n
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def handler():
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    # Five cases per ward keeps risk scores in the model's range
+                    response = await client.post("/events/case",
+                                                 json=dict(CASE, ward_id=f"W{remaining % (n // 5):05d}"))
+                    response.raise_for_status()
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(handler() for _ in range(concurrency)))
+            return n / (time.perf_counter() - t0)
+
+    async def main(n: int = 10_000, concurrency: int = 64):
+        print("=" * 60)
+        print(f"Write-Ahead Log Benchmark - {n:,} case POSTs, {concurrency} concurrent clients")
+        print("=" * 60)
+        directory = tempfile.mkdtemp(prefix="wal-bench-")
+        try:
+            # Alternate runs and keep the best of each, to damp scheduler noise
+            baseline, logged, rate = 0.0, 0.0, 0.0
+            for run in range(3):
+                baseline = max(baseline, await ingest(n, concurrency, None))
+                for sync_ack in (False, True):
+                    wal = WriteAheadLog(directory, segment_bytes=4 * 1024 * 1024, commit_interval=0.002)
+                    wal.start()
+                    result = await ingest(n, concurrency, wal, sync_ack)
+                    await wal.stop()
+                    if sync_ack:
+                        rate = max(rate, result)
+                    else:
+                        logged = max(logged, result)
+            stats = wal.stats()
+            print(f"\nNo WAL                    : {baseline:10,.0f} cases/s")
+            print(f"WAL, acked before fsync   : {logged:10,.0f} cases/s ({logged / baseline:.1%})")
+            print(f"WAL, acked after fsync    : {rate:10,.0f} cases/s ({rate / baseline:.1%}) "
+                  f"({stats['commits']} group commits, {stats['records'] / stats['commits']:.0f} records/fsync, "
+                  f"{stats['avg_commit_ms']} ms each)")
+
+            t0 = time.perf_counter()
+            replayed = sum(1 for _ in WriteAheadLog(directory).replay())
+            replay_s = time.perf_counter() - t0
+            print(f"Recovery replay           : {replayed / replay_s:10,.0f} records/s "
+                  f"({replayed:,} records, {stats['segments']} segments)")
+
+            # Torn write: chop the last record in half and reopen
+            last = sorted(Path(directory).glob(SEGMENT_GLOB))[-1]
+            with open(last, 'r+b') as f:
+                f.truncate(last.stat().st_size - 20)
+            recovered = sum(1 for _ in WriteAheadLog(directory).replay())
+            print(f"After torn tail           : {recovered:,} records recovered")
+        finally:
+            shutil.rmtree(directory)
+
+    asyncio.run(main())